@@ -8,7 +8,7 @@
 示例:
     python batch_convert.py get_info.json ./output markdown
     python batch_convert.py get_info.json ./output pdf --workers 3
-    python batch_convert.py get_info.json ./output markdown --doc-type wiki --delay 0.5
+    python batch_convert.py get_info.json ./output markdown --doc-type wiki --qps docx=4
 """
 
 import sys
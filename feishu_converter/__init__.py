@@ -3,11 +3,13 @@
 from .converter import FeishuConverter
 from .interfaces import IFeishuConverter, IFormatAdapter, IDocumentFetcher
 from .api import FeishuDocAPI
+from .async_api import AsyncFeishuDocAPI
 
 __all__ = [
     'FeishuConverter',
     'IFeishuConverter',
     'IFormatAdapter',
     'IDocumentFetcher',
-    'FeishuDocAPI'
+    'FeishuDocAPI',
+    'AsyncFeishuDocAPI'
 ]
\ No newline at end of file
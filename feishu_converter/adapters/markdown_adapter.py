@@ -4,7 +4,8 @@ Markdown适配器
 """
 
 import logging
-from typing import Dict, Any, List
+import os
+from typing import Dict, Any, List, Iterable, Optional
 from ..interfaces import IFormatAdapter
 from ..process.base_handler import BaseHandler
 from ..process.heading_handler import HeadingHandler
@@ -44,6 +45,16 @@ from ..process.source_synced_handler import SourceSyncedHandler
 from ..process.reference_synced_handler import ReferenceSyncedHandler
 from ..process.undefined_handler import UndefinedHandler
 from ..process.document_widget_handler import DocumentWidgetHandler
+from ..process.document_index import DocumentIndex
+from ..process.image_prefetcher import collect_image_tokens, get_image_prefetcher
+from ..process.render_context import RenderContext
+from ..process.sheet_prefetcher import collect_sheet_tokens, get_sheet_prefetcher
+from .markdown_writer import MarkdownWriter, QuotePrefix
+from ..process.registry import (
+    ContainerHandler,
+    MARKDOWN_CONTAINER_HANDLERS,
+    MARKDOWN_HANDLERS,
+)
 
 
 class MarkdownAdapter(IFormatAdapter):
@@ -52,12 +63,16 @@ class MarkdownAdapter(IFormatAdapter):
     负责将飞书文档内容转换为Markdown格式
     """
     
-    def __init__(self):
+    def __init__(self, prefetch_images: bool = True, prefetch_sheets: bool = True):
         """
         初始化Markdown适配器
+        
+        :param prefetch_images: 是否在渲染前并发下载文档中的图片
+        :param prefetch_sheets: 是否在渲染前并发获取文档中嵌入的电子表格
         """
         self.logger = logging.getLogger(__name__)
-        self.output_dir = None  # 输出目录，用于保存图片
+        self.image_prefetcher = get_image_prefetcher() if prefetch_images else None
+        self.sheet_prefetcher = get_sheet_prefetcher() if prefetch_sheets else None
     
     def convert(self, content: Dict[str, Any], output_path: str) -> bool:
         """
@@ -69,44 +84,73 @@ class MarkdownAdapter(IFormatAdapter):
         """
         self.logger.info(f"开始将文档内容转换为Markdown: {output_path}")
         
-        # 设置输出目录，用于保存图片
-        import os
-        self.output_dir = os.path.dirname(os.path.abspath(output_path))
-        self.output_filename = os.path.splitext(os.path.basename(output_path))[0]
-        
-        # 设置图片处理器的输出目录
-        from ..process.image_handler import ImageHandler
-        ImageHandler.set_output_dir(self.output_dir, self.output_filename)
+        # 每次转换使用独立的渲染上下文，适配器实例可以被多个线程共用
+        context = RenderContext(output_path)
+        context.resources = content.get('resources') or {}
         
+        # 先写入临时文件，转换失败时不留下不完整的输出
+        temp_path = f"{output_path}.part"
         try:
             # 检查文档类型
             doc_type = content.get('document_info', {}).get('document_type', 'docx')
             
-            if doc_type == 'sheet':
-                # 处理电子表格
-                markdown_content = self._process_spreadsheet(content)
-            else:
-                # 处理普通文档
-                markdown_content = self._process_blocks(content)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                writer = MarkdownWriter(f)
+                if doc_type == 'sheet':
+                    # 处理电子表格
+                    self._write_spreadsheet(content, writer)
+                else:
+                    # 处理普通文档
+                    self._write_blocks(content, writer, context)
+                writer.flush()
+            os.replace(temp_path, output_path)
             
-            # 写入文件
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(markdown_content)
+            self.logger.info(f"Markdown转换成功: {output_path}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Markdown转换失败: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+    
+    def convert_stream(self, document_info: Dict[str, Any], pages: Iterable[List[Dict[str, Any]]], output_path: str) -> bool:
+        """
+        边获取边转换文档块
+        每个顶层块的子树到齐后立即渲染并写入文件，内存中只保留尚未完整的子树
+        
+        :param document_info: 文档信息
+        :param pages: 块分页迭代器（按接口返回顺序）
+        :param output_path: 输出路径
+        :return: 转换是否成功
+        """
+        self.logger.info(f"开始流式转换文档为Markdown: {output_path}")
+        
+        context = RenderContext(output_path)
+        
+        # 先写入临时文件，转换失败时不留下不完整的输出
+        temp_path = f"{output_path}.part"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                writer = MarkdownWriter(f)
+                self._process_block_stream(pages, writer, context)
+                writer.flush()
+            os.replace(temp_path, output_path)
             
             self.logger.info(f"Markdown转换成功: {output_path}")
             return True
         except Exception as e:
             self.logger.error(f"Markdown转换失败: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             return False
     
-    def _process_spreadsheet(self, content: Dict[str, Any]) -> str:
+    def _write_spreadsheet(self, content: Dict[str, Any], markdown_lines: MarkdownWriter):
         """
         处理电子表格内容为Markdown格式
         
         :param content: 电子表格内容
-        :return: Markdown字符串
+        :param markdown_lines: Markdown写入器
         """
-        markdown_lines = []
         
         # 添加标题
         doc_info = content.get('document_info', {})
@@ -118,88 +162,99 @@ class MarkdownAdapter(IFormatAdapter):
         sheets = content.get('sheets', [])
         for sheet in sheets:
             sheet_title = sheet.get('title', '未命名工作表')
-            values = sheet.get('values', [])
+            # 大工作表提供行读取器（分段请求、逐行产出），其余为已读取的行列表
+            rows = sheet.get('rows')
+            if rows is None:
+                rows = sheet.get('values', [])
             
             # 添加工作表标题
             markdown_lines.append(f"## {sheet_title}")
             BaseHandler.add_empty_line(markdown_lines)
             
-            if values:
-                # 将电子表格数据转换为Markdown表格
-                for i, row in enumerate(values):
-                    row_str = []
-                    for cell in row:
-                        if isinstance(cell, str):
-                            row_str.append(cell)
-                        elif isinstance(cell, list):
-                            text_parts = []
-                            for item in cell:
-                                if isinstance(item, dict) and 'text' in item:
-                                    text_parts.append(str(item['text']))
-                                elif isinstance(item, str):
-                                    text_parts.append(item)
-                            row_str.append(''.join(text_parts))
-                        elif isinstance(cell, dict):
-                            if 'text' in cell:
-                                row_str.append(str(cell['text']))
-                            elif 'fileToken' in cell:
-                                row_str.append("[文件]")
-                            else:
-                                row_str.append(str(cell))
+            # 将电子表格数据逐行转换为Markdown表格
+            row_count = 0
+            for i, row in enumerate(rows):
+                row_count += 1
+                row_str = []
+                for cell in row:
+                    if isinstance(cell, str):
+                        row_str.append(cell)
+                    elif isinstance(cell, list):
+                        text_parts = []
+                        for item in cell:
+                            if isinstance(item, dict) and 'text' in item:
+                                text_parts.append(str(item['text']))
+                            elif isinstance(item, str):
+                                text_parts.append(item)
+                        row_str.append(''.join(text_parts))
+                    elif isinstance(cell, dict):
+                        if 'text' in cell:
+                            row_str.append(str(cell['text']))
+                        elif 'fileToken' in cell:
+                            row_str.append("[文件]")
                         else:
-                            row_str.append(str(cell) if cell is not None else "")
-                    
-                    # 转义表格分隔符
-                    row_str = [cell.replace('|', '\\|') if cell else ' ' for cell in row_str]
-                    markdown_lines.append("| " + " | ".join(row_str) + " |")
-                    
-                    # 如果是第一行，添加分隔行
-                    if i == 0:
-                        markdown_lines.append("| " + " | ".join(['---'] * len(row_str)) + " |")
+                            row_str.append(str(cell))
+                    else:
+                        row_str.append(str(cell) if cell is not None else "")
                 
+                # 转义表格分隔符
+                row_str = [cell.replace('|', '\\|') if cell else ' ' for cell in row_str]
+                markdown_lines.append("| " + " | ".join(row_str) + " |")
+                
+                # 如果是第一行，添加分隔行
+                if i == 0:
+                    markdown_lines.append("| " + " | ".join(['---'] * len(row_str)) + " |")
+            
+            if row_count:
                 BaseHandler.add_empty_line(markdown_lines)
             else:
                 markdown_lines.append("*此工作表暂无数据*")
                 BaseHandler.add_empty_line(markdown_lines)
-        
-        return '\n'.join(markdown_lines)
     
-    def _process_blocks(self, content: Dict[str, Any]) -> str:
+    def _write_blocks(self, content: Dict[str, Any], markdown_lines: MarkdownWriter, context: RenderContext):
         """
         处理文档块内容为Markdown格式
         
         :param content: 文档内容
-        :return: Markdown字符串
+        :param markdown_lines: Markdown写入器
+        :param context: 渲染上下文
         """
-        # 重置有序列表序号计数器
-        ListHandler.reset_ordered_list_index()
+        # 构建文档索引（块索引、父子关系、行内文本），所有处理器共用
+        index = DocumentIndex(content.get('items', []))
+        context.index = index
         
-        # 重置标题序号计数器
-        HeadingHandler.reset_heading_numbers()
+        # 渲染前并发下载所有图片，渲染到图片块时直接使用下载结果
+        if self.image_prefetcher:
+            self.image_prefetcher.prefetch(context, collect_image_tokens(index.all_blocks))
+        # 获取文档时未预取外部资源的，同样在渲染前并发获取嵌入的电子表格
+        if self.sheet_prefetcher and not context.resources:
+            self.sheet_prefetcher.prefetch(context, collect_sheet_tokens(index.all_blocks))
+        page_block_id = index.page_block_id
         
-        blocks = content.get('items', [])
-        markdown_lines = []
-        
-        # 构建块索引（block_id -> block），用于处理嵌套结构
-        block_index = {blk['block_id']: blk for blk in blocks if 'block_id' in blk}
+        # 获取顶层块（直接作为页面子块的块）
+        top_level_blocks = self._find_top_level_blocks(index.all_blocks, page_block_id, index.parent_children_map)
         
-        # 找出根块（parent_id为空或指向页面块的块）
-        page_block_id = None
-        for blk in blocks:
-            if blk.get('block_type') == 1:  # 页面块
-                page_block_id = blk.get('block_id')
-                break
+        # 先处理页面块本身（输出标题）
+        if page_block_id:
+            HeadingHandler.process_page(index.get(page_block_id), markdown_lines)
         
-        # 构建父子关系映射
-        parent_children_map = {}
-        for blk in blocks:
-            parent_id = blk.get('parent_id')
-            if parent_id:
-                if parent_id not in parent_children_map:
-                    parent_children_map[parent_id] = []
-                parent_children_map[parent_id].append(blk)
+        # 处理顶层块及其子块
+        self._render_blocks(top_level_blocks, markdown_lines, context)
+    
+    @staticmethod
+    def _find_top_level_blocks(
+        blocks: List[Dict[str, Any]],
+        page_block_id: Optional[str],
+        parent_children_map: Dict[str, List]
+    ) -> List[Dict[str, Any]]:
+        """
+        找出顶层块（直接作为页面子块的块）
         
-        # 获取顶层块（直接作为页面子块的块）
+        :param blocks: 所有块的列表
+        :param page_block_id: 页面块ID
+        :param parent_children_map: 父子关系映射
+        :return: 顶层块列表
+        """
         top_level_blocks = []
         if page_block_id and page_block_id in parent_children_map:
             top_level_blocks = parent_children_map[page_block_id]
@@ -215,398 +270,347 @@ class MarkdownAdapter(IFormatAdapter):
         if not top_level_blocks:
             top_level_blocks = [blk for blk in blocks if blk.get('block_type') != 1]
         
-        # 先处理页面块本身（输出标题）
-        if page_block_id and page_block_id in block_index:
-            page_block = block_index[page_block_id]
-            HeadingHandler.process_page(page_block, markdown_lines)
-        
-        # 处理顶层块，递归处理子块
-        self._process_blocks_recursive(
-            top_level_blocks, 
-            markdown_lines, 
-            block_index, 
-            parent_children_map,
-            blocks
-        )
-        
-        return '\n'.join(markdown_lines)
+        return top_level_blocks
     
-    def _process_blocks_recursive(
-        self, 
-        blocks_to_process: List[Dict[str, Any]], 
-        markdown_lines: List[str],
-        block_index: Dict[str, Any],
-        parent_children_map: Dict[str, List],
-        all_blocks: List[Dict[str, Any]]
+    def _process_block_stream(
+        self,
+        pages: Iterable[List[Dict[str, Any]]],
+        writer: MarkdownWriter,
+        context: RenderContext
     ):
         """
-        递归处理块列表
+        流式处理文档块并写入输出
+        块按接口返回的顺序（父块在前）到达，根据每个块的 children 统计未到齐的子块数，
+        顶层块的整棵子树到齐且排在它前面的顶层块都已输出时，渲染该子树并释放其内存
         
-        :param blocks_to_process: 要处理的块列表
-        :param markdown_lines: Markdown行列表
-        :param block_index: 块索引（block_id -> block）
-        :param parent_children_map: 父子关系映射
-        :param all_blocks: 所有块的列表
+        :param pages: 块分页迭代器
+        :param writer: Markdown写入器
+        :param context: 渲染上下文
         """
-        for i, block in enumerate(blocks_to_process):
-            block_type = block.get('block_type')
-            block_id = block.get('block_id', '')
+        block_index = {}
+        parent_children_map = {}
+        pending = {}      # block_id -> 尚未完整到达的子块数
+        complete = set()  # 子树已完整到达的块
+        roots = []        # 尚未输出的顶层块ID（按到达顺序）
+        page_block_id = None
+        rendered_any = False
+        
+        def mark_complete(block_id: str):
+            # 子树完整后向上传播，父块的所有子块都完整时父块也完整
+            while block_id is not None:
+                complete.add(block_id)
+                parent_id = block_index[block_id].get('parent_id')
+                if parent_id not in pending:
+                    return
+                pending[parent_id] -= 1
+                if pending[parent_id] > 0:
+                    return
+                del pending[parent_id]
+                block_id = parent_id
+        
+        def render_root(root_id: str):
+            context.index = DocumentIndex(self._collect_subtree(root_id, block_index, parent_children_map))
+            self._render_blocks([block_index[root_id]], writer, context)
+            # 释放已输出子树占用的内存
+            for blk in context.index.all_blocks:
+                block_id = blk['block_id']
+                block_index.pop(block_id, None)
+                parent_children_map.pop(block_id, None)
+                complete.discard(block_id)
+        
+        for items in pages:
+            # 图片和嵌入电子表格一到达就开始获取，与后续分页的获取重叠执行
+            if self.image_prefetcher:
+                self.image_prefetcher.prefetch(context, collect_image_tokens(items))
+            if self.sheet_prefetcher:
+                self.sheet_prefetcher.prefetch(context, collect_sheet_tokens(items))
             
-            # 页面块
-            if block_type == 1:  # 页面(Page)
-                HeadingHandler.process_page(block, markdown_lines)
-            # 文本块
-            elif block_type == 2:  # 文本块
-                TextHandler.process_text(block, markdown_lines)
-            # 标题块
-            elif 3 <= block_type <= 11:  # 标题块 (heading1-heading9)
-                level = block_type - 2  # 计算标题级别
-                # 遇到标题块时重置有序列表序号计数器
-                ListHandler.reset_ordered_list_index()
-                HeadingHandler.process_heading(block, level, markdown_lines)
-            # 列表块
-            elif block_type == 12:  # 无序列表
-                ListHandler.process_bullet_list(block, markdown_lines)
-            elif block_type == 13:  # 有序列表
-                ListHandler.process_ordered_list(block, markdown_lines)
-            # 代码块
-            elif block_type == 14:  # 代码块
-                CodeHandler.process_code(block, markdown_lines)
-            # 引用块
-            elif block_type == 15:  # 引用
-                QuoteHandler.process_quote(block, markdown_lines)
-            # 待办事项
-            elif block_type == 17:  # 待办事项
-                TextHandler.process_todo(block, markdown_lines)
-            # 多维表格
-            elif block_type == 18:  # 多维表格
-                BitableHandler.process_bitable(block, markdown_lines)
-            # 高亮块
-            elif block_type == 19:  # 高亮块
-                self._process_callout_with_children(
-                    block, markdown_lines, block_index, parent_children_map, all_blocks
-                )
-                # 高亮块已处理子块内容，跳过子块递归处理
-                continue
-            # 会话卡片
-            elif block_type == 20:  # 会话卡片
-                ChatCardHandler.process_chat_card(block, markdown_lines)
-            # 流程图 & UML
-            elif block_type == 21:  # 流程图 & UML
-                DiagramHandler.process_diagram(block, markdown_lines)
-            # 分割线
-            elif block_type == 22:  # 分割线
-                DividerHandler.process_divider(markdown_lines)
-            # 文件
-            elif block_type == 23:  # 文件
-                FileHandler.process_file(block, markdown_lines)
-            # 分栏
-            elif block_type == 24:  # 分栏
-                GridHandler.process_grid(block, markdown_lines)
-            # 分栏列
-            elif block_type == 25:  # 分栏列
-                GridColumnHandler.process_grid_column(block, markdown_lines)
-            # 内嵌 Block
-            elif block_type == 26:  # 内嵌 Block
-                IFrameHandler.process_iframe(block, markdown_lines)
-            # 图片
-            elif block_type == 27:  # 图片
-                ImageHandler.process_image(block, markdown_lines)
-            # 开放平台小组件
-            elif block_type == 28:  # 开放平台小组件
-                ISVHandler.process_isv(block, markdown_lines)
-            # 思维笔记
-            elif block_type == 29:  # 思维笔记
-                MindNoteHandler.process_mind_note(block, markdown_lines)
-            # 电子表格（外部资源，需要权限检查）
-            elif block_type == 30:  # 电子表格
-                SheetHandler.process_sheet(block, markdown_lines)
-            # 表格块（内部资源，不需要权限检查）
-            elif block_type == 31:  # 表格 (table)
-                TableHandler.process_table(block, markdown_lines, all_blocks)
-                # 表格块已处理所有单元格内容，跳过子块递归处理
-                continue
-            # 表格单元格 (block_type == 32) 不单独处理，由表格块统一处理
-            elif block_type == 32:  # 表格单元格 (table_cell)
-                # 跳过，已由表格块处理，且跳过子块递归处理
-                continue
-            # 视图块
-            elif block_type == 33:  # 视图
-                self._process_view_with_children(
-                    block, markdown_lines, block_index, parent_children_map, all_blocks
-                )
-                # 视图块已处理子块内容，跳过子块递归处理
-                continue
-            # 引用容器
-            elif block_type == 34:  # 引用容器
-                self._process_quote_container_with_children(
-                    block, markdown_lines, block_index, parent_children_map, all_blocks
-                )
-                # 引用容器已处理子块内容，跳过子块递归处理
-                continue
-            # 任务
-            elif block_type == 35:  # 任务
-                TaskHandler.process_task(block, markdown_lines)
-            # OKR
-            elif 36 <= block_type <= 39:  # OKR 相关块
-                OKRHandler.process_okr(block, markdown_lines)
-            # 新版文档小组件
-            elif block_type == 40:  # 新版文档小组件
-                DocumentWidgetHandler.process_document_widget(block, markdown_lines)
-            # Jira问题
-            elif block_type == 41:  # Jira问题
-                JiraIssueHandler.process_jira_issue(block, markdown_lines)
-            # Wiki目录
-            elif block_type == 42:  # Wiki目录
-                WikiCatalogHandler.process_wiki_catalog(block, markdown_lines)
-            # 画板
-            elif block_type == 43:  # 画板
-                BoardHandler.process_board(block, markdown_lines)
-            # 议程
-            elif block_type == 44:  # 议程
-                AgendaHandler.process_agenda(block, markdown_lines)
-            # 议程项
-            elif block_type == 45:  # 议程项
-                AgendaItemHandler.process_agenda_item(block, markdown_lines)
-            # 议程项标题
-            elif block_type == 46:  # 议程项标题
-                AgendaItemTitleHandler.process_agenda_item_title(block, markdown_lines)
-            # 议程项内容
-            elif block_type == 47:  # 议程项内容
-                AgendaItemContentHandler.process_agenda_item_content(block, markdown_lines)
-            # 链接预览
-            elif block_type == 48:  # 链接预览
-                LinkPreviewHandler.process_link_preview(block, markdown_lines)
-            # 源同步块
-            elif block_type == 49:  # 源同步块
-                SourceSyncedHandler.process_source_synced(block, markdown_lines)
-            # 引用同步块
-            elif block_type == 50:  # 引用同步块
-                ReferenceSyncedHandler.process_reference_synced(block, markdown_lines)
-            # 子页面列表
-            elif block_type == 51:  # 子页面列表
-                SubPageListHandler.process_sub_page_list(block, markdown_lines)
-            # AI模板
-            elif block_type == 52:  # AI模板
-                AitemplateHandler.process_aitemplate(block, markdown_lines)
-            # 未支持的块类型
-            elif block_type == 999:  # 未支持
-                UndefinedHandler.process_undefined(block, markdown_lines)
-            # 其他块类型可根据需要添加处理逻辑
-            else:
-                # 对于未知的块类型，使用OtherHandler处理
-                OtherHandler.process_other(block, markdown_lines)
+            for blk in items:
+                block_id = blk.get('block_id')
+                if not block_id:
+                    continue
+                
+                if page_block_id is None and blk.get('block_type') == 1:
+                    page_block_id = block_id
+                    HeadingHandler.process_page(blk, writer)
+                
+                block_index[block_id] = blk
+                parent_id = blk.get('parent_id')
+                if parent_id:
+                    parent_children_map.setdefault(parent_id, []).append(blk)
+                    if parent_id == page_block_id:
+                        roots.append(block_id)
+                
+                missing = sum(1 for child_id in blk.get('children', []) if child_id not in complete)
+                if missing:
+                    pending[block_id] = missing
+                else:
+                    mark_complete(block_id)
             
-            # 递归处理子块
-            if block_id in parent_children_map:
-                child_blocks = parent_children_map[block_id]
-                self._process_blocks_recursive(
-                    child_blocks, 
-                    markdown_lines, 
-                    block_index, 
-                    parent_children_map,
-                    all_blocks
-                )
-    
-    def _process_view_with_children(
-        self, 
-        block: Dict[str, Any], 
-        markdown_lines: List[str],
-        block_index: Dict[str, Any],
-        parent_children_map: Dict[str, List],
-        all_blocks: List[Dict[str, Any]]
-    ):
-        """
-        处理视图块及其子块
+            # 按顺序输出已经完整的顶层块
+            while roots and roots[0] in complete:
+                render_root(roots.pop(0))
+                rendered_any = True
         
-        :param block: 块数据
-        :param markdown_lines: Markdown行列表
-        :param block_index: 块索引
-        :param parent_children_map: 父子关系映射
-        :param all_blocks: 所有块的列表
-        """
-        block_id = block.get('block_id', '')
+        # 数据已全部到达：剩余顶层块即使子块缺失也照常输出
+        for root_id in roots:
+            render_root(root_id)
+            rendered_any = True
         
-        # 视图块本身可能没有内容，但需要处理其子块
-        # 使用 parent_children_map 获取子块，而不是 block.get('children')
-        if block_id in parent_children_map:
-            child_blocks = parent_children_map[block_id]
-            for child_block in child_blocks:
-                self._process_single_block(
-                    child_block, 
-                    markdown_lines, 
-                    block_index, 
-                    parent_children_map, 
-                    all_blocks
-                )
+        # 没有挂在页面块下的块时，与批量模式一样回退到处理剩余的所有块
+        if not rendered_any:
+            context.index = DocumentIndex(block_index.values())
+            remaining = [blk for blk in context.index.all_blocks if blk['block_id'] != page_block_id]
+            top_level_blocks = self._find_top_level_blocks(remaining, page_block_id, context.index.parent_children_map)
+            self._render_blocks(top_level_blocks, writer, context)
     
-    def _process_quote_container_with_children(
-        self, 
-        block: Dict[str, Any], 
-        markdown_lines: List[str],
-        block_index: Dict[str, Any],
-        parent_children_map: Dict[str, List],
-        all_blocks: List[Dict[str, Any]]
-    ):
+    @staticmethod
+    def _collect_subtree(root_id: str, block_index: Dict[str, Any], parent_children_map: Dict[str, List]) -> List[Dict[str, Any]]:
         """
-        处理引用容器块及其子块
+        收集以 root_id 为根的子树中的所有块（先序，兄弟块保持文档顺序）
         
-        :param block: 块数据
-        :param markdown_lines: Markdown行列表
+        :param root_id: 根块ID
         :param block_index: 块索引
         :param parent_children_map: 父子关系映射
-        :param all_blocks: 所有块的列表
+        :return: 子树中的块列表
         """
-        block_id = block.get('block_id', '')
-        
-        # 引用容器块需要处理其子块，并用引用格式包裹
-        # 使用 parent_children_map 获取子块，而不是 block.get('children')
-        if block_id in parent_children_map:
-            child_blocks = parent_children_map[block_id]
-            child_lines = []
-            for child_block in child_blocks:
-                child_type = child_block.get('block_type')
-                # 如果子块是引用块(block_type == 15)，直接提取内容，不再添加引用前缀
-                # 因为外层已经会添加引用前缀
-                if child_type == 15:
-                    elements = child_block.get('quote', {}).get('elements', [])
-                    text_parts = []
-                    for element in elements:
-                        content = BaseHandler.extract_text_with_style(element)
-                        if content:
-                            text_parts.append(content)
-                    if text_parts:
-                        child_lines.append(''.join(text_parts))
-                else:
-                    self._process_single_block(
-                        child_block, 
-                        child_lines, 
-                        block_index, 
-                        parent_children_map, 
-                        all_blocks
-                    )
-            
-            # 将子块内容用引用格式包裹
-            for line in child_lines:
-                if line.strip():
-                    markdown_lines.append(f"> {line}")
-                else:
-                    markdown_lines.append(">")
-            BaseHandler.add_empty_line(markdown_lines)
+        subtree = []
+        stack = [block_index[root_id]]
+        while stack:
+            blk = stack.pop()
+            subtree.append(blk)
+            stack.extend(reversed(parent_children_map.get(blk['block_id'], [])))
+        return subtree
     
-    def _process_callout_with_children(
+    def _render_blocks(
         self, 
-        block: Dict[str, Any], 
+        blocks_to_process: Iterable[Dict[str, Any]], 
         markdown_lines: List[str],
-        block_index: Dict[str, Any],
-        parent_children_map: Dict[str, List],
-        all_blocks: List[Dict[str, Any]]
+        context: RenderContext
     ):
         """
-        处理高亮块及其子块
+        按文档顺序处理块列表及其所有后代块
+        使用显式栈代替递归，嵌套深度不受 Python 递归深度限制；
+        容器块（ContainerHandler）在子块输出前后分别调用 enter/exit
         
-        :param block: 块数据
-        :param markdown_lines: Markdown行列表
-        :param block_index: 块索引
-        :param parent_children_map: 父子关系映射
-        :param all_blocks: 所有块的列表
+        :param blocks_to_process: 要处理的块列表
+        :param markdown_lines: Markdown写入器（或行列表）
+        :param context: 渲染上下文
         """
-        block_id = block.get('block_id', '')
-        callout_data = block.get('callout', {})
-        emoji_id = callout_data.get('emoji_id', '')
-        
-        # 获取子块内容
-        # 使用 parent_children_map 获取子块，而不是 block.get('children')
-        if block_id in parent_children_map:
-            child_blocks = parent_children_map[block_id]
-            child_lines = []
-            for child_block in child_blocks:
-                self._process_single_block(
-                    child_block, 
-                    child_lines, 
-                    block_index, 
-                    parent_children_map, 
-                    all_blocks
-                )
+        index = context.index
+        # 栈帧: (_VISIT, 注册表, 块, 输出行) / (_VISIT_CHILD, 容器处理器, 子块, 输出行)
+        #       / (_EXIT, 容器处理器, 容器块, (输出行, 子块输出行))
+        stack = [(_VISIT, MARKDOWN_HANDLERS, block, markdown_lines) for block in reversed(list(blocks_to_process))]
+        while stack:
+            action, handler_or_registry, block, lines = stack.pop()
             
-            # 将子块内容用引用格式包裹
-            emoji_str = f"[{emoji_id}] " if emoji_id else ""
-            for line in child_lines:
-                if line.strip():
-                    markdown_lines.append(f"> {emoji_str}{line}")
-                    emoji_str = ""  # 只在第一行显示emoji
-                else:
-                    markdown_lines.append(">")
-            BaseHandler.add_empty_line(markdown_lines)
-        else:
+            if action == _EXIT:
+                parent_lines, child_lines = lines
+                handler_or_registry.exit(self, block, parent_lines, child_lines, context)
+                continue
+            
+            if action == _VISIT_CHILD:
+                # 容器块的直接子块：容器可以自行处理，否则按容器内注册表分发
+                if handler_or_registry.render_child(self, block, lines, context):
+                    continue
+                registry = MARKDOWN_CONTAINER_HANDLERS
+            else:
+                registry = handler_or_registry
+            
+            handler = registry.get(block.get('block_type'))
+            child_blocks = index.children(block.get('block_id', ''))
+            
+            if isinstance(handler, ContainerHandler):
+                child_lines = handler.enter(self, block, lines, context)
+                if child_lines is None:
+                    continue
+                stack.append((_EXIT, handler, block, (lines, child_lines)))
+                stack.extend((_VISIT_CHILD, handler, child, child_lines) for child in reversed(child_blocks))
+                continue
+            
+            # 处理函数返回 True 表示已自行处理子块（如表格），跳过子块
+            if handler(self, block, lines, context):
+                continue
+            stack.extend((_VISIT, MARKDOWN_HANDLERS, child, lines) for child in reversed(child_blocks))
+
+
+# 遍历栈帧类型
+_VISIT = 0
+_VISIT_CHILD = 1
+_EXIT = 2
+
+
+# ---------------------------------------------------------------------------
+# 内置块处理器注册
+# 处理函数签名为 (adapter, block, markdown_lines, context)，context 为渲染上下文（RenderContext），
+# 返回 True 表示跳过子块
+# ---------------------------------------------------------------------------
+
+def _simple(func):
+    """
+    包装只接收 (block, markdown_lines) 的处理函数
+
+    :param func: 处理函数
+    :return: 注册表处理函数
+    """
+    def handler(adapter, block, markdown_lines, context):
+        func(block, markdown_lines)
+    return handler
+
+
+def _with_context(func):
+    """
+    包装接收 (block, markdown_lines, context) 的处理函数
+
+    :param func: 处理函数
+    :return: 注册表处理函数
+    """
+    def handler(adapter, block, markdown_lines, context):
+        func(block, markdown_lines, context)
+    return handler
+
+
+def _process_heading(adapter, block, markdown_lines, context):
+    """标题块 (heading1-heading9)"""
+    HeadingHandler.process_heading(block, block['block_type'] - 2, markdown_lines, context)
+
+
+def _process_heading_top_level(adapter, block, markdown_lines, context):
+    """标题块，遇到标题块时重置有序列表序号计数器"""
+    context.ordered_list_index = 1
+    _process_heading(adapter, block, markdown_lines, context)
+
+
+def _process_divider(adapter, block, markdown_lines, context):
+    """分割线"""
+    DividerHandler.process_divider(markdown_lines)
+
+
+def _process_table(adapter, block, markdown_lines, context):
+    """表格块已处理所有单元格内容，跳过子块"""
+    TableHandler.process_table(block, markdown_lines, index=context.index)
+    return True
+
+
+def _skip(adapter, block, markdown_lines, context):
+    """表格单元格不单独处理，由表格块统一处理"""
+    return True
+
+
+class _CalloutContainer(ContainerHandler):
+    """高亮块：子块内容加引用前缀，首行显示 emoji"""
+
+    def enter(self, adapter, block, lines, context):
+        if not context.index.children(block.get('block_id', '')):
             # 如果没有子块，尝试从 callout 的 elements 获取内容
-            TextHandler.process_callout(block, markdown_lines)
-    
-    def _process_single_block(
-        self, 
-        block: Dict[str, Any], 
-        markdown_lines: List[str],
-        block_index: Dict[str, Any],
-        parent_children_map: Dict[str, List],
-        all_blocks: List[Dict[str, Any]]
-    ):
-        """
-        处理单个块
-        
-        :param block: 块数据
-        :param markdown_lines: Markdown行列表
-        :param block_index: 块索引
-        :param parent_children_map: 父子关系映射
-        :param all_blocks: 所有块的列表
-        """
-        block_type = block.get('block_type')
-        block_id = block.get('block_id', '')
-        
-        # 文本块
-        if block_type == 2:
-            TextHandler.process_text(block, markdown_lines)
-        # 标题块
-        elif 3 <= block_type <= 11:
-            level = block_type - 2
-            HeadingHandler.process_heading(block, level, markdown_lines)
-        # 列表块
-        elif block_type == 12:
-            ListHandler.process_bullet_list(block, markdown_lines)
-        elif block_type == 13:
-            ListHandler.process_ordered_list(block, markdown_lines)
-        # 代码块
-        elif block_type == 14:
-            CodeHandler.process_code(block, markdown_lines)
-        # 引用块
-        elif block_type == 15:
-            QuoteHandler.process_quote(block, markdown_lines)
-        # 待办事项
-        elif block_type == 17:
-            TextHandler.process_todo(block, markdown_lines)
-        # 其他块类型
-        elif block_type == 22:
-            DividerHandler.process_divider(markdown_lines)
-        elif block_type == 27:
-            ImageHandler.process_image(block, markdown_lines)
-        elif block_type == 31:  # 表格
-            TableHandler.process_table(block, markdown_lines, all_blocks)
-            # 表格块已处理所有单元格内容，跳过子块递归处理
-            return
-        # 表格单元格 (block_type == 32) 不单独处理，由表格块统一处理
-        elif block_type == 32:  # 表格单元格
-            # 跳过，已由表格块处理
-            return
-        else:
-            # 对于其他类型，简单记录
-            OtherHandler.process_other(block, markdown_lines)
-        
-        # 递归处理子块
-        if block_id in parent_children_map:
-            child_blocks = parent_children_map[block_id]
-            self._process_blocks_recursive(
-                child_blocks, 
-                markdown_lines, 
-                block_index, 
-                parent_children_map,
-                all_blocks
-            )
\ No newline at end of file
+            TextHandler.process_callout(block, lines)
+            return None
+        emoji_id = block.get('callout', {}).get('emoji_id', '')
+        # 只在第一行显示emoji
+        lines.push_prefix(QuotePrefix(f"[{emoji_id}] " if emoji_id else ""))
+        return lines
+
+    def exit(self, adapter, block, lines, child_lines, context):
+        lines.pop_prefix()
+        BaseHandler.add_empty_line(lines)
+
+
+class _ViewContainer(ContainerHandler):
+    """视图块：本身没有内容，子块直接输出"""
+
+
+class _QuoteContainer(ContainerHandler):
+    """引用容器：子块内容加引用前缀"""
+
+    def enter(self, adapter, block, lines, context):
+        if not context.index.children(block.get('block_id', '')):
+            return None
+        lines.push_prefix(QuotePrefix())
+        return lines
+
+    def render_child(self, adapter, child, child_lines, context):
+        # 如果子块是引用块(block_type == 15)，直接提取内容，不再添加引用前缀
+        # 因为外层已经会添加引用前缀
+        if child.get('block_type') != 15:
+            return False
+        text_parts = []
+        for element in child.get('quote', {}).get('elements', []):
+            content = BaseHandler.extract_text_with_style(element)
+            if content:
+                text_parts.append(content)
+        if text_parts:
+            child_lines.append(''.join(text_parts))
+        return True
+
+    def exit(self, adapter, block, lines, child_lines, context):
+        lines.pop_prefix()
+        BaseHandler.add_empty_line(lines)
+
+
+_MARKDOWN_SIMPLE_HANDLERS = {
+    1: HeadingHandler.process_page,                                 # 页面(Page)
+    2: TextHandler.process_text,                                    # 文本块
+    12: ListHandler.process_bullet_list,                            # 无序列表
+    14: CodeHandler.process_code,                                   # 代码块
+    15: QuoteHandler.process_quote,                                 # 引用
+    17: TextHandler.process_todo,                                   # 待办事项
+    18: BitableHandler.process_bitable,                             # 多维表格
+    20: ChatCardHandler.process_chat_card,                          # 会话卡片
+    21: DiagramHandler.process_diagram,                             # 流程图 & UML
+    23: FileHandler.process_file,                                   # 文件
+    24: GridHandler.process_grid,                                   # 分栏
+    25: GridColumnHandler.process_grid_column,                      # 分栏列
+    26: IFrameHandler.process_iframe,                               # 内嵌 Block
+    28: ISVHandler.process_isv,                                     # 开放平台小组件
+    29: MindNoteHandler.process_mind_note,                          # 思维笔记
+    35: TaskHandler.process_task,                                   # 任务
+    36: OKRHandler.process_okr,                                     # OKR
+    37: OKRHandler.process_okr,                                     # OKR 目标
+    38: OKRHandler.process_okr,                                     # OKR 关键结果
+    39: OKRHandler.process_okr,                                     # OKR 进展
+    40: DocumentWidgetHandler.process_document_widget,              # 新版文档小组件
+    41: JiraIssueHandler.process_jira_issue,                        # Jira问题
+    42: WikiCatalogHandler.process_wiki_catalog,                    # Wiki目录
+    43: BoardHandler.process_board,                                 # 画板
+    44: AgendaHandler.process_agenda,                               # 议程
+    45: AgendaItemHandler.process_agenda_item,                      # 议程项
+    46: AgendaItemTitleHandler.process_agenda_item_title,           # 议程项标题
+    47: AgendaItemContentHandler.process_agenda_item_content,       # 议程项内容
+    48: LinkPreviewHandler.process_link_preview,                    # 链接预览
+    49: SourceSyncedHandler.process_source_synced,                  # 源同步块
+    50: ReferenceSyncedHandler.process_reference_synced,            # 引用同步块
+    51: SubPageListHandler.process_sub_page_list,                   # 子页面列表
+    52: AitemplateHandler.process_aitemplate,                       # AI模板
+    999: UndefinedHandler.process_undefined,                        # 未支持
+}
+
+# 需要渲染上下文（序号计数器、输出目录、API客户端）的处理函数
+_MARKDOWN_CONTEXT_HANDLERS = {
+    13: ListHandler.process_ordered_list,                           # 有序列表
+    27: ImageHandler.process_image,                                 # 图片
+    30: SheetHandler.process_sheet,                                 # 电子表格
+}
+
+# 高亮块、视图、引用容器内部的子块只处理以下类型，其余由 OtherHandler 记录
+_MARKDOWN_CONTAINER_SIMPLE_TYPES = (2, 12, 13, 14, 15, 17, 27)
+
+for _block_type, _func in _MARKDOWN_SIMPLE_HANDLERS.items():
+    MARKDOWN_HANDLERS.register(_block_type)(_simple(_func))
+for _block_type, _func in _MARKDOWN_CONTEXT_HANDLERS.items():
+    MARKDOWN_HANDLERS.register(_block_type)(_with_context(_func))
+for _block_type in _MARKDOWN_CONTAINER_SIMPLE_TYPES:
+    MARKDOWN_CONTAINER_HANDLERS.register(_block_type)(MARKDOWN_HANDLERS.get(_block_type))
+
+_HEADING_TYPES = tuple(range(3, 12))
+MARKDOWN_HANDLERS.register(*_HEADING_TYPES)(_process_heading_top_level)
+MARKDOWN_CONTAINER_HANDLERS.register(*_HEADING_TYPES)(_process_heading)
+
+for _registry in (MARKDOWN_HANDLERS, MARKDOWN_CONTAINER_HANDLERS):
+    _registry.register(22)(_process_divider)
+    _registry.register(31)(_process_table)
+    _registry.register(32)(_skip)
+    _registry.register_default(_simple(OtherHandler.process_other))
+
+MARKDOWN_HANDLERS.register(19)(_CalloutContainer())
+MARKDOWN_HANDLERS.register(33)(_ViewContainer())
+MARKDOWN_HANDLERS.register(34)(_QuoteContainer())
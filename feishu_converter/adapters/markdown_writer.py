@@ -0,0 +1,119 @@
+"""
+流式Markdown输出
+块处理器直接写入文件，不再在内存中累积全部行
+"""
+
+from typing import Callable, List, Optional, TextIO
+
+
+class QuotePrefix:
+    """
+    引用前缀：非空行加 "> "，空行输出 ">"
+
+    :param first_prefix: 只加在第一个非空行前的内容（如高亮块的 emoji）
+    """
+
+    def __init__(self, first_prefix: str = ""):
+        self.first_prefix = first_prefix
+
+    def __call__(self, line: str) -> str:
+        if not line.strip():
+            return ">"
+        line = f"> {self.first_prefix}{line}"
+        self.first_prefix = ""
+        return line
+
+
+class _Level:
+    """前缀层级：记录该层级的变换函数和写入的最后一行（变换前）"""
+
+    __slots__ = ('transform', 'last_line', 'count')
+
+    def __init__(self, transform: Optional[Callable[[str], str]]):
+        self.transform = transform
+        self.last_line: Optional[str] = None
+        self.count = 0
+
+
+class MarkdownWriter:
+    """
+    流式Markdown写入器
+    对处理器表现为行列表（append/extend/len/[-1]），行之间以换行连接，与 '\\n'.join 的结果一致，
+    累积到 buffer_size 个字符后写出。
+    容器块（高亮块、引用容器）通过 push_prefix/pop_prefix 为子块的行加前缀，不再先收集到子列表再复制；
+    len 和 [-1] 只反映当前层级写入的行（前缀变换前），与处理器写入子列表时看到的一致
+    """
+
+    def __init__(self, out: TextIO, buffer_size: int = 64 * 1024):
+        """
+        初始化写入器
+
+        :param out: 输出文件对象
+        :param buffer_size: 缓冲区大小（字符数）
+        """
+        self.out = out
+        self.buffer_size = buffer_size
+        self._levels: List[_Level] = [_Level(None)]
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._started = False
+
+    def append(self, line: str):
+        """
+        写入一行
+
+        :param line: 行内容
+        """
+        # 从最内层开始逐层加前缀
+        for level in reversed(self._levels):
+            level.last_line = line
+            level.count += 1
+            if level.transform is not None:
+                line = level.transform(line)
+
+        if self._started:
+            self._buffer.append('\n')
+            self._buffered += 1
+        self._started = True
+        self._buffer.append(line)
+        self._buffered += len(line)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def extend(self, lines):
+        """
+        写入多行
+
+        :param lines: 行列表
+        """
+        for line in lines:
+            self.append(line)
+
+    def push_prefix(self, transform: Callable[[str], str]):
+        """
+        进入新的前缀层级，之后写入的行先经过 transform 再写入外层
+
+        :param transform: 行变换函数（如 QuotePrefix）
+        """
+        self._levels.append(_Level(transform))
+
+    def pop_prefix(self):
+        """退出当前前缀层级"""
+        if len(self._levels) > 1:
+            self._levels.pop()
+
+    def flush(self):
+        """将缓冲区写入输出文件"""
+        if self._buffer:
+            self.out.write(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def __len__(self) -> int:
+        return self._levels[-1].count
+
+    def __getitem__(self, position: int) -> str:
+        # 处理器只会读取最后一行（如 BaseHandler.add_empty_line）
+        if position != -1 or self._levels[-1].last_line is None:
+            raise IndexError("MarkdownWriter 只能读取当前层级的最后一行")
+        return self._levels[-1].last_line
@@ -3,14 +3,14 @@ PDF适配器
 将飞书文档内容转换为PDF格式
 """
 
+import io
 import logging
 import os
 import re
 import tempfile
-from typing import Dict, Any, Optional
+from typing import Any, BinaryIO, Dict, Optional, Union
 from urllib.parse import urlparse
 
-import requests
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
 from reportlab.lib.pagesizes import A4, letter
@@ -20,6 +20,11 @@ from reportlab.platypus import (Image as RLImage, PageBreak, Paragraph, SimpleDo
                                 Spacer, Table, TableStyle)
 
 from ..interfaces import IFormatAdapter
+from ..process.document_index import DocumentIndex
+from ..process.registry import PDF_HANDLERS
+from ..process.render_context import RenderContext
+from ..utils.retry_utils import get_shared_session
+from ..utils.rate_limiter import get_rate_limiter
 
 
 class PdfAdapter(IFormatAdapter):
@@ -37,7 +42,6 @@ class PdfAdapter(IFormatAdapter):
         self.logger = logging.getLogger(__name__)
         self.styles = getSampleStyleSheet()
         self.download_images = download_images
-        self.temp_dir = None
         self.access_token = None
 
         # 自定义样式
@@ -150,16 +154,42 @@ class PdfAdapter(IFormatAdapter):
         :return: 转换是否成功
         """
         self.logger.info(f"开始将文档内容转换为PDF: {output_path}")
+        if self._build(content, output_path, output_path):
+            self.logger.info(f"PDF转换成功: {output_path}")
+            return True
+        return False
+
+    def render(self, content: Dict[str, Any]) -> Optional[bytes]:
+        """
+        将文档内容渲染为PDF数据（不写文件），供渲染和写出分开执行的批量流水线使用
+
+        :param content: 飞书文档内容
+        :return: PDF数据，失败返回None
+        """
+        buffer = io.BytesIO()
+        if self._build(content, buffer):
+            return buffer.getvalue()
+        return None
 
-        # 创建临时目录用于存储下载的图片
+    def _build(self, content: Dict[str, Any], target: Union[str, BinaryIO], output_path: Optional[str] = None) -> bool:
+        """
+        生成PDF
+
+        :param content: 飞书文档内容
+        :param target: 输出文件路径或文件对象
+        :param output_path: 输出路径（用于确定图片目录），渲染到内存时为None
+        :return: 是否成功
+        """
+        # 每次转换使用独立的渲染上下文，创建临时目录用于存储下载的图片
+        context = RenderContext(output_path)
         if self.download_images:
-            self.temp_dir = tempfile.mkdtemp()
-            self.logger.debug(f"创建临时目录: {self.temp_dir}")
+            context.temp_dir = tempfile.mkdtemp()
+            self.logger.debug(f"创建临时目录: {context.temp_dir}")
 
         try:
             # 创建PDF文档
             doc = SimpleDocTemplate(
-                output_path,
+                target,
                 pagesize=A4,
                 rightMargin=72,
                 leftMargin=72,
@@ -169,72 +199,36 @@ class PdfAdapter(IFormatAdapter):
             story = []
 
             # 处理文档内容
-            self._process_blocks(content, story)
+            self._process_blocks(content, story, context)
 
             # 生成PDF
             doc.build(story)
-
-            self.logger.info(f"PDF转换成功: {output_path}")
             return True
         except Exception as e:
             self.logger.error(f"PDF转换失败: {str(e)}")
             return False
         finally:
             # 清理临时文件
-            if self.temp_dir and os.path.exists(self.temp_dir):
+            if context.temp_dir and os.path.exists(context.temp_dir):
                 import shutil
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
-                self.logger.debug(f"清理临时目录: {self.temp_dir}")
+                shutil.rmtree(context.temp_dir, ignore_errors=True)
+                self.logger.debug(f"清理临时目录: {context.temp_dir}")
 
-    def _process_blocks(self, content: Dict[str, Any], story: list):
+    def _process_blocks(self, content: Dict[str, Any], story: list, context: RenderContext):
         """
         处理文档块内容
 
         :param content: 文档内容
         :param story: PDF内容列表
+        :param context: 渲染上下文
         """
-        blocks = content.get('items', [])
-        block_index = {blk['block_id']: blk for blk in blocks}
-
-        for block in blocks:
-            block_type = block.get('block_type')
-
-            # 根据块类型处理内容
-            if block_type == 1:  # 页面(Page)
-                self._process_page(block, story)
-            elif block_type in [3, 4, 5, 6, 7, 8, 9, 10, 11]:  # 标题
-                self._process_heading(block, block_type, story)
-            elif block_type == 2:  # 文本块
-                self._process_text_block(block, story)
-            elif block_type == 12:  # 无序列表
-                self._process_bullet_list(block, story, block_index)
-            elif block_type == 13:  # 有序列表
-                self._process_ordered_list(block, story, block_index)
-            elif block_type == 14:  # 代码块
-                self._process_code(block, story)
-            elif block_type == 15:  # 引用
-                self._process_quote(block, story)
-            elif block_type == 17:  # 待办事项
-                self._process_todo(block, story)
-            elif block_type == 18:  # 多维表格
-                self._process_bitable(block, story)
-            elif block_type == 19:  # 高亮块
-                self._process_callout(block, story)
-            elif block_type == 22:  # 分割线
-                self._process_divider(story)
-            elif block_type == 27:  # 图片
-                self._process_image(block, story)
-            elif block_type == 31:  # 表格
-                self._process_table(block, story, block_index)
-            elif block_type == 30:  # 电子表格
-                self._process_sheet(block, story)
-            elif block_type == 43:  # 画板
-                self._process_board(block, story)
-            elif block_type == 44:  # 议程
-                self._process_agenda(block, story)
-            elif block_type in [20, 21, 23, 24, 25, 26, 28, 29, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 45, 46, 47, 48, 49, 50, 51, 52, 999]:
-                # 其他块类型，添加占位符
-                self._process_placeholder(block, block_type, story)
+        context.index = DocumentIndex(content.get('items', []))
+
+        for block in context.index.all_blocks:
+            # 根据块类型查表处理内容，未注册的块类型跳过
+            handler = PDF_HANDLERS.get(block.get('block_type'))
+            if handler:
+                handler(self, block, story, context)
 
     def _extract_text_content(self, elements: list) -> str:
         """从元素中提取文本内容，支持样式"""
@@ -507,7 +501,7 @@ class PdfAdapter(IFormatAdapter):
 
         return ''
 
-    def _process_image(self, block: Dict[str, Any], story: list):
+    def _process_image(self, block: Dict[str, Any], story: list, context: RenderContext):
         """处理图片"""
         image_data = block.get('image', {})
         token = image_data.get('token', '')
@@ -516,7 +510,7 @@ class PdfAdapter(IFormatAdapter):
 
         if self.download_images and token:
             # 下载图片
-            image_path = self._download_image(token)
+            image_path = self._download_image(token, context.temp_dir)
             if image_path and os.path.exists(image_path):
                 try:
                     # 计算合适的尺寸（最大宽度450pt）
@@ -538,8 +532,8 @@ class PdfAdapter(IFormatAdapter):
         story.append(Paragraph(f"[图片: {token[:20]}...]", self.custom_styles['Normal']))
         story.append(Spacer(1, 6))
 
-    def _download_image(self, token: str) -> Optional[str]:
-        """下载图片"""
+    def _download_image(self, token: str, temp_dir: str) -> Optional[str]:
+        """下载图片到临时目录"""
         if not self.access_token:
             return None
 
@@ -547,22 +541,23 @@ class PdfAdapter(IFormatAdapter):
             url = f"https://open.feishu.cn/open-apis/drive/v1/medias/{token}/download"
             headers = {"Authorization": f"Bearer {self.access_token}"}
 
-            response = requests.get(url, headers=headers, stream=True)
-            response.raise_for_status()
+            get_rate_limiter().acquire("drive_media")
+            with get_shared_session().get(url, headers=headers, stream=True, timeout=30) as response:
+                response.raise_for_status()
 
-            # 获取文件扩展名
-            content_type = response.headers.get('content-type', '')
-            ext = '.jpg'
-            if 'png' in content_type:
-                ext = '.png'
-            elif 'gif' in content_type:
-                ext = '.gif'
+                # 获取文件扩展名
+                content_type = response.headers.get('content-type', '')
+                ext = '.jpg'
+                if 'png' in content_type:
+                    ext = '.png'
+                elif 'gif' in content_type:
+                    ext = '.gif'
 
-            # 保存图片
-            image_path = os.path.join(self.temp_dir, f"{token}{ext}")
-            with open(image_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+                # 保存图片
+                image_path = os.path.join(temp_dir, f"{token}{ext}")
+                with open(image_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        f.write(chunk)
 
             return image_path
         except Exception as e:
@@ -638,3 +633,93 @@ class PdfAdapter(IFormatAdapter):
         story.append(Spacer(1, 3))
         story.append(Paragraph(f"[{name}]", self.custom_styles['Normal']))
         story.append(Spacer(1, 3))
+
+
+# 内置块处理器注册，处理函数签名为 (adapter, block, story, context)
+_PDF_METHODS = {
+    1: '_process_page',             # 页面(Page)
+    2: '_process_text_block',       # 文本块
+    14: '_process_code',            # 代码块
+    15: '_process_quote',           # 引用
+    17: '_process_todo',            # 待办事项
+    18: '_process_bitable',         # 多维表格
+    19: '_process_callout',         # 高亮块
+    30: '_process_sheet',           # 电子表格
+    43: '_process_board',           # 画板
+    44: '_process_agenda',          # 议程
+}
+
+# 需要块索引的处理方法
+_PDF_INDEXED_METHODS = {
+    12: '_process_bullet_list',     # 无序列表
+    13: '_process_ordered_list',    # 有序列表
+    31: '_process_table',           # 表格
+}
+
+# 添加占位符的块类型
+_PDF_PLACEHOLDER_TYPES = (
+    20, 21, 23, 24, 25, 26, 28, 29, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42,
+    45, 46, 47, 48, 49, 50, 51, 52, 999
+)
+
+
+def _pdf_method(method_name: str):
+    """包装 (block, story) 形式的适配器方法"""
+    def handler(adapter, block, story, context):
+        getattr(adapter, method_name)(block, story)
+    return handler
+
+
+def _pdf_indexed_method(method_name: str):
+    """包装 (block, story, block_index) 形式的适配器方法"""
+    def handler(adapter, block, story, context):
+        getattr(adapter, method_name)(block, story, context.index.block_index)
+    return handler
+
+
+def _pdf_heading(adapter, block, story, context):
+    """标题"""
+    adapter._process_heading(block, block['block_type'], story)
+
+
+def _pdf_divider(adapter, block, story, context):
+    """分割线"""
+    adapter._process_divider(story)
+
+
+def _pdf_image(adapter, block, story, context):
+    """图片（下载到本次转换的临时目录）"""
+    adapter._process_image(block, story, context)
+
+
+def _pdf_placeholder(adapter, block, story, context):
+    """其他块类型，添加占位符"""
+    adapter._process_placeholder(block, block['block_type'], story)
+
+
+for _block_type, _method_name in _PDF_METHODS.items():
+    PDF_HANDLERS.register(_block_type)(_pdf_method(_method_name))
+for _block_type, _method_name in _PDF_INDEXED_METHODS.items():
+    PDF_HANDLERS.register(_block_type)(_pdf_indexed_method(_method_name))
+PDF_HANDLERS.register(*range(3, 12))(_pdf_heading)
+PDF_HANDLERS.register(22)(_pdf_divider)
+PDF_HANDLERS.register(27)(_pdf_image)
+PDF_HANDLERS.register(*_PDF_PLACEHOLDER_TYPES)(_pdf_placeholder)
+
+
+# 渲染进程内复用的适配器（见 render_pdf）
+_process_adapter: Optional[PdfAdapter] = None
+
+
+def render_pdf(content: Dict[str, Any]) -> Optional[bytes]:
+    """
+    将文档内容渲染为PDF数据
+    作为进程池的任务函数在渲染进程中执行，每个进程只创建一次适配器
+
+    :param content: 飞书文档内容
+    :return: PDF数据，失败返回None
+    """
+    global _process_adapter
+    if _process_adapter is None:
+        _process_adapter = PdfAdapter()
+    return _process_adapter.render(content)
@@ -7,10 +7,19 @@ import requests
 import json
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator
 
-from .utils.retry_utils import retry_with_backoff, RetryConfig, RequestSessionManager
+from .utils.retry_utils import (
+    retry_with_backoff,
+    RetryConfig,
+    RateLimitError,
+    check_rate_limit,
+    get_shared_session_manager
+)
+from .utils.token_utils import get_token_provider
+from .utils.rate_limiter import get_rate_limiter, endpoint_family
 
 
 class PermissionType(Enum):
@@ -30,60 +39,60 @@ class FeishuDocAPI:
     """
     
     BASE_URL = "https://open.feishu.cn/open-apis"
+    # 批量获取文档元数据接口单次最多查询的文档数
+    BATCH_QUERY_LIMIT = 200
+    # 批量解析时依次尝试的文档类型
+    RESOLVE_DOC_TYPES = ("docx", "wiki", "sheet", "bitable")
     
-    def __init__(self):
+    def __init__(self, pool_size: Optional[int] = None):
         """
         初始化API客户端
+        
+        :param pool_size: 共享连接池大小，默认读取环境变量 FEISHU_HTTP_POOL_SIZE
         """
         self.app_id = os.getenv("FEISHU_APP_ID")
         self.app_secret = os.getenv("FEISHU_APP_SECRET")
         self.access_token = None
         self.logger = logging.getLogger(__name__)
-        self.session_manager = RequestSessionManager(
-            max_retries=3,
-            backoff_factor=0.5,
-            status_forcelist=(500, 502, 503, 504),
-            timeout=30.0
-        )
+        # 所有实例共享进程级连接池，避免每次请求重新建立TCP+TLS连接
+        self.session_manager = get_shared_session_manager(pool_size)
+        # 同一应用的所有实例共享令牌，避免每个实例各自请求
+        self.token_provider = get_token_provider(self.app_id, self.app_secret, self.BASE_URL)
     
     @retry_with_backoff(RetryConfig(
-        max_retries=3,
-        base_delay=1.0,
-        retry_exceptions=(requests.exceptions.RequestException,)
+        max_retries=5,
+        retry_exceptions=(RateLimitError,)
     ))
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        通过共享连接池发送HTTP请求，发送前按接口族获取限流配额
+        触发服务端频控时暂停同一接口族的所有请求，并在配额重置后重试
+        
+        :param method: HTTP方法
+        :param url: 请求URL
+        :param kwargs: 其他请求参数
+        :return: 响应对象
+        """
+        limiter = get_rate_limiter()
+        family = endpoint_family(method, url)
+        limiter.acquire(family)
+        response = self.session_manager.request(method, url, **kwargs)
+        try:
+            check_rate_limit(response)
+        except RateLimitError as e:
+            limiter.pause(family, e.retry_after)
+            raise
+        return response
+    
     def get_access_token(self) -> Optional[str]:
         """
         获取访问令牌
+        令牌由按 app_id 共享的提供者统一缓存，过期前会在后台自动刷新
         
         :return: 访问令牌
         """
-        if self.access_token:
-            return self.access_token
-        
-        url = f"{self.BASE_URL}/auth/v3/tenant_access_token/internal"
-        headers = {
-            "Content-Type": "application/json; charset=utf-8"
-        }
-        data = {
-            "app_id": self.app_id,
-            "app_secret": self.app_secret
-        }
-        
-        try:
-            with self.session_manager as session:
-                response = session.post(url, headers=headers, json=data)
-                response.raise_for_status()
-                
-                result = response.json()
-                if result.get("code") == 0:
-                    self.access_token = result["tenant_access_token"]
-                    return self.access_token
-                else:
-                    self.logger.error(f"获取访问令牌失败: {result}")
-                    return None
-        except Exception as e:
-            self.logger.error(f"请求访问令牌异常: {str(e)}")
-            return None
+        self.access_token = self.token_provider.get_token()
+        return self.access_token
     
     def create_document(self, title: str = "未命名文档", folder_token: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
@@ -111,7 +120,7 @@ class FeishuDocAPI:
             data["folder_token"] = folder_token
 
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = self._request("POST", url, headers=headers, json=data)
             response.raise_for_status()
 
             result = response.json()
@@ -163,7 +172,7 @@ class FeishuDocAPI:
             data["index"] = index
 
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = self._request("POST", url, headers=headers, json=data)
             response.raise_for_status()
 
             result = response.json()
@@ -284,7 +293,7 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = self._request("POST", url, headers=headers, json=data)
             response.raise_for_status()
 
             result = response.json()
@@ -336,7 +345,7 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.patch(url, headers=headers, json=data)
+            response = self._request("PATCH", url, headers=headers, json=data)
             response.raise_for_status()
 
             result = response.json()
@@ -399,7 +408,7 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.patch(url, headers=headers, json=data)
+            response = self._request("PATCH", url, headers=headers, json=data)
             response.raise_for_status()
 
             result = response.json()
@@ -447,7 +456,7 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.delete(url, headers=headers, json=data)
+            response = self._request("DELETE", url, headers=headers, json=data)
             response.raise_for_status()
 
             result = response.json()
@@ -490,16 +499,15 @@ class FeishuDocAPI:
         }
         
         try:
-            with self.session_manager as session:
-                response = session.get(url, headers=headers)
-                response.raise_for_status()
-                
-                result = response.json()
-                if result.get("code") == 0:
-                    return result["data"]["document"]
-                else:
-                    self.logger.error(f"获取文档信息失败: {result}")
-                    return None
+            response = self._request("GET", url, headers=headers)
+            response.raise_for_status()
+            
+            result = response.json()
+            if result.get("code") == 0:
+                return result["data"]["document"]
+            else:
+                self.logger.error(f"获取文档信息失败: {result}")
+                return None
         except Exception as e:
             self.logger.error(f"请求文档信息异常: {str(e)}")
             return None
@@ -537,57 +545,68 @@ class FeishuDocAPI:
             params["page_token"] = page_token
         
         try:
-            with self.session_manager as session:
-                response = session.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                
-                result = response.json()
-                if result.get("code") == 0:
-                    return result["data"]
-                else:
-                    self.logger.error(f"获取文档块失败: {result}")
-                    return None
+            response = self._request("GET", url, headers=headers, params=params)
+            response.raise_for_status()
+            
+            result = response.json()
+            if result.get("code") == 0:
+                return result["data"]
+            else:
+                self.logger.error(f"获取文档块失败: {result}")
+                return None
         except Exception as e:
             self.logger.error(f"请求文档块异常: {str(e)}")
             return None
     
-    def get_all_document_blocks(self, document_id: str) -> Optional[Dict[str, Any]]:
+    def iter_document_blocks(self, document_id: str, raise_on_error: bool = False) -> Iterator[List[Dict[str, Any]]]:
         """
-        获取文档的所有块（自动处理分页）
+        逐页获取文档块（自动处理分页），每取到一页立即返回，不在内存中累积
         
         :param document_id: 文档ID
-        :return: 所有文档块
+        :param raise_on_error: 某一页获取失败时是否抛出异常，默认直接结束迭代
+        :return: 每页的块列表
         """
-        all_items = []
         page_token = None
         
         while True:
             data = self.get_document_blocks(document_id, page_token)
             if not data:
+                if raise_on_error:
+                    raise RuntimeError(f"获取文档块失败: {document_id}")
                 break
             
-            items = data.get("items", [])
-            all_items.extend(items)
+            yield data.get("items", [])
             
             if not data.get("has_more"):
                 break
             
             page_token = data.get("page_token")
+
+    def get_all_document_blocks(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文档的所有块（自动处理分页）
+        
+        :param document_id: 文档ID
+        :return: 所有文档块
+        """
+        all_items = []
+        for items in self.iter_document_blocks(document_id):
+            all_items.extend(items)
         
         return {"items": all_items}
 
-    def check_permission(self, token: str, token_type: PermissionType = PermissionType.SHEET, permission: str = "view") -> bool:
+    def check_permission(self, token: str, token_type: PermissionType = PermissionType.SHEET, permission: str = "view") -> Optional[bool]:
         """
         检查当前用户是否有权限访问特定资源
         
         :param token: 资源的token
         :param token_type: 资源类型，默认为PermissionType.SHEET（电子表格）
         :param permission: 权限类型，"view"（查看）、"edit"（编辑）或"share"（分享），默认为"view"
-        :return: 是否有权限
+        :return: 是否有权限，无法确定（获取令牌失败、接口出错）时返回None
         """
         access_token = self.get_access_token()
         if not access_token:
-            return False
+            return None
 
         url = f"{self.BASE_URL}/drive/permission/member/permitted"
         headers = {
@@ -602,16 +621,16 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self._request("POST", url, headers=headers, json=payload)
             response.raise_for_status()
 
             result = response.json()
             if result.get("code") == 0:
                 is_permitted = result.get("data", {}).get("is_permitted", False)
-                return is_permitted
+                return bool(is_permitted)
             else:
                 self.logger.error(f"检查权限失败，错误码: {result.get('code')}，消息: {result.get('msg')}")
-                return False
+                return None
         except Exception as e:
             self.logger.error(f"请求权限检查异常: {str(e)}")
             # 尝试获取响应内容
@@ -621,7 +640,7 @@ class FeishuDocAPI:
                     self.logger.error(f"错误响应，错误码: {error_result.get('code')}，消息: {error_result.get('msg')}")
                 except:
                     self.logger.error(f"响应内容: {e.response.text}")
-            return False
+            return None
 
     def get_spreadsheet_info(self, spreadsheet_token: str, user_id_type: str = "open_id") -> Optional[Dict[str, Any]]:
         """
@@ -642,7 +661,7 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.get(url, headers=headers)
+            response = self._request("GET", url, headers=headers)
             response.raise_for_status()
 
             result = response.json()
@@ -705,7 +724,7 @@ class FeishuDocAPI:
                     "Content-Type": "application/json; charset=utf-8"
                 }
                 
-                basic_response = requests.get(basic_info_url, headers=headers)
+                basic_response = self._request("GET", basic_info_url, headers=headers)
                 basic_response.raise_for_status()
                 
                 basic_result = basic_response.json()
@@ -726,7 +745,7 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.get(url, headers=headers)
+            response = self._request("GET", url, headers=headers)
             response.raise_for_status()
 
             result = response.json()
@@ -736,7 +755,7 @@ class FeishuDocAPI:
                 self.logger.error(f"获取电子表格数据失败，错误码: {result.get('code')}，消息: {result.get('msg')}")
                 # 尝试获取电子表格基本信息 https://r3c0qt6yjw.feishu.cn/wiki/WIHiwPrOaiXA0Rk3VjCc8m7snoe#share-JrybdUxoqo5SPfx1KWicf2banSc
                 basic_info_url = f"{self.BASE_URL}/sheets/v3/spreadsheets/{actual_spreadsheet_token}"
-                basic_response = requests.get(basic_info_url, headers=headers)
+                basic_response = self._request("GET", basic_info_url, headers=headers)
                 basic_response.raise_for_status()
 
                 basic_result = basic_response.json()
@@ -756,7 +775,7 @@ class FeishuDocAPI:
         # 如果获取详细数据失败，尝试获取基本信息
         try:
             basic_info_url = f"{self.BASE_URL}/sheets/v3/spreadsheets/{actual_spreadsheet_token}"
-            basic_response = requests.get(basic_info_url, headers=headers)
+            basic_response = self._request("GET", basic_info_url, headers=headers)
             basic_response.raise_for_status()
 
             basic_result = basic_response.json()
@@ -769,6 +788,70 @@ class FeishuDocAPI:
             self.logger.error(f"请求电子表格基本信息也异常: {str(basic_error)}")
             return None
 
+    def get_spreadsheet_values(self, spreadsheet_token: str, range_spec: str) -> Optional[Dict[str, Any]]:
+        """
+        读取单个范围的数据（不回退到基本信息接口，失败直接返回None）
+        
+        :param spreadsheet_token: 电子表格token
+        :param range_spec: 范围，如 "sheetId!A1:C100"
+        :return: 包含 valueRange 的数据，失败返回None
+        """
+        access_token = self.get_access_token()
+        if not access_token:
+            return None
+
+        url = f"{self.BASE_URL}/sheets/v2/spreadsheets/{spreadsheet_token}/values/{range_spec}"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+
+        try:
+            response = self._request("GET", url, headers=headers)
+            response.raise_for_status()
+
+            result = response.json()
+            if result.get("code") == 0:
+                return result.get("data", {})
+            else:
+                self.logger.error(f"获取电子表格范围数据失败，错误码: {result.get('code')}，消息: {result.get('msg')}")
+                return None
+        except Exception as e:
+            self.logger.error(f"请求电子表格范围数据异常: {str(e)}")
+            return None
+
+    def get_spreadsheet_values_batch(self, spreadsheet_token: str, ranges: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        一次请求读取多个范围的数据（v2 values_batch_get 接口）
+        
+        :param spreadsheet_token: 电子表格token
+        :param ranges: 范围列表，如 ["sheetId", "sheetId!A1:C10"]
+        :return: 包含 valueRanges 的数据，失败返回None
+        """
+        access_token = self.get_access_token()
+        if not access_token:
+            return None
+
+        url = f"{self.BASE_URL}/sheets/v2/spreadsheets/{spreadsheet_token}/values_batch_get"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+
+        try:
+            response = self._request("GET", url, headers=headers, params={"ranges": ",".join(ranges)})
+            response.raise_for_status()
+
+            result = response.json()
+            if result.get("code") == 0:
+                return result.get("data", {})
+            else:
+                self.logger.error(f"批量获取电子表格数据失败，错误码: {result.get('code')}，消息: {result.get('msg')}")
+                return None
+        except Exception as e:
+            self.logger.error(f"请求批量获取电子表格数据异常: {str(e)}")
+            return None
+
     def get_doc_content(self, doc_token: str, doc_type: str = "docx") -> Optional[str]:
         """
         使用通用接口获取文档内容
@@ -794,7 +877,7 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = self._request("GET", url, headers=headers, params=params)
             response.raise_for_status()
 
             result = response.json()
@@ -833,7 +916,7 @@ class FeishuDocAPI:
         }
 
         try:
-            response = requests.get(url, headers=headers)
+            response = self._request("GET", url, headers=headers)
             response.raise_for_status()
 
             result = response.json()
@@ -853,6 +936,37 @@ class FeishuDocAPI:
                     self.logger.error(f"响应内容: {e.response.text}")
             return None
 
+    def get_spreadsheet_revision(self, spreadsheet_token: str) -> Optional[int]:
+        """
+        获取电子表格的版本号（v2 元数据接口，一次请求即可判断表格是否有变化）
+        
+        :param spreadsheet_token: 电子表格token
+        :return: 版本号，失败返回None
+        """
+        access_token = self.get_access_token()
+        if not access_token:
+            return None
+
+        url = f"{self.BASE_URL}/sheets/v2/spreadsheets/{spreadsheet_token}/metainfo"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+
+        try:
+            response = self._request("GET", url, headers=headers)
+            response.raise_for_status()
+
+            result = response.json()
+            if result.get("code") == 0:
+                return result.get("data", {}).get("properties", {}).get("revision")
+            else:
+                self.logger.error(f"获取电子表格版本失败，错误码: {result.get('code')}，消息: {result.get('msg')}")
+                return None
+        except Exception as e:
+            self.logger.error(f"请求电子表格版本异常: {str(e)}")
+            return None
+
     def get_spreadsheet_meta(self, spreadsheet_token: str, ext_fields: str = None, user_id_type: str = "open_id") -> Optional[Dict[str, Any]]:
         """
         获取电子表格的元数据
@@ -879,7 +993,7 @@ class FeishuDocAPI:
             params["user_id_type"] = user_id_type
 
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = self._request("GET", url, headers=headers, params=params)
             response.raise_for_status()
 
             result = response.json()
@@ -899,6 +1013,209 @@ class FeishuDocAPI:
                     self.logger.error(f"响应内容: {e.response.text}")
             return None
 
+    def get_wiki_node(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        获取知识库节点信息
+        
+        :param token: 知识库节点token
+        :return: 节点信息（含 obj_token、obj_type、title），失败返回None
+        """
+        access_token = self.get_access_token()
+        if not access_token:
+            return None
+
+        url = f"{self.BASE_URL}/wiki/v2/spaces/get_node"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+
+        try:
+            response = self._request("GET", url, headers=headers, params={"token": token})
+            response.raise_for_status()
+
+            result = response.json()
+            if result.get("code") == 0:
+                return result.get("data", {}).get("node")
+            else:
+                self.logger.error(f"获取知识库节点失败，错误码: {result.get('code')}，消息: {result.get('msg')}")
+                return None
+        except Exception as e:
+            self.logger.error(f"请求知识库节点异常: {str(e)}")
+            return None
+
+    def get_wiki_child_nodes(
+        self,
+        space_id: str,
+        parent_node_token: Optional[str] = None,
+        page_token: Optional[str] = None,
+        page_size: int = 50
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取知识空间中某个节点的子节点（一页）
+        
+        :param space_id: 知识空间ID
+        :param parent_node_token: 父节点token，为空时获取知识空间的顶层节点
+        :param page_token: 分页标记
+        :param page_size: 每页数量（最大50）
+        :return: 包含 items、has_more、page_token 的数据，失败返回None
+        """
+        access_token = self.get_access_token()
+        if not access_token:
+            return None
+
+        url = f"{self.BASE_URL}/wiki/v2/spaces/{space_id}/nodes"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+        params = {"page_size": page_size}
+        if parent_node_token:
+            params["parent_node_token"] = parent_node_token
+        if page_token:
+            params["page_token"] = page_token
+
+        try:
+            response = self._request("GET", url, headers=headers, params=params)
+            response.raise_for_status()
+
+            result = response.json()
+            if result.get("code") == 0:
+                return result.get("data", {})
+            else:
+                self.logger.error(f"获取知识库子节点失败，错误码: {result.get('code')}，消息: {result.get('msg')}")
+                return None
+        except Exception as e:
+            self.logger.error(f"请求知识库子节点异常: {str(e)}")
+            return None
+
+    def iter_wiki_child_nodes(
+        self,
+        space_id: str,
+        parent_node_token: Optional[str] = None,
+        raise_on_error: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        逐个产出某个节点的全部子节点（自动翻页）
+        
+        :param space_id: 知识空间ID
+        :param parent_node_token: 父节点token，为空时遍历知识空间的顶层节点
+        :param raise_on_error: 某一页获取失败时是否抛出异常，默认直接结束迭代
+        :return: 子节点迭代器
+        """
+        page_token = None
+        while True:
+            data = self.get_wiki_child_nodes(space_id, parent_node_token, page_token)
+            if data is None:
+                if raise_on_error:
+                    raise RuntimeError(f"获取知识库子节点失败: {parent_node_token or space_id}")
+                return
+            yield from data.get("items") or []
+            page_token = data.get("page_token")
+            if not data.get("has_more") or not page_token:
+                return
+
+    def batch_query_metas(self, request_docs: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """
+        批量获取文档元数据（单次最多 BATCH_QUERY_LIMIT 个）
+        
+        :param request_docs: 查询列表，每项为 {"doc_token": ..., "doc_type": ...}
+        :return: 包含 metas 和 failed_list 的数据，失败返回None
+        """
+        access_token = self.get_access_token()
+        if not access_token:
+            return None
+
+        url = f"{self.BASE_URL}/drive/v1/metas/batch_query"
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+        payload = {
+            "request_docs": request_docs,
+            "with_url": False
+        }
+
+        try:
+            response = self._request("POST", url, headers=headers, json=payload)
+            response.raise_for_status()
+
+            result = response.json()
+            if result.get("code") == 0:
+                return result.get("data", {})
+            else:
+                self.logger.error(f"批量获取文档元数据失败，错误码: {result.get('code')}，消息: {result.get('msg')}")
+                return None
+        except Exception as e:
+            self.logger.error(f"请求批量获取文档元数据异常: {str(e)}")
+            return None
+
+    def resolve_documents(self, tokens: List[str], doc_type_hint: Optional[str] = None, max_workers: int = 8) -> Dict[str, Dict[str, Any]]:
+        """
+        批量解析文档类型、标题和版本
+        先按类型提示、再按其他候选类型通过批量元数据接口查询，每次请求最多覆盖 BATCH_QUERY_LIMIT 个查询项；
+        批量接口无法解析的文档再并发调用 check_document_status 逐个探测
+        
+        :param tokens: 文档token列表
+        :param doc_type_hint: 优先尝试的文档类型（如从知识库目录提取的token为 wiki）
+        :param max_workers: 逐个探测时的并发数
+        :return: token -> 文档描述（格式同 check_document_status）
+        """
+        resolved: Dict[str, Dict[str, Any]] = {}
+        pending = list(dict.fromkeys(tokens))
+
+        doc_types = list(self.RESOLVE_DOC_TYPES)
+        if doc_type_hint in doc_types:
+            doc_types.remove(doc_type_hint)
+            doc_types.insert(0, doc_type_hint)
+
+        # 第一轮只按最可能的类型查询，其余类型合并到第二轮，减少无效查询项
+        rounds = [doc_types[:1], doc_types[1:]]
+        for round_types in rounds:
+            if not pending:
+                break
+            request_docs = [
+                {"doc_token": token, "doc_type": doc_type}
+                for token in pending
+                for doc_type in round_types
+            ]
+            batch_ok = True
+            for start in range(0, len(request_docs), self.BATCH_QUERY_LIMIT):
+                data = self.batch_query_metas(request_docs[start:start + self.BATCH_QUERY_LIMIT])
+                if data is None:
+                    # 接口不可用（如缺少权限），全部回退到逐个探测
+                    batch_ok = False
+                    break
+                for meta in data.get("metas") or []:
+                    token = meta.get("doc_token")
+                    if token in resolved:
+                        continue
+                    resolved[token] = {
+                        "accessible": True,
+                        "doc_type": meta.get("doc_type", "unknown"),
+                        "title": meta.get("title"),
+                        "revision": meta.get("latest_modify_time"),
+                        "revision_kind": "edit_time",
+                        "document_id": token,
+                        "document_info": None,
+                        "source": "batch_query",
+                        "error": None
+                    }
+            pending = [token for token in pending if token not in resolved]
+            if not batch_ok:
+                break
+
+        if resolved:
+            self.logger.info(f"批量解析文档元数据: {len(resolved)} 个成功，{len(pending)} 个需要逐个探测")
+
+        # 回退：并发逐个探测
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for token, status in zip(pending, executor.map(self.check_document_status, pending)):
+                    resolved[token] = status
+
+        return resolved
+
     def check_document_status(self, token: str) -> Dict[str, Any]:
         """
         检查文档状态，判断文档是否存在、可访问以及类型
@@ -908,12 +1225,20 @@ class FeishuDocAPI:
             - accessible: 是否可访问
             - doc_type: 文档类型 (docx, sheet, bitable, wiki, unknown)
             - title: 文档标题
+            - revision: 文档版本标识（docx 为 revision_id，多维表格为 revision，wiki 节点为 obj_edit_time），未知时为None
+            - revision_kind: 版本标识的含义，version（版本号）或 edit_time（修改时间），不同含义的值不能相互比较
+            - document_id: 实际内容的文档ID（wiki 节点为 obj_token，其他与 token 相同）
+            - document_info: 探测时获取到的元数据（docx 文档信息、电子表格基本信息等），可直接用于后续转换
             - error: 错误信息
         """
         result = {
             "accessible": False,
             "doc_type": "unknown",
             "title": None,
+            "revision": None,
+            "revision_kind": None,
+            "document_id": token,
+            "document_info": None,
             "error": None
         }
         
@@ -930,7 +1255,7 @@ class FeishuDocAPI:
         # 1. 尝试作为 docx 文档检查
         try:
             url = f"{self.BASE_URL}/docx/v1/documents/{token}"
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self._request("GET", url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 resp_data = response.json()
@@ -939,6 +1264,9 @@ class FeishuDocAPI:
                     result["accessible"] = True
                     result["doc_type"] = "docx"
                     result["title"] = doc_info.get("title")
+                    result["revision"] = doc_info.get("revision_id")
+                    result["revision_kind"] = "version"
+                    result["document_info"] = doc_info
                     return result
             elif response.status_code == 404:
                 pass
@@ -957,7 +1285,7 @@ class FeishuDocAPI:
         # 2. 尝试作为电子表格检查
         try:
             url = f"{self.BASE_URL}/sheets/v3/spreadsheets/{token}"
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self._request("GET", url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 resp_data = response.json()
@@ -966,6 +1294,7 @@ class FeishuDocAPI:
                     result["accessible"] = True
                     result["doc_type"] = "sheet"
                     result["title"] = sheet_info.get("title")
+                    result["document_info"] = sheet_info
                     return result
             elif response.status_code == 404:
                 pass
@@ -984,7 +1313,7 @@ class FeishuDocAPI:
         # 3. 尝试作为多维表格检查
         try:
             url = f"{self.BASE_URL}/bitable/v1/apps/{token}"
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self._request("GET", url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 resp_data = response.json()
@@ -993,6 +1322,9 @@ class FeishuDocAPI:
                     result["accessible"] = True
                     result["doc_type"] = "bitable"
                     result["title"] = app_info.get("name")
+                    result["revision"] = app_info.get("revision")
+                    result["revision_kind"] = "version"
+                    result["document_info"] = app_info
                     return result
             elif response.status_code == 404:
                 pass
@@ -1011,7 +1343,7 @@ class FeishuDocAPI:
         # 4. 尝试作为 wiki 知识库节点检查
         try:
             url = f"{self.BASE_URL}/wiki/v2/spaces/get_node?token={token}"
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self._request("GET", url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 resp_data = response.json()
@@ -1020,6 +1352,9 @@ class FeishuDocAPI:
                     result["accessible"] = True
                     result["doc_type"] = "wiki"
                     result["title"] = node_info.get("title")
+                    result["revision"] = node_info.get("obj_edit_time")
+                    result["revision_kind"] = "edit_time"
+                    result["document_id"] = node_info.get("obj_token") or token
                     obj_type = node_info.get("obj_type", "")
                     if obj_type:
                         result["doc_type"] = obj_type.lower()
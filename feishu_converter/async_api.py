@@ -0,0 +1,436 @@
+"""
+飞书开放平台异步API客户端
+基于 aiohttp 的 asyncio 版本，单进程内即可保持数百个并发请求
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
+
+import aiohttp
+
+from .api import FeishuDocAPI, PermissionType
+from .utils.token_utils import get_token_provider
+from .utils.rate_limiter import get_rate_limiter, endpoint_family
+from .utils.retry_utils import is_rate_limited, parse_retry_after
+
+
+class AsyncFeishuDocAPI:
+    """
+    飞书文档异步API客户端
+    方法与 FeishuDocAPI 中的读取类接口一一对应，需在 async with 中使用以管理连接池
+    """
+
+    BASE_URL = FeishuDocAPI.BASE_URL
+    # 触发频控后的最大重试次数
+    MAX_RATE_LIMIT_RETRIES = 5
+
+    def __init__(self, max_connections: int = 100, max_connections_per_host: int = 0, timeout: float = 30.0):
+        """
+        初始化异步API客户端
+
+        :param max_connections: 连接池最大连接数，超出的请求会排队等待
+        :param max_connections_per_host: 每个主机的最大连接数，0表示不单独限制
+        :param timeout: 单个请求的总超时时间（秒）
+        """
+        self.app_id = os.getenv("FEISHU_APP_ID")
+        self.app_secret = os.getenv("FEISHU_APP_SECRET")
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+        # 与同步客户端共享同一个令牌提供者
+        self.token_provider = get_token_provider(self.app_id, self.app_secret, self.BASE_URL)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncFeishuDocAPI":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def open(self):
+        """
+        创建带连接上限的会话
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def close(self):
+        """
+        关闭会话并释放连接
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_access_token(self) -> Optional[str]:
+        """
+        获取访问令牌
+        令牌新鲜时直接返回，需要刷新时在线程池中执行同步刷新，避免阻塞事件循环
+
+        :return: 访问令牌
+        """
+        token = self.token_provider.cached_token()
+        if token:
+            return token
+        return await asyncio.to_thread(self.token_provider.get_token)
+
+    async def _headers(self) -> Optional[Dict[str, str]]:
+        """
+        构建带鉴权的请求头
+
+        :return: 请求头，无法获取令牌时返回None
+        """
+        access_token = await self.get_access_token()
+        if not access_token:
+            return None
+        return {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+
+    async def _request_json(self, method: str, url: str, **kwargs) -> Tuple[int, Dict[str, Any]]:
+        """
+        发送请求并解析JSON响应
+        触发服务端频控时暂停同一接口族，等待配额重置后重试
+
+        :param method: HTTP方法
+        :param url: 请求URL
+        :param kwargs: 其他请求参数
+        :return: (HTTP状态码, 响应JSON)
+        """
+        if self._session is None:
+            await self.open()
+
+        family = endpoint_family(method, url)
+        for attempt in range(self.MAX_RATE_LIMIT_RETRIES + 1):
+            await self._throttle(method, url)
+            async with self._session.request(method, url, **kwargs) as response:
+                try:
+                    result = await response.json(content_type=None)
+                except (aiohttp.ContentTypeError, ValueError):
+                    result = {}
+                result = result if isinstance(result, dict) else {}
+
+                if not is_rate_limited(response.status, result) or attempt >= self.MAX_RATE_LIMIT_RETRIES:
+                    return response.status, result
+
+                # 暂停后下一次 _throttle 会一直等到配额重置
+                retry_after = parse_retry_after(response.headers)
+                self.logger.warning(f"触发频控，{retry_after:.2f}秒后重试: {url}")
+                get_rate_limiter().pause(family, retry_after)
+
+    async def _throttle(self, method: str, url: str):
+        """
+        按接口族预约限流配额，在事件循环中非阻塞地等待
+
+        :param method: HTTP方法
+        :param url: 请求URL
+        """
+        wait = get_rate_limiter().reserve(endpoint_family(method, url))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _get_data(self, method: str, url: str, action: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """
+        请求开放平台接口并返回 data 字段
+
+        :param method: HTTP方法
+        :param url: 请求URL
+        :param action: 用于日志的操作描述
+        :param kwargs: 其他请求参数
+        :return: data 字段，失败返回None
+        """
+        headers = await self._headers()
+        if not headers:
+            return None
+
+        try:
+            status, result = await self._request_json(method, url, headers=headers, **kwargs)
+            if status == 200 and result.get("code") == 0:
+                return result.get("data", {})
+            self.logger.error(f"{action}失败，状态码: {status}，错误码: {result.get('code')}，消息: {result.get('msg')}")
+            return None
+        except Exception as e:
+            self.logger.error(f"请求{action}异常: {str(e)}")
+            return None
+
+    async def get_document_info(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文档信息
+
+        :param document_id: 文档ID
+        :return: 文档信息
+        """
+        url = f"{self.BASE_URL}/docx/v1/documents/{document_id}"
+        data = await self._get_data("GET", url, "获取文档信息")
+        return data.get("document") if data is not None else None
+
+    async def get_document_blocks(self, document_id: str, page_token: Optional[str] = None, page_size: int = 500, document_revision_id: int = -1) -> Optional[Dict[str, Any]]:
+        """
+        获取文档块信息
+
+        :param document_id: 文档ID
+        :param page_token: 分页令牌
+        :param page_size: 分页大小
+        :param document_revision_id: 文档版本ID
+        :return: 文档块信息
+        """
+        url = f"{self.BASE_URL}/docx/v1/documents/{document_id}/blocks"
+        params = {
+            "page_size": min(page_size, 500),  # 最大值为500
+            "document_revision_id": document_revision_id
+        }
+        if page_token:
+            params["page_token"] = page_token
+        return await self._get_data("GET", url, "获取文档块", params=params)
+
+    async def iter_document_blocks(self, document_id: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        逐页获取文档块（自动处理分页）
+
+        :param document_id: 文档ID
+        :return: 每页的块列表
+        """
+        page_token = None
+
+        while True:
+            data = await self.get_document_blocks(document_id, page_token)
+            if not data:
+                break
+
+            yield data.get("items", [])
+
+            if not data.get("has_more"):
+                break
+
+            page_token = data.get("page_token")
+
+    async def get_all_document_blocks(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文档的所有块（自动处理分页）
+
+        :param document_id: 文档ID
+        :return: 所有文档块
+        """
+        all_items = []
+        async for items in self.iter_document_blocks(document_id):
+            all_items.extend(items)
+        return {"items": all_items}
+
+    async def check_permission(self, token: str, token_type: PermissionType = PermissionType.SHEET, permission: str = "view") -> Optional[bool]:
+        """
+        检查当前用户是否有权限访问特定资源
+
+        :param token: 资源的token
+        :param token_type: 资源类型，默认为PermissionType.SHEET（电子表格）
+        :param permission: 权限类型，"view"（查看）、"edit"（编辑）或"share"（分享），默认为"view"
+        :return: 是否有权限，无法确定（获取令牌失败、接口出错）时返回None
+        """
+        url = f"{self.BASE_URL}/drive/permission/member/permitted"
+        payload = {
+            "token": token,
+            "type": token_type.value,
+            "perm": permission
+        }
+        data = await self._get_data("POST", url, "检查权限", json=payload)
+        if data is None:
+            return None
+        return bool(data.get("is_permitted", False))
+
+    async def get_spreadsheet_info(self, spreadsheet_token: str, user_id_type: str = "open_id") -> Optional[Dict[str, Any]]:
+        """
+        获取电子表格信息
+
+        :param spreadsheet_token: 电子表格token
+        :param user_id_type: 用户ID类型，默认为open_id
+        :return: 电子表格信息
+        """
+        url = f"{self.BASE_URL}/sheets/v3/spreadsheets/{spreadsheet_token}"
+        return await self._get_data("GET", url, "获取电子表格信息", params={"user_id_type": user_id_type})
+
+    async def get_spreadsheet_sheets(self, spreadsheet_token: str) -> Optional[Dict[str, Any]]:
+        """
+        获取电子表格中的所有工作表信息
+
+        :param spreadsheet_token: 电子表格token
+        :return: 工作表信息
+        """
+        url = f"{self.BASE_URL}/sheets/v3/spreadsheets/{spreadsheet_token}/sheets/query"
+        return await self._get_data("GET", url, "获取电子表格工作表")
+
+    async def get_spreadsheet_data(self, spreadsheet_token: str, sheet_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取电子表格数据
+
+        :param spreadsheet_token: 电子表格token，也可以是 spreadsheet_token_sheet_id 形式的完整token
+        :param sheet_id: 工作表ID或范围
+        :return: 电子表格数据，包含 valueRange
+        """
+        if sheet_id is None and '_' in spreadsheet_token:
+            spreadsheet_token, sheet_id = spreadsheet_token.split('_', 1)
+
+        if not sheet_id:
+            # 没有工作表ID时返回表格基本信息，与同步客户端保持一致
+            return await self.get_spreadsheet_info(spreadsheet_token)
+
+        url = f"{self.BASE_URL}/sheets/v2/spreadsheets/{spreadsheet_token}/values/{sheet_id}"
+        return await self._get_data("GET", url, "获取电子表格数据")
+
+    async def check_document_status(self, token: str) -> Dict[str, Any]:
+        """
+        检查文档状态，判断文档是否存在、可访问以及类型
+        先按最常见的 docx 探测，未命中时再并发探测电子表格、多维表格和 wiki，
+        按电子表格、多维表格、wiki 的优先级取结果
+
+        :param token: 文档token
+        :return: 状态信息字典，字段与 FeishuDocAPI.check_document_status 相同
+        """
+        result = {
+            "accessible": False,
+            "doc_type": "unknown",
+            "title": None,
+            "revision": None,
+            "revision_kind": None,
+            "document_id": token,
+            "document_info": None,
+            "error": None
+        }
+
+        headers = await self._headers()
+        if not headers:
+            result["error"] = "无法获取访问令牌"
+            return result
+
+        probes = [
+            ("docx", f"{self.BASE_URL}/docx/v1/documents/{token}", "document"),
+            ("sheet", f"{self.BASE_URL}/sheets/v3/spreadsheets/{token}", "spreadsheet"),
+            ("bitable", f"{self.BASE_URL}/bitable/v1/apps/{token}", "app"),
+            ("wiki", f"{self.BASE_URL}/wiki/v2/spaces/get_node?token={token}", "node"),
+        ]
+
+        async def probe(url: str) -> Tuple[int, Dict[str, Any]]:
+            try:
+                return await self._request_json("GET", url, headers=headers, timeout=aiohttp.ClientTimeout(total=10))
+            except Exception as e:
+                self.logger.debug(f"检查文档类型失败: {e}")
+                return 0, {}
+
+        def apply(doc_type: str, data_key: str, status: int, resp_data: Dict[str, Any]) -> bool:
+            # 命中或确定无权限时填充结果并返回True
+            if status == 200 and resp_data.get("code") == 0:
+                info = resp_data.get("data", {}).get(data_key, {})
+                result["accessible"] = True
+                result["doc_type"] = doc_type
+                if doc_type == "docx":
+                    result["title"] = info.get("title")
+                    result["revision"] = info.get("revision_id")
+                    result["revision_kind"] = "version"
+                    result["document_info"] = info
+                elif doc_type == "sheet":
+                    result["title"] = info.get("title")
+                    result["document_info"] = info
+                elif doc_type == "bitable":
+                    result["title"] = info.get("name")
+                    result["revision"] = info.get("revision")
+                    result["revision_kind"] = "version"
+                    result["document_info"] = info
+                else:
+                    result["title"] = info.get("title")
+                    result["revision"] = info.get("obj_edit_time")
+                    result["revision_kind"] = "edit_time"
+                    result["document_id"] = info.get("obj_token") or token
+                    if info.get("obj_type"):
+                        result["doc_type"] = info["obj_type"].lower()
+                return True
+            if status not in (0, 200, 404) and resp_data.get("code") in [99991663, 99991661]:
+                result["error"] = f"无权限访问: {resp_data.get('msg', '')}"
+                result["doc_type"] = doc_type
+                return True
+            return False
+
+        doc_type, url, data_key = probes[0]
+        if apply(doc_type, data_key, *await probe(url)):
+            return result
+
+        responses = await asyncio.gather(*(probe(url) for _, url, _ in probes[1:]))
+        for (doc_type, _, data_key), response in zip(probes[1:], responses):
+            if apply(doc_type, data_key, *response):
+                return result
+
+        result["error"] = "文档不存在或已被删除"
+        return result
+
+    async def download_media(self, file_token: str, save_dir: str) -> Optional[str]:
+        """
+        下载素材（图片、附件等）
+
+        :param file_token: 素材token
+        :param save_dir: 保存目录
+        :return: 本地文件路径，失败返回None
+        """
+        headers = await self._headers()
+        if not headers:
+            return None
+
+        if self._session is None:
+            await self.open()
+
+        url = f"{self.BASE_URL}/drive/v1/medias/{file_token}/download"
+        await self._throttle("GET", url)
+        try:
+            async with self._session.get(url, headers={"Authorization": headers["Authorization"]}) as response:
+                response.raise_for_status()
+
+                content_type = response.headers.get('content-type', '')
+                ext = self._get_extension_from_content_type(content_type)
+
+                save_path = Path(save_dir)
+                save_path.mkdir(parents=True, exist_ok=True)
+                file_path = save_path / f"{file_token}{ext}"
+
+                # 先写入临时文件再重命名，下载中断时不留下不完整的文件
+                temp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.{id(response)}.part")
+                try:
+                    # 小块写入，磁盘写操作放到线程池中避免阻塞事件循环
+                    with open(temp_path, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(65536):
+                            await asyncio.to_thread(f.write, chunk)
+                    os.replace(temp_path, file_path)
+                finally:
+                    if temp_path.exists():
+                        temp_path.unlink()
+
+                return str(file_path)
+        except Exception as e:
+            self.logger.error(f"下载素材失败 {file_token}: {e}")
+            return None
+
+    @staticmethod
+    def _get_extension_from_content_type(content_type: str) -> str:
+        """从Content-Type获取文件扩展名"""
+        content_type = content_type.lower()
+
+        if 'png' in content_type:
+            return '.png'
+        elif 'gif' in content_type:
+            return '.gif'
+        elif 'bmp' in content_type:
+            return '.bmp'
+        elif 'webp' in content_type:
+            return '.webp'
+        elif 'pdf' in content_type:
+            return '.pdf'
+        else:
+            return '.jpg'
@@ -4,7 +4,8 @@
 """
 
 import logging
-from typing import Dict, Any
+import threading
+from typing import Any, Dict, Optional, Tuple
 from .fetchers.document_fetcher import DocumentFetcher
 from .adapters.pdf_adapter import PdfAdapter
 from .adapters.markdown_adapter import MarkdownAdapter
@@ -26,14 +27,64 @@ class FeishuConverter:
         self.markdown_adapter = MarkdownAdapter()
         self.api = FeishuDocAPI()
         self.logger = logging.getLogger(__name__)
+        
+        # 本次运行内的文档元数据缓存（token -> 文档描述）
+        self._metadata_cache: Dict[str, Dict[str, Any]] = {}
+        self._metadata_lock = threading.Lock()
+    
+    def resolve_document(self, token: str) -> Dict[str, Any]:
+        """
+        解析文档元数据（类型、标题、版本和文档信息）
+        结果缓存到 clear_metadata_cache 为止，供批量转换在一次运行内使用（先检查后转换时不会重复请求）；
+        单独转换文档请使用 convert，它每次都重新检查
+        
+        :param token: 文档token
+        :return: 文档描述，格式同 FeishuDocAPI.check_document_status
+        """
+        with self._metadata_lock:
+            cached = self._metadata_cache.get(token)
+        if cached is not None:
+            return cached
+        
+        document = self.api.check_document_status(token)
+        # 只缓存成功的结果，不可访问的文档下次重新检查
+        if document.get("accessible"):
+            with self._metadata_lock:
+                self._metadata_cache[token] = document
+        return document
+    
+    def prime_metadata(self, documents: Dict[str, Dict[str, Any]]):
+        """
+        预先填充元数据缓存（如 FeishuDocAPI.resolve_documents 的批量解析结果）
+        不可访问的结果同样缓存，本次运行内不再重复探测
+        
+        :param documents: token -> 文档描述
+        """
+        with self._metadata_lock:
+            self._metadata_cache.update(documents)
+    
+    def invalidate_metadata(self, token: str):
+        """
+        删除单个文档的缓存元数据（如预先解析时不可访问、重试前需要重新检查的文档）
+        
+        :param token: 文档token
+        """
+        with self._metadata_lock:
+            self._metadata_cache.pop(token, None)
     
-    def convert(self, document_url: str, output_format: str, output_path: str) -> bool:
+    def clear_metadata_cache(self):
+        """清空本次运行的元数据缓存"""
+        with self._metadata_lock:
+            self._metadata_cache.clear()
+    
+    def convert(self, document_url: str, output_format: str, output_path: str, stream: bool = True) -> bool:
         """
         执行文档转换
         
         :param document_url: 飞书文档URL
         :param output_format: 输出格式 ('pdf' 或 'markdown')
         :param output_path: 输出路径
+        :param stream: 转换为Markdown时是否边获取边转换（文档块逐页获取、逐个子树写出）
         :return: 转换是否成功
         """
         self.logger.info(f"开始转换文档: {document_url} -> {output_path} ({output_format})")
@@ -44,24 +95,38 @@ class FeishuConverter:
             self.logger.error(f"无法从URL提取文档ID: {document_url}")
             return False
         
-        # 检查文档状态和类型
+        # 检查文档状态和类型（每次重新检查，不使用批量运行的元数据缓存，文档修改后转换的是新版本）
         doc_status = self.api.check_document_status(doc_id)
-        if not doc_status["accessible"]:
-            error_msg = doc_status.get("error", "文档不可访问")
-            self.logger.error(f"文档不可访问: {error_msg}")
-            return False
+        return self.convert_resolved(doc_status, output_format, output_path, stream)
+    
+    def convert_resolved(self, document: Dict[str, Any], output_format: str, output_path: str, stream: bool = True) -> bool:
+        """
+        转换已解析元数据的文档，不再重复检查文档状态
         
-        doc_type = doc_status.get("doc_type", "docx")
-        self.logger.info(f"文档类型: {doc_type}, 标题: {doc_status.get('title', 'Unknown')}")
+        :param document: 文档描述（resolve_document 或 check_document_status 的返回值）
+        :param output_format: 输出格式 ('pdf' 或 'markdown')
+        :param output_path: 输出路径
+        :param stream: 转换为Markdown时是否边获取边转换
+        :return: 转换是否成功
+        """
+        target = self._resolve_target(document)
+        if not target:
+            return False
+        doc_type, document_id, document_info = target
         
-        # 根据文档类型获取内容
-        if doc_type == "sheet":
-            # 获取电子表格内容
-            document_content = self.document_fetcher.fetch_spreadsheet_content(document_url)
-        else:
-            # 获取普通文档内容
-            document_content = self.document_fetcher.fetch_document_content(document_url)
+        # 普通文档转Markdown时边获取边转换
+        if stream and doc_type != "sheet" and output_format.lower() == 'markdown':
+            document_stream = self.document_fetcher.fetch_document_stream(
+                document_id, document_id=document_id, document_info=document_info
+            )
+            if not document_stream:
+                self.logger.error("获取文档内容失败")
+                return False
+            document_info, pages = document_stream
+            self.logger.info(f"开始转换为 {output_format} 格式...")
+            return self.markdown_adapter.convert_stream(document_info, pages, output_path)
         
+        document_content = self._fetch_content(document, target, output_format)
         if not document_content:
             self.logger.error("获取文档内容失败")
             return False
@@ -75,3 +140,77 @@ class FeishuConverter:
         else:
             self.logger.error(f"不支持的输出格式: {output_format}")
             return False
+    
+    def fetch_resolved(self, document: Dict[str, Any], output_format: str) -> Optional[Dict[str, Any]]:
+        """
+        获取已解析元数据的文档的完整内容（不渲染），供获取和渲染分开执行的批量流水线使用
+        
+        :param document: 文档描述（resolve_document 或 check_document_status 的返回值）
+        :param output_format: 输出格式，决定是否预取嵌入的外部资源
+        :return: 文档内容，失败返回None
+        """
+        target = self._resolve_target(document)
+        if not target:
+            return None
+        document_content = self._fetch_content(document, target, output_format)
+        if not document_content:
+            self.logger.error("获取文档内容失败")
+            return None
+        return document_content
+    
+    def _resolve_target(self, document: Dict[str, Any]) -> Optional[Tuple[str, str, Optional[Dict[str, Any]]]]:
+        """
+        确定实际需要获取的文档（知识库节点取出挂载的文档）
+        
+        :param document: 文档描述
+        :return: (文档类型, 文档ID, 可复用的文档信息)，不可访问或解析失败返回None
+        """
+        if not document["accessible"]:
+            error_msg = document.get("error", "文档不可访问")
+            self.logger.error(f"文档不可访问: {error_msg}")
+            return None
+        
+        doc_type = document.get("doc_type", "docx")
+        document_id = document.get("document_id")
+        document_info = document.get("document_info")
+        self.logger.info(f"文档类型: {doc_type}, 标题: {document.get('title', 'Unknown')}")
+        
+        # 批量解析只得到知识库节点本身，转换前取出节点挂载的实际文档
+        if doc_type == "wiki":
+            node = self.api.get_wiki_node(document_id)
+            if not node or not node.get("obj_token"):
+                self.logger.error(f"获取知识库节点失败: {document_id}")
+                return None
+            document_id = node["obj_token"]
+            doc_type = (node.get("obj_type") or "docx").lower()
+        
+        # 探测到的是 docx 文档信息时才能直接复用
+        if doc_type != "docx" or not document_info or "revision_id" not in document_info:
+            document_info = None
+        return doc_type, document_id, document_info
+    
+    def _fetch_content(
+        self,
+        document: Dict[str, Any],
+        target: Tuple[str, str, Optional[Dict[str, Any]]],
+        output_format: str
+    ) -> Optional[Dict[str, Any]]:
+        """根据文档类型获取完整内容"""
+        doc_type, document_id, document_info = target
+        if doc_type == "sheet":
+            # 获取电子表格内容
+            return self.document_fetcher.fetch_spreadsheet_content(
+                document_id,
+                spreadsheet_token=document_id,
+                spreadsheet=document.get("document_info"),
+                # 只有表格版本号能作为快照缓存的键，批量解析或知识库节点得到的是修改时间
+                revision=document.get("revision") if document.get("revision_kind") == "version" else None,
+                # PDF不渲染单元格数据，也避免内容中带有无法传给渲染进程的行读取器
+                fetch_values=output_format.lower() != 'pdf'
+            )
+        # 获取普通文档内容
+        return self.document_fetcher.fetch_document_content(
+            document_id, document_id=document_id, document_info=document_info,
+            # 只有Markdown会渲染嵌入的电子表格数据
+            resolve_resources=output_format.lower() == 'markdown'
+        )
@@ -4,8 +4,18 @@
 """
 
 import logging
-from typing import Dict, Any, List, Optional
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
 from ..api import FeishuDocAPI
+from ..utils.snapshot_cache import DocumentSnapshotCache, get_snapshot_cache
+from .sheet_reader import DEFAULT_SHEET_WINDOW_ROWS, SheetRowReader
+from .resource_planner import ResourcePlanner
+
+# 电子表格数据并发请求数
+DEFAULT_SHEET_WORKERS = int(os.getenv("FEISHU_SHEET_WORKERS", "4"))
 
 
 class DocumentFetcher:
@@ -14,22 +24,53 @@ class DocumentFetcher:
     从飞书开放平台获取文档内容
     """
     
-    def __init__(self):
+    # 一次批量读取请求最多包含的工作表数
+    SHEET_BATCH_RANGES = 10
+    # 一次批量读取请求最多包含的单元格数（按工作表的行列数估算，避免响应过大）
+    SHEET_BATCH_CELLS = 200_000
+    # 超过该单元格数的工作表分段读取，转换时逐行写出
+    SHEET_STREAM_CELLS = int(os.getenv("FEISHU_SHEET_STREAM_CELLS", "200000"))
+    
+    def __init__(
+        self,
+        snapshot_cache: Optional[DocumentSnapshotCache] = None,
+        sheet_workers: int = DEFAULT_SHEET_WORKERS,
+        sheet_window_rows: int = DEFAULT_SHEET_WINDOW_ROWS,
+        resource_planner: Optional[ResourcePlanner] = None
+    ):
         """
         初始化文档获取器
+        
+        :param snapshot_cache: 文档快照缓存，默认使用进程级共享缓存（可通过 FEISHU_SNAPSHOT_CACHE=0 关闭）
+        :param sheet_workers: 读取电子表格数据的并发请求数
+        :param sheet_window_rows: 大工作表分段读取时每次请求的行数
+        :param resource_planner: 外部资源获取器，默认使用当前API客户端创建
         """
         self.api = FeishuDocAPI()
+        self.snapshot_cache = snapshot_cache if snapshot_cache is not None else get_snapshot_cache()
+        self.sheet_workers = max(1, sheet_workers)
+        self.sheet_window_rows = sheet_window_rows
+        self.resource_planner = resource_planner or ResourcePlanner(self.api)
         self.logger = logging.getLogger(__name__)
     
-    def fetch_document_content(self, document_url: str) -> Optional[Dict[str, Any]]:
+    def fetch_document_content(
+        self,
+        document_url: str,
+        document_id: Optional[str] = None,
+        document_info: Optional[Dict[str, Any]] = None,
+        resolve_resources: bool = False
+    ) -> Optional[Dict[str, Any]]:
         """
         获取文档内容
         
         :param document_url: 文档URL
+        :param document_id: 已解析的文档ID，传入时不再从URL提取
+        :param document_info: 已获取的文档信息，传入时不再请求
+        :param resolve_resources: 是否预取文档嵌入的电子表格，结果放在 resources 字段（Markdown渲染时使用）
         :return: 文档内容
         """
         # 从URL中提取文档ID
-        document_id = self.extract_document_id(document_url)
+        document_id = document_id or self.extract_document_id(document_url)
         if not document_id:
             self.logger.error(f"无法从URL提取文档ID: {document_url}")
             return None
@@ -37,27 +78,91 @@ class DocumentFetcher:
         self.logger.debug(f"开始获取文档内容: {document_url}")
         
         # 获取文档信息
-        document_info = self.api.get_document_info(document_id)
+        document_info = document_info or self.api.get_document_info(document_id)
         if not document_info:
             self.logger.error(f"获取文档信息失败: {document_id}")
             return None
         
-        # 获取所有文档块
-        blocks_data = self.api.get_all_document_blocks(document_id)
-        if not blocks_data:
-            self.logger.error(f"获取文档块失败: {document_id}")
+        # 获取所有文档块（版本未变化时直接读取快照缓存）
+        items = []
+        try:
+            for page in self._iter_block_pages(document_id, document_info):
+                items.extend(page)
+        except RuntimeError as e:
+            # 部分分页获取失败时不返回不完整的文档
+            self.logger.error(str(e))
             return None
         
         # 组合文档信息和块数据
         document_content = {
             "document_info": document_info,
-            "items": blocks_data["items"]
+            "items": items
         }
         
+        # 并发获取文档嵌入的电子表格，渲染时不再等待网络（外部资源可能独立变化，不写入快照缓存）
+        if resolve_resources:
+            document_content["resources"] = self.resource_planner.resolve(self.resource_planner.plan(items))
+        
         self.logger.info(f"成功获取文档内容: {document_info.get('title', 'Unknown')}")
         
         return document_content
     
+    def fetch_document_stream(
+        self,
+        document_url: str,
+        prefetch_pages: int = 2,
+        document_id: Optional[str] = None,
+        document_info: Optional[Dict[str, Any]] = None
+    ) -> Optional[Tuple[Dict[str, Any], Iterator[List[Dict[str, Any]]]]]:
+        """
+        以流的方式获取文档内容
+        文档块在后台线程中逐页获取，调用方可以边获取边处理，最多预取 prefetch_pages 页
+        
+        :param document_url: 文档URL
+        :param prefetch_pages: 后台预取的最大页数
+        :param document_id: 已解析的文档ID，传入时不再从URL提取
+        :param document_info: 已获取的文档信息，传入时不再请求
+        :return: (文档信息, 块分页迭代器)，失败返回None；某一页获取失败时迭代器抛出 RuntimeError
+        """
+        document_id = document_id or self.extract_document_id(document_url)
+        if not document_id:
+            self.logger.error(f"无法从URL提取文档ID: {document_url}")
+            return None
+        
+        self.logger.debug(f"开始流式获取文档内容: {document_url}")
+        
+        document_info = document_info or self.api.get_document_info(document_id)
+        if not document_info:
+            self.logger.error(f"获取文档信息失败: {document_id}")
+            return None
+        
+        pages = _prefetch(self._iter_block_pages(document_id, document_info), prefetch_pages)
+        return document_info, pages
+    
+    def _iter_block_pages(self, document_id: str, document_info: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        逐页获取文档块
+        快照缓存中有相同版本时直接读取缓存，否则从接口获取并同时写入缓存
+        
+        :param document_id: 文档ID
+        :param document_info: 文档信息（含 revision_id）
+        :return: 每页的块列表
+        :raises RuntimeError: 某一页获取失败
+        """
+        revision_id = document_info.get("revision_id")
+        if not self.snapshot_cache or revision_id is None:
+            yield from self.api.iter_document_blocks(document_id, raise_on_error=True)
+            return
+        
+        if self.snapshot_cache.has_snapshot(document_id, revision_id):
+            self.logger.info(f"文档未变化，使用快照缓存: {document_id} (版本 {revision_id})")
+            yield from self.snapshot_cache.iter_pages(document_id, revision_id)
+            return
+        
+        # 分页获取失败时异常继续抛出，快照不会登记，本次转换失败（不产生不完整的输出）
+        pages = self.api.iter_document_blocks(document_id, raise_on_error=True)
+        yield from self.snapshot_cache.record(document_id, revision_id, "docx", document_info, pages)
+    
     def extract_document_id(self, document_url: str) -> Optional[str]:
         """
         从文档URL中提取文档ID
@@ -86,27 +191,48 @@ class DocumentFetcher:
             self.logger.error(f"提取文档ID失败: {str(e)}")
             return None
     
-    def fetch_spreadsheet_content(self, spreadsheet_url: str) -> Optional[Dict[str, Any]]:
+    def fetch_spreadsheet_content(
+        self,
+        spreadsheet_url: str,
+        spreadsheet_token: Optional[str] = None,
+        spreadsheet: Optional[Dict[str, Any]] = None,
+        revision: Optional[int] = None,
+        fetch_values: bool = True
+    ) -> Optional[Dict[str, Any]]:
         """
         获取电子表格内容
         
         :param spreadsheet_url: 电子表格URL
+        :param spreadsheet_token: 已解析的电子表格token，传入时不再从URL提取
+        :param spreadsheet: 已获取的电子表格基本信息，传入时不再请求
+        :param revision: 已获取的电子表格版本号，传入时不再请求
+        :param fetch_values: 是否获取单元格数据，为False时只返回工作表列表（如PDF不渲染表格数据）
         :return: 电子表格内容
         """
-        spreadsheet_token = self.extract_document_id(spreadsheet_url)
+        spreadsheet_token = spreadsheet_token or self.extract_document_id(spreadsheet_url)
         if not spreadsheet_token:
             self.logger.error(f"无法从URL提取电子表格token: {spreadsheet_url}")
             return None
         
         self.logger.debug(f"开始获取电子表格内容: {spreadsheet_url}")
         
-        # 获取电子表格基本信息
-        spreadsheet_info = self.api.get_spreadsheet_info(spreadsheet_token)
-        if not spreadsheet_info:
-            self.logger.error(f"获取电子表格信息失败: {spreadsheet_token}")
-            return None
+        # 版本未变化时直接返回快照缓存
+        if self.snapshot_cache:
+            if revision is None:
+                revision = self.api.get_spreadsheet_revision(spreadsheet_token)
+            cached_content = self.snapshot_cache.get_info(spreadsheet_token, revision)
+            if cached_content:
+                self.logger.info(f"电子表格未变化，使用快照缓存: {spreadsheet_token} (版本 {revision})")
+                return cached_content
         
-        spreadsheet = spreadsheet_info.get('spreadsheet', {})
+        # 获取电子表格基本信息
+        if spreadsheet is None:
+            spreadsheet_info = self.api.get_spreadsheet_info(spreadsheet_token)
+            if not spreadsheet_info:
+                self.logger.error(f"获取电子表格信息失败: {spreadsheet_token}")
+                return None
+            
+            spreadsheet = spreadsheet_info.get('spreadsheet', {})
         
         # 获取所有工作表
         sheets_data = self.api.get_spreadsheet_sheets(spreadsheet_token)
@@ -116,27 +242,55 @@ class DocumentFetcher:
         
         sheets = sheets_data.get('sheets', [])
         
-        # 获取每个工作表的数据
+        if not fetch_values:
+            # 只有工作表列表，不写入快照缓存
+            return {
+                "document_info": {
+                    "document_id": spreadsheet_token,
+                    "title": spreadsheet.get('title', '未命名电子表格'),
+                    "document_type": "sheet"
+                },
+                "spreadsheet_info": spreadsheet,
+                "sheets": [
+                    {'sheet_id': sheet.get('sheet_id'), 'title': sheet.get('title', '未命名工作表'), 'values': []}
+                    for sheet in sheets
+                ]
+            }
+        
+        # 大工作表不预先读取，转换时通过行读取器分段请求
+        row_readers = {}
+        for sheet in sheets:
+            reader = self._sheet_row_reader(spreadsheet_token, sheet)
+            if reader is not None:
+                row_readers[sheet.get('sheet_id')] = reader
+        
+        # 获取其余工作表的数据（多个工作表合并为一次请求，各批次并发）
+        sheet_values = self._fetch_sheet_values(
+            spreadsheet_token, [sheet for sheet in sheets if sheet.get('sheet_id') not in row_readers]
+        )
         all_sheets_data = []
         for sheet in sheets:
             sheet_id = sheet.get('sheet_id')
             sheet_title = sheet.get('title', '未命名工作表')
-            
-            # 获取工作表数据
-            sheet_data = self.api.get_spreadsheet_data(spreadsheet_token, sheet_id)
-            if sheet_data:
-                values = None
-                if 'valueRange' in sheet_data:
-                    values = sheet_data['valueRange'].get('values', [])
-                elif 'values' in sheet_data:
-                    values = sheet_data['values']
-                
+            if sheet_id in row_readers:
                 all_sheets_data.append({
                     'sheet_id': sheet_id,
                     'title': sheet_title,
-                    'values': values or []
+                    'rows': row_readers[sheet_id]
                 })
-                self.logger.info(f"获取工作表数据成功: {sheet_title}")
+                self.logger.info(f"工作表将分段读取: {sheet_title}")
+                continue
+            
+            values = sheet_values.get(sheet_id)
+            if values is None:
+                continue
+            
+            all_sheets_data.append({
+                'sheet_id': sheet_id,
+                'title': sheet_title,
+                'values': values
+            })
+            self.logger.info(f"获取工作表数据成功: {sheet_title}")
         
         # 组合电子表格内容
         spreadsheet_content = {
@@ -151,40 +305,145 @@ class DocumentFetcher:
         
         self.logger.info(f"成功获取电子表格内容: {spreadsheet.get('title', 'Unknown')}")
         
+        # 分段读取的工作表数据不在内存中，不写入快照缓存
+        if self.snapshot_cache and not row_readers:
+            self.snapshot_cache.put(spreadsheet_token, revision, "sheet", spreadsheet_content)
+        
         return spreadsheet_content
     
-    def _fetch_spreadsheet_data(self, blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """
-        获取所有电子表格的数据
-        
-        :param blocks: 文档块列表
-        :return: 电子表格数据
-        """
-        spreadsheet_data = {}
-        
-        for block in blocks:
-            if block.get('block_type') == 30:  # 电子表格块
-                sheet_info = block.get('sheet', {})
-                token = sheet_info.get('token')
-                
-                if token:
-                    # 电子表格的token格式为 "spreadsheet_token_sheet_id"，需要拆分
-                    if '_' in token:
-                        parts = token.split('_', 1)
-                        spreadsheet_token = parts[0]
-                        sheet_id = parts[1]
-                    else:
-                        # 如果没有下划线，则整个token就是spreadsheet_token
-                        spreadsheet_token = token
-                        sheet_id = None
-                    
-                    # 获取电子表格数据
-                    data = self.api.get_spreadsheet_data(spreadsheet_token, sheet_id)
-                    if data:
-                        # 使用原始token作为字典的key，以便在markdown adapter中正确查找
-                        spreadsheet_data[token] = data
-                        self.logger.info(f"获取电子表格数据成功: {token}")
-                    else:
-                        self.logger.warning(f"获取电子表格数据失败: {token}")
-        
-        return spreadsheet_data
\ No newline at end of file
+    def _sheet_row_reader(self, spreadsheet_token: str, sheet: Dict[str, Any]) -> Optional[SheetRowReader]:
+        """
+        为超过 SHEET_STREAM_CELLS 个单元格的工作表创建行读取器
+        
+        :param spreadsheet_token: 电子表格token
+        :param sheet: 工作表信息（含 grid_properties）
+        :return: 行读取器，不需要分段读取时返回None
+        """
+        if not sheet.get('sheet_id') or sheet.get('resource_type', 'sheet') != 'sheet':
+            return None
+        grid = sheet.get('grid_properties') or {}
+        row_count = grid.get('row_count') or 0
+        column_count = grid.get('column_count') or 0
+        if row_count * column_count <= self.SHEET_STREAM_CELLS:
+            return None
+        return SheetRowReader(
+            self.api, spreadsheet_token, sheet['sheet_id'], row_count, column_count, self.sheet_window_rows
+        )
+    
+    def _fetch_sheet_values(self, spreadsheet_token: str, sheets: List[Dict[str, Any]]) -> Dict[str, Optional[List[Any]]]:
+        """
+        获取多个工作表的数据
+        直接使用工作表列表中的 sheet_id，多个工作表通过 values_batch_get 合并为一次请求，各批次并发执行；
+        批量请求失败的工作表再逐个读取
+        
+        :param spreadsheet_token: 电子表格token
+        :param sheets: get_spreadsheet_sheets 返回的工作表列表
+        :return: sheet_id -> 行数据，读取失败为None
+        """
+        result: Dict[str, Optional[List[Any]]] = {}
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        batch_cells = 0
+        for sheet in sheets:
+            sheet_id = sheet.get('sheet_id')
+            if not sheet_id:
+                continue
+            # 非表格类型的工作表（如内嵌的多维表格）没有单元格数据
+            if sheet.get('resource_type', 'sheet') != 'sheet':
+                result[sheet_id] = []
+                continue
+            grid = sheet.get('grid_properties') or {}
+            cells = (grid.get('row_count') or 0) * (grid.get('column_count') or 0)
+            if batch and (len(batch) >= self.SHEET_BATCH_RANGES or batch_cells + cells > self.SHEET_BATCH_CELLS):
+                batches.append(batch)
+                batch, batch_cells = [], 0
+            batch.append(sheet_id)
+            batch_cells += cells
+        if batch:
+            batches.append(batch)
+        
+        if len(batches) > 1 and self.sheet_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.sheet_workers, len(batches))) as executor:
+                for values in executor.map(lambda ids: self._fetch_sheet_batch(spreadsheet_token, ids), batches):
+                    result.update(values)
+        else:
+            for ids in batches:
+                result.update(self._fetch_sheet_batch(spreadsheet_token, ids))
+        return result
+    
+    def _fetch_sheet_batch(self, spreadsheet_token: str, sheet_ids: List[str]) -> Dict[str, Optional[List[Any]]]:
+        """
+        一次请求读取一批工作表，失败或缺失的工作表逐个读取
+        
+        :param spreadsheet_token: 电子表格token
+        :param sheet_ids: 工作表ID列表
+        :return: sheet_id -> 行数据，读取失败为None
+        """
+        values: Dict[str, Optional[List[Any]]] = {}
+        if len(sheet_ids) > 1:
+            data = self.api.get_spreadsheet_values_batch(spreadsheet_token, sheet_ids)
+            for value_range in (data or {}).get('valueRanges') or []:
+                # 返回的范围格式为 "sheetId!A1:C10"
+                sheet_id = value_range.get('range', '').split('!', 1)[0]
+                if sheet_id in sheet_ids:
+                    values[sheet_id] = value_range.get('values') or []
+        
+        for sheet_id in sheet_ids:
+            if sheet_id in values:
+                continue
+            sheet_data = self.api.get_spreadsheet_data(spreadsheet_token, sheet_id)
+            if not sheet_data:
+                values[sheet_id] = None
+            elif 'valueRange' in sheet_data:
+                values[sheet_id] = sheet_data['valueRange'].get('values', []) or []
+            else:
+                values[sheet_id] = sheet_data.get('values') or []
+        return values
+
+
+_END = object()
+
+
+def _prefetch(iterable: Iterable, buffer_size: int) -> Iterator:
+    """
+    在后台线程中消费可迭代对象，通过有界队列交给调用方，使生产与消费重叠执行
+
+    :param iterable: 源可迭代对象
+    :param buffer_size: 队列容量
+    :return: 迭代器
+    """
+    buffer = queue.Queue(maxsize=max(1, buffer_size))
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        # 消费方提前退出时不再阻塞在满队列上
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        put(_END)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,103 @@
+"""
+外部资源预取规划
+获取文档块后扫描其中嵌入的电子表格，去重后并发检查权限并获取数据，
+结果随文档内容交给适配器，渲染时不再等待网络请求（图片由渲染阶段的图片预取下载）
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List
+
+from ..process.sheet_handler import SheetHandler
+from ..process.sheet_prefetcher import DEFAULT_RESOURCE_WORKERS, collect_sheet_tokens
+
+
+class ResourcePlan:
+    """
+    文档嵌入的电子表格（已去重，按文档顺序）
+    嵌入电子表格的数据依赖其所属电子表格的权限检查结果
+    """
+
+    def __init__(self):
+        # 电子表格token -> 该电子表格下被嵌入的token（格式为 spreadsheet_token_sheet_id）
+        self.sheets: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[Dict[str, Any]]) -> 'ResourcePlan':
+        """
+        扫描文档块生成资源计划
+
+        :param blocks: 文档块
+        :return: 资源计划
+        """
+        plan = cls()
+        for token in collect_sheet_tokens(blocks):
+            plan.sheets.setdefault(token.split('_', 1)[0], []).append(token)
+        return plan
+
+    def __len__(self) -> int:
+        return len(self.sheets) + sum(len(embeds) for embeds in self.sheets.values())
+
+
+class ResourcePlanner:
+    """
+    外部资源获取器
+    电子表格权限和数据经过 SheetHandler 的运行期缓存，多个文档嵌入同一表格时只请求一次
+    """
+
+    def __init__(self, api, max_workers: int = DEFAULT_RESOURCE_WORKERS):
+        """
+        初始化资源获取器
+
+        :param api: FeishuDocAPI 实例
+        :param max_workers: 最大并发请求数
+        """
+        self.api = api
+        self.max_workers = max(1, max_workers)
+        self.logger = logging.getLogger(__name__)
+
+    def plan(self, blocks: Iterable[Dict[str, Any]]) -> ResourcePlan:
+        """
+        生成资源计划
+
+        :param blocks: 文档块
+        :return: 资源计划
+        """
+        return ResourcePlan.from_blocks(blocks)
+
+    def resolve(self, plan: ResourcePlan) -> Dict[str, Dict[str, Any]]:
+        """
+        并发获取计划中的资源
+        先检查所有电子表格的权限，再获取有权限的表格数据
+
+        :param plan: 资源计划
+        :return: 资源结果，包含 sheet_permissions（电子表格token -> 是否有权限，无法确定为None）和
+                 sheets（嵌入token -> 表格数据，获取失败为None）
+        """
+        resources: Dict[str, Dict[str, Any]] = {'sheet_permissions': {}, 'sheets': {}}
+        if not len(plan):
+            return resources
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="resource") as executor:
+            # 每个电子表格先用第一个嵌入检查权限，有权限时再并发获取其余嵌入
+            first_futures = {
+                spreadsheet_token: executor.submit(SheetHandler.load_embed, self.api, embeds[0])
+                for spreadsheet_token, embeds in plan.sheets.items()
+            }
+            data_futures = {}
+            for spreadsheet_token, future in first_futures.items():
+                embeds = plan.sheets[spreadsheet_token]
+                has_permission, sheet_data = future.result()
+                resources['sheet_permissions'][spreadsheet_token] = has_permission
+                if has_permission is not False:
+                    resources['sheets'][embeds[0]] = sheet_data
+                    for token in embeds[1:]:
+                        data_futures[token] = executor.submit(SheetHandler.load_embed, self.api, token)
+
+            for token, future in data_futures.items():
+                resources['sheets'][token] = future.result()[1]
+
+        self.logger.info(
+            f"预取外部资源: {len(plan.sheets)} 个电子表格，{len(resources['sheets'])} 个嵌入工作表"
+        )
+        return resources
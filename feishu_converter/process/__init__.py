@@ -22,6 +22,16 @@ from .link_preview_handler import LinkPreviewHandler
 from .sub_page_list_handler import SubPageListHandler
 from .aitemplate_handler import AitemplateHandler
 from .sheet_handler import SheetHandler
+from .document_index import DocumentIndex
+from .render_context import RenderContext
+from .registry import (
+    BlockHandlerRegistry,
+    MARKDOWN_HANDLERS,
+    MARKDOWN_CONTAINER_HANDLERS,
+    PDF_HANDLERS,
+    markdown_handler,
+    pdf_handler
+)
 
 __all__ = [
     'BaseHandler',
@@ -44,5 +54,13 @@ __all__ = [
     'LinkPreviewHandler',
     'SubPageListHandler',
     'AitemplateHandler',
-    'SheetHandler'
+    'SheetHandler',
+    'DocumentIndex',
+    'RenderContext',
+    'BlockHandlerRegistry',
+    'MARKDOWN_HANDLERS',
+    'MARKDOWN_CONTAINER_HANDLERS',
+    'PDF_HANDLERS',
+    'markdown_handler',
+    'pdf_handler'
 ]
\ No newline at end of file
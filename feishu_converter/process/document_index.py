@@ -0,0 +1,171 @@
+"""
+文档块索引
+每次转换只构建一次，提供 block_id -> 块、block_id -> 子块、块的行内文本、深度和顺序，
+由适配器传给所有块处理器，避免处理器各自扫描全部块
+"""
+
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 行内文本所在的字段（块类型 -> 字段名）
+_INLINE_TEXT_KEYS = {
+    2: 'text',
+    3: 'heading1', 4: 'heading2', 5: 'heading3', 6: 'heading4', 7: 'heading5',
+    8: 'heading6', 9: 'heading7', 10: 'heading8', 11: 'heading9',
+    14: 'code',
+    15: 'quote',
+    32: 'table_cell',
+}
+
+
+class DocumentIndex:
+    """
+    不可变的文档块索引
+    子块按块在文档中出现的顺序排列，行内文本在首次访问时计算并缓存
+    """
+
+    def __init__(self, blocks: Iterable[Dict[str, Any]]):
+        """
+        构建文档块索引
+
+        :param blocks: 文档的所有块（父块在前）
+        """
+        blocks = tuple(blk for blk in blocks if 'block_id' in blk)
+        block_index = {}
+        order = {}
+        children: Dict[str, List[Dict[str, Any]]] = {}
+        page_block_id = None
+
+        for position, blk in enumerate(blocks):
+            block_id = blk['block_id']
+            block_index[block_id] = blk
+            order[block_id] = position
+            if page_block_id is None and blk.get('block_type') == 1:
+                page_block_id = block_id
+            parent_id = blk.get('parent_id')
+            if parent_id:
+                children.setdefault(parent_id, []).append(blk)
+
+        self._blocks = blocks
+        self._block_index = MappingProxyType(block_index)
+        self._children = MappingProxyType({parent_id: tuple(items) for parent_id, items in children.items()})
+        self._order = MappingProxyType(order)
+        self._depth: Dict[str, int] = {}
+        self._inline_text: Dict[str, str] = {}
+        self.page_block_id = page_block_id
+
+    @property
+    def all_blocks(self) -> Tuple[Dict[str, Any], ...]:
+        """所有块（按文档顺序）"""
+        return self._blocks
+
+    @property
+    def block_index(self) -> MappingProxyType:
+        """块索引（block_id -> block）"""
+        return self._block_index
+
+    @property
+    def parent_children_map(self) -> MappingProxyType:
+        """父子关系映射（block_id -> 子块元组）"""
+        return self._children
+
+    def get(self, block_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按ID获取块
+
+        :param block_id: 块ID
+        :return: 块数据，不存在返回None
+        """
+        return self._block_index.get(block_id)
+
+    def children(self, block_id: str) -> Tuple[Dict[str, Any], ...]:
+        """
+        获取块的子块
+
+        :param block_id: 块ID
+        :return: 子块元组
+        """
+        return self._children.get(block_id, ())
+
+    def order(self, block_id: str) -> int:
+        """
+        获取块在文档中的位置
+
+        :param block_id: 块ID
+        :return: 位置序号，不存在返回-1
+        """
+        return self._order.get(block_id, -1)
+
+    def depth(self, block_id: str) -> int:
+        """
+        获取块的深度（父块不在索引中的块深度为0）
+
+        :param block_id: 块ID
+        :return: 深度
+        """
+        if block_id in self._depth:
+            return self._depth[block_id]
+
+        # 沿父块向上查找到已知深度的祖先，再沿路径回填
+        path = []
+        current = block_id
+        while current in self._block_index and current not in self._depth:
+            path.append(current)
+            current = self._block_index[current].get('parent_id')
+        depth = self._depth[current] + 1 if current in self._depth else 0
+        for node_id in reversed(path):
+            self._depth[node_id] = depth
+            depth += 1
+        return self._depth.get(block_id, 0)
+
+    def inline_text(self, block_id: str) -> str:
+        """
+        获取块自身的行内文本（带Markdown样式，代码块不加样式），用于表格单元格等场景
+
+        :param block_id: 块ID
+        :return: 行内文本，块不存在或没有行内文本时返回空字符串
+        """
+        text = self._inline_text.get(block_id)
+        if text is None:
+            blk = self._block_index.get(block_id)
+            text = _render_inline_text(blk) if blk else ''
+            self._inline_text[block_id] = text
+        return text
+
+    def __contains__(self, block_id: str) -> bool:
+        return block_id in self._block_index
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+
+def _render_inline_text(blk: Dict[str, Any]) -> str:
+    """
+    渲染块的行内文本
+
+    :param blk: 块数据
+    :return: 行内文本
+    """
+    block_type = blk.get('block_type')
+    key = _INLINE_TEXT_KEYS.get(block_type)
+    if not key or key not in blk:
+        return ''
+
+    styled = block_type != 14  # 代码块保留原文
+    text_parts = []
+    for element in blk[key].get('elements', []):
+        if 'text_run' not in element:
+            continue
+        content_val = element['text_run'].get('content', '')
+        style = element['text_run'].get('text_element_style', {})
+        if styled and style:
+            if style.get('bold', False):
+                content_val = f"**{content_val}**"
+            if style.get('italic', False):
+                content_val = f"*{content_val}*"
+            if style.get('strikethrough', False):
+                content_val = f"~~{content_val}~~"
+            if style.get('inline_code', False):
+                content_val = f"`{content_val}`"
+        text_parts.append(content_val)
+    return ''.join(text_parts)
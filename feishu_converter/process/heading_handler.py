@@ -1,26 +1,33 @@
 """
 标题处理器类
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .base_handler import BaseHandler
+from .render_context import RenderContext
 
 
 class HeadingHandler(BaseHandler):
     """
     处理标题相关的块类型
     """
-    # 类变量，用于跟踪标题序号
+    # 类变量，未提供渲染上下文时用于跟踪标题序号
     # 索引0对应H1, 索引1对应H2, 以此类推
     heading_numbers = [0, 0, 0, 0, 0, 0, 0, 0, 0]
     
     @staticmethod
-    def process_heading(block: Dict[str, Any], level: int, markdown_lines: List[str]):
+    def process_heading(
+        block: Dict[str, Any],
+        level: int,
+        markdown_lines: List[str],
+        context: Optional[RenderContext] = None
+    ):
         """
         处理标题块
         
         :param block: 块数据
         :param level: 标题级别
         :param markdown_lines: Markdown行列表
+        :param context: 渲染上下文，标题序号计数器保存在其中
         """
         import logging
         logger = logging.getLogger(__name__)
@@ -52,18 +59,20 @@ class HeadingHandler(BaseHandler):
                 # 计算标题级别索引（H1对应索引0）
                 level_index = level - 1
                 
+                heading_numbers = context.heading_numbers if context is not None else HeadingHandler.heading_numbers
+                
                 # 更新标题序号
                 # 1. 增加当前级别的序号
-                HeadingHandler.heading_numbers[level_index] += 1
+                heading_numbers[level_index] += 1
                 # 2. 重置所有子级别的序号
-                for i in range(level_index + 1, len(HeadingHandler.heading_numbers)):
-                    HeadingHandler.heading_numbers[i] = 0
+                for i in range(level_index + 1, len(heading_numbers)):
+                    heading_numbers[i] = 0
                 
                 # 生成序号字符串
                 sequence_parts = []
                 for i in range(level_index + 1):
-                    if HeadingHandler.heading_numbers[i] > 0:
-                        sequence_parts.append(str(HeadingHandler.heading_numbers[i]))
+                    if heading_numbers[i] > 0:
+                        sequence_parts.append(str(heading_numbers[i]))
                 sequence = '.'.join(sequence_parts) + '. '
                 
                 logger.debug(f"动态生成的序号: {sequence}")
@@ -1,9 +1,12 @@
 """
 图像处理器类
 """
+import os
 from typing import Dict, Any, List, Optional
 from .base_handler import BaseHandler
+from .render_context import RenderContext
 from ..utils.image_utils import ImageUtils
+from ..utils.media_store import get_media_store
 from ..api import FeishuDocAPI
 
 
@@ -12,14 +15,14 @@ class ImageHandler(BaseHandler):
     处理图像相关的块类型
     """
     
-    # 类变量，存储输出目录
+    # 类变量，未提供渲染上下文时使用的输出目录
     output_dir: Optional[str] = None
     output_filename: Optional[str] = None
     
     @classmethod
     def set_output_dir(cls, output_dir: str, output_filename: str = None):
         """
-        设置输出目录
+        设置未提供渲染上下文时使用的输出目录
         
         :param output_dir: 输出目录路径
         :param output_filename: 输出文件名（不含扩展名）
@@ -28,58 +31,101 @@ class ImageHandler(BaseHandler):
         cls.output_filename = output_filename
     
     @staticmethod
-    def process_image(block: Dict[str, Any], markdown_lines: List[str]):
+    def process_image(block: Dict[str, Any], markdown_lines: List[str], context: Optional[RenderContext] = None):
         """
         处理图片块
         
         :param block: 块数据
         :param markdown_lines: Markdown行列表
+        :param context: 渲染上下文，提供输出目录、API客户端和图片缓存；未提供时使用 set_output_dir 设置的目录
         """
         # 飞书API中图片信息可能存储在不同的字段
         image_info = block.get('image', {})
         token = image_info.get('token', '')
         caption = image_info.get('caption', '图片')
         
+        if context is not None:
+            output_dir = context.output_dir
+            output_filename = context.output_filename
+        else:
+            output_dir = ImageHandler.output_dir
+            output_filename = ImageHandler.output_filename
+        
         if token:
-            # 获取访问令牌
-            api = FeishuDocAPI()
-            access_token = api.get_access_token()
-            
-            if access_token:
-                # 确定图片保存目录
-                if ImageHandler.output_dir:
-                    import os
-                    # 创建图片子目录
-                    images_dir = os.path.join(ImageHandler.output_dir, f"{ImageHandler.output_filename}_images")
-                    os.makedirs(images_dir, exist_ok=True)
-                else:
-                    import tempfile
-                    images_dir = os.path.join(tempfile.gettempdir(), "feishu_images")
-                
-                # 初始化图片工具类
-                image_utils = ImageUtils(cache_dir=images_dir, access_token=access_token)
-                
-                # 下载图片
-                local_path = image_utils.download_image(token)
-                
-                if local_path:
-                    # 如果设置了输出目录，使用相对路径
-                    if ImageHandler.output_dir:
-                        import os
-                        # 计算相对路径
-                        relative_path = os.path.relpath(local_path, ImageHandler.output_dir)
-                        markdown_lines.append(f"![{caption}]({relative_path})")
-                    else:
-                        # 使用绝对路径
-                        markdown_lines.append(f"![{caption}]({local_path})")
+            local_path = ImageHandler._download_image(token, output_dir, output_filename, context)
+            if local_path:
+                # 如果设置了输出目录，使用相对路径
+                if output_dir:
+                    # 计算相对路径
+                    relative_path = os.path.relpath(local_path, output_dir)
+                    markdown_lines.append(f"![{caption}]({relative_path})")
                 else:
-                    # 如果下载失败，使用在线URL作为备用
-                    markdown_lines.append(f"![{caption}](https://internal-api-drive.stream.feishu.cn/space/api/box/stream/download/preview/?file_token={token})")
+                    # 使用绝对路径
+                    markdown_lines.append(f"![{caption}]({local_path})")
             else:
-                # 如果没有访问令牌，使用在线URL
+                # 如果没有访问令牌或下载失败，使用在线URL作为备用
                 markdown_lines.append(f"![{caption}](https://internal-api-drive.stream.feishu.cn/space/api/box/stream/download/preview/?file_token={token})")
         else:
             # 如果没有token，添加占位符
             markdown_lines.append("![图片](图片占位符)")
         
-        BaseHandler.add_empty_line(markdown_lines)
\ No newline at end of file
+        BaseHandler.add_empty_line(markdown_lines)
+
+    @staticmethod
+    def _download_image(
+        token: str,
+        output_dir: Optional[str],
+        output_filename: Optional[str],
+        context: Optional[RenderContext] = None
+    ) -> Optional[str]:
+        """
+        获取图片的本地路径，优先使用预取结果
+        
+        :param token: 图片token
+        :param output_dir: 输出目录
+        :param output_filename: 输出文件名（不含扩展名）
+        :param context: 渲染上下文，同一文档中重复引用的图片只下载一次
+        :return: 本地路径，没有访问令牌或下载失败返回None
+        """
+        if context is None:
+            return ImageHandler.fetch_image(token, output_dir, output_filename, FeishuDocAPI())
+        
+        if token not in context.image_paths:
+            future = context.image_futures.pop(token, None)
+            if future is not None:
+                # 等待预取完成
+                try:
+                    context.image_paths[token] = future.result()
+                except Exception:
+                    context.image_paths[token] = None
+            else:
+                context.image_paths[token] = ImageHandler.fetch_image(token, output_dir, output_filename, context.api)
+        return context.image_paths[token]
+
+    @staticmethod
+    def fetch_image(token: str, output_dir: Optional[str], output_filename: Optional[str], api: FeishuDocAPI) -> Optional[str]:
+        """
+        下载图片到图片目录（可在预取线程中调用）
+        
+        :param token: 图片token
+        :param output_dir: 输出目录，为空时下载到临时目录
+        :param output_filename: 输出文件名（不含扩展名）
+        :param api: API客户端，用于获取访问令牌
+        :return: 本地路径，没有访问令牌或下载失败返回None
+        """
+        # 获取访问令牌（素材库中已有的图片不需要令牌）
+        access_token = api.get_access_token()
+        media_store = get_media_store()
+        if not access_token and media_store is None:
+            return None
+        
+        # 确定图片保存目录，未指定输出目录时使用系统临时目录中的共享缓存（在缓存索引中记录）
+        images_dir = None
+        if output_dir:
+            # 创建图片子目录
+            images_dir = os.path.join(output_dir, f"{output_filename}_images")
+            os.makedirs(images_dir, exist_ok=True)
+        
+        # 初始化图片工具类并下载图片
+        image_utils = ImageUtils(cache_dir=images_dir, access_token=access_token, media_store=media_store)
+        return image_utils.download_image(token)
@@ -0,0 +1,106 @@
+"""
+图片预取
+渲染前扫描文档中的图片块，在有界线程池中并发下载，渲染时直接使用下载结果，
+图片总耗时由各图片下载时间之和变为其中的最大值
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .render_context import RenderContext
+
+# 图片块类型
+IMAGE_BLOCK_TYPE = 27
+
+# 默认下载并发数，FEISHU_IMAGE_WORKERS=0 时关闭预取
+DEFAULT_IMAGE_WORKERS = int(os.getenv("FEISHU_IMAGE_WORKERS", "8"))
+
+
+def collect_image_tokens(blocks: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    按文档顺序收集图片token（去重）
+
+    :param blocks: 文档块
+    :return: 图片token列表
+    """
+    tokens = []
+    seen = set()
+    for blk in blocks:
+        if blk.get('block_type') != IMAGE_BLOCK_TYPE:
+            continue
+        token = blk.get('image', {}).get('token')
+        if token and token not in seen:
+            seen.add(token)
+            tokens.append(token)
+    return tokens
+
+
+class ImagePrefetcher:
+    """
+    图片预取器
+    所有转换共用一个线程池，并发下载数不随同时转换的文档数增长；
+    下载经过 ImageUtils，与API请求共用限流配额和重试策略
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_IMAGE_WORKERS):
+        """
+        初始化图片预取器
+
+        :param max_workers: 最大并发下载数
+        """
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-prefetch")
+
+    def prefetch(self, context: RenderContext, tokens: Iterable[str]) -> int:
+        """
+        提交图片下载任务，结果保存在渲染上下文中
+
+        :param context: 渲染上下文
+        :param tokens: 图片token
+        :return: 新提交的下载任务数
+        """
+        from .image_handler import ImageHandler
+
+        submitted = 0
+        for token in tokens:
+            if token in context.image_futures or token in context.image_paths:
+                continue
+            context.image_futures[token] = self._executor.submit(
+                ImageHandler.fetch_image, token, context.output_dir, context.output_filename, context.api
+            )
+            submitted += 1
+        if submitted:
+            self.logger.debug(f"已提交 {submitted} 个图片预取任务")
+        return submitted
+
+    def shutdown(self, wait: bool = True):
+        """
+        关闭线程池
+
+        :param wait: 是否等待未完成的下载
+        """
+        self._executor.shutdown(wait=wait)
+
+
+_prefetcher: Optional[ImagePrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_image_prefetcher() -> Optional[ImagePrefetcher]:
+    """
+    获取进程级共享的图片预取器
+
+    :return: 图片预取器，FEISHU_IMAGE_WORKERS=0 时返回None
+    """
+    global _prefetcher
+    if DEFAULT_IMAGE_WORKERS <= 0:
+        return None
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = ImagePrefetcher(DEFAULT_IMAGE_WORKERS)
+    return _prefetcher
@@ -2,8 +2,9 @@
 列表处理器类
 """
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .base_handler import BaseHandler
+from .render_context import RenderContext
 
 
 class ListHandler(BaseHandler):
@@ -33,7 +34,7 @@ class ListHandler(BaseHandler):
             markdown_lines.append(f"- {''.join(text_parts)}")
             BaseHandler.add_empty_line(markdown_lines)
     
-    # 类变量，用于跟踪有序列表的序号
+    # 类变量，未提供渲染上下文时用于跟踪有序列表的序号
     _ordered_list_index = 1
     
     @staticmethod
@@ -44,12 +45,13 @@ class ListHandler(BaseHandler):
         ListHandler._ordered_list_index = 1
     
     @staticmethod
-    def process_ordered_list(block: Dict[str, Any], markdown_lines: List[str]):
+    def process_ordered_list(block: Dict[str, Any], markdown_lines: List[str], context: Optional[RenderContext] = None):
         """
         处理有序列表块
         
         :param block: 块数据
         :param markdown_lines: Markdown行列表
+        :param context: 渲染上下文，序号计数器保存在其中
         """
         # 记录块数据结构以便调试
         ListHandler.logger.debug(f"有序列表块数据: {block}")
@@ -65,22 +67,22 @@ class ListHandler(BaseHandler):
         # 获取列表项的序号
         ordered_data = block.get('ordered', {})
         
+        current_index = context.ordered_list_index if context is not None else ListHandler._ordered_list_index
+        
         # 使用飞书返回的序号
         sequence = ordered_data.get('sequence', None)
-        if sequence is not None:
+        try:
             # 尝试将sequence转换为整数
-            try:
-                index = int(sequence)
-                # 更新序号计数器，为下一个列表项做准备
-                ListHandler._ordered_list_index = index + 1
-            except (ValueError, TypeError):
-                # 如果转换失败，使用当前序号
-                index = ListHandler._ordered_list_index
-                ListHandler._ordered_list_index += 1
+            index = int(sequence) if sequence is not None else current_index
+        except (ValueError, TypeError):
+            # 如果转换失败，使用当前序号
+            index = current_index
+        
+        # 更新序号计数器，为下一个列表项做准备
+        if context is not None:
+            context.ordered_list_index = index + 1
         else:
-            # 如果没有sequence，使用当前序号
-            index = ListHandler._ordered_list_index
-            ListHandler._ordered_list_index += 1
+            ListHandler._ordered_list_index = index + 1
         
         ListHandler.logger.debug(f"使用的序号: {index}")
         ListHandler.logger.debug(f"提取的文本部分: {text_parts}")
@@ -0,0 +1,158 @@
+"""
+块处理器注册表
+按 block_type 查表分发块处理函数，适配器不再需要逐个判断块类型；
+自定义块类型可通过装饰器注册，无需修改适配器
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ContainerHandler:
+    """
+    容器块处理器（如高亮块、引用容器、视图）
+    适配器用显式栈遍历块树：进入容器时调用 enter，容器的子块全部输出后调用 exit，
+    因此嵌套深度不受 Python 递归深度限制
+    """
+
+    def enter(self, adapter, block: Dict[str, Any], lines: List[str], context) -> Optional[List[str]]:
+        """
+        进入容器块
+
+        :param adapter: 适配器
+        :param block: 容器块
+        :param lines: 输出行列表
+        :param context: 渲染上下文
+        :return: 子块的输出行列表（可以是 lines 本身），返回 None 表示不处理子块
+        """
+        return lines
+
+    def render_child(self, adapter, child: Dict[str, Any], child_lines: List[str], context) -> bool:
+        """
+        容器自行处理子块的机会
+
+        :param adapter: 适配器
+        :param child: 子块
+        :param child_lines: 子块的输出行列表
+        :param context: 渲染上下文
+        :return: 是否已处理，返回 False 时按注册表分发
+        """
+        return False
+
+    def exit(self, adapter, block: Dict[str, Any], lines: List[str], child_lines: List[str], context):
+        """
+        子块全部输出后退出容器块
+
+        :param adapter: 适配器
+        :param block: 容器块
+        :param lines: 输出行列表
+        :param child_lines: 子块的输出行列表
+        :param context: 渲染上下文
+        """
+
+
+class BlockHandlerRegistry:
+    """
+    块处理器注册表
+    每种输出格式维护自己的注册表，处理函数的签名由对应的适配器约定
+    """
+
+    def __init__(self, name: str):
+        """
+        初始化注册表
+
+        :param name: 注册表名称（用于日志和调试）
+        """
+        self.name = name
+        self._handlers: Dict[int, Callable] = {}
+        self.default: Optional[Callable] = None
+
+    def register(self, *block_types: int) -> Callable[[Callable], Callable]:
+        """
+        注册处理函数的装饰器，同一函数可以处理多种块类型，后注册的覆盖先注册的
+
+        :param block_types: 块类型
+        :return: 装饰器
+        """
+        def decorator(func: Callable) -> Callable:
+            for block_type in block_types:
+                self._handlers[block_type] = func
+            return func
+        return decorator
+
+    def register_default(self, func: Callable) -> Callable:
+        """
+        注册未知块类型的默认处理函数（装饰器）
+
+        :param func: 处理函数
+        :return: 原函数
+        """
+        self.default = func
+        return func
+
+    def unregister(self, block_type: int):
+        """
+        取消注册块类型
+
+        :param block_type: 块类型
+        """
+        self._handlers.pop(block_type, None)
+
+    def get(self, block_type: Any) -> Optional[Callable]:
+        """
+        查找块类型对应的处理函数
+
+        :param block_type: 块类型
+        :return: 处理函数，未注册时返回默认处理函数
+        """
+        return self._handlers.get(block_type, self.default)
+
+    def block_types(self) -> List[int]:
+        """返回已注册的块类型"""
+        return sorted(self._handlers)
+
+    def __contains__(self, block_type: Any) -> bool:
+        return block_type in self._handlers
+
+
+# Markdown：完整分发，处理函数签名为 (adapter, block, markdown_lines, context) -> bool，
+# context 为渲染上下文（RenderContext），返回 True 表示已自行处理子块，适配器不再处理子块；
+# 也可以注册 ContainerHandler 实例，由适配器在子块前后调用 enter/exit
+MARKDOWN_HANDLERS = BlockHandlerRegistry("markdown")
+
+# Markdown：容器块（高亮块、视图、引用容器）直接子块的分发，签名同上
+MARKDOWN_CONTAINER_HANDLERS = BlockHandlerRegistry("markdown_container")
+
+# PDF：处理函数签名为 (adapter, block, story, context)
+PDF_HANDLERS = BlockHandlerRegistry("pdf")
+
+
+def markdown_handler(*block_types: int, in_containers: bool = True) -> Callable[[Callable], Callable]:
+    """
+    注册自定义Markdown块处理函数的装饰器
+
+    用法::
+
+        @markdown_handler(60)
+        def process_my_block(adapter, block, markdown_lines, context):
+            markdown_lines.append(...)
+
+    :param block_types: 块类型
+    :param in_containers: 是否同时用于高亮块、视图、引用容器内部的子块
+    :return: 装饰器
+    """
+    def decorator(func: Callable) -> Callable:
+        MARKDOWN_HANDLERS.register(*block_types)(func)
+        if in_containers:
+            MARKDOWN_CONTAINER_HANDLERS.register(*block_types)(func)
+        return func
+    return decorator
+
+
+def pdf_handler(*block_types: int) -> Callable[[Callable], Callable]:
+    """
+    注册自定义PDF块处理函数的装饰器，签名为 (adapter, block, story, context)
+
+    :param block_types: 块类型
+    :return: 装饰器
+    """
+    return PDF_HANDLERS.register(*block_types)
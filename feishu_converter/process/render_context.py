@@ -0,0 +1,69 @@
+"""
+渲染上下文
+保存单次转换的全部可变状态（输出路径、计数器、缓存、API客户端），
+由适配器在每次转换时创建并传给所有块处理器，多个文档可以在同一进程内并发转换
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from .document_index import DocumentIndex
+
+
+class RenderContext:
+    """
+    单次转换的渲染上下文
+    """
+
+    def __init__(
+        self,
+        output_path: Optional[str] = None,
+        index: Optional[DocumentIndex] = None,
+        api: Any = None,
+        temp_dir: Optional[str] = None
+    ):
+        """
+        初始化渲染上下文
+
+        :param output_path: 输出文件路径，图片保存在同目录下的 {文件名}_images 目录
+        :param index: 文档索引
+        :param api: FeishuDocAPI 实例，未提供时首次使用时创建
+        :param temp_dir: 临时目录（PDF下载图片使用）
+        """
+        if output_path:
+            self.output_dir: Optional[str] = os.path.dirname(os.path.abspath(output_path))
+            self.output_filename: Optional[str] = os.path.splitext(os.path.basename(output_path))[0]
+        else:
+            self.output_dir = None
+            self.output_filename = None
+        self.index = index
+        self.temp_dir = temp_dir
+
+        # 有序列表序号计数器
+        self.ordered_list_index = 1
+        # 标题序号计数器，索引0对应H1, 索引1对应H2, 以此类推
+        self.heading_numbers: List[int] = [0] * 9
+        # 图片下载结果缓存（token -> 本地路径，下载失败为None）
+        self.image_paths: Dict[str, Optional[str]] = {}
+        # 尚未取用的图片预取任务（token -> Future）
+        self.image_futures: Dict[str, Future] = {}
+        # 尚未取用的嵌入电子表格预取任务（嵌入token -> Future，结果为 (是否有权限, 表格数据)）
+        self.sheet_futures: Dict[str, Future] = {}
+        # 获取文档时预取的外部资源（见 ResourcePlanner.resolve）
+        self.resources: Dict[str, Dict[str, Any]] = {}
+
+        self._api = api
+        self._api_lock = threading.Lock()
+
+    @property
+    def api(self):
+        """API客户端（首次使用时创建）"""
+        if self._api is None:
+            with self._api_lock:
+                if self._api is None:
+                    from ..api import FeishuDocAPI
+                    self._api = FeishuDocAPI()
+        return self._api
+
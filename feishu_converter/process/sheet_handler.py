@@ -1,24 +1,75 @@
 """
 电子表格处理器类
 """
-from typing import Dict, Any, List
+import os
+from typing import Dict, Any, List, Optional, Tuple
 from .base_handler import BaseHandler
+from .render_context import RenderContext
 from ..api import FeishuDocAPI, PermissionType
+from ..utils.run_cache import RunCache
+
+# 嵌入电子表格缓存的有效期（秒）和容量（单元格数）
+EMBED_CACHE_TTL = float(os.getenv("FEISHU_EMBED_CACHE_TTL", "600"))
+EMBED_CACHE_MAX_CELLS = int(os.getenv("FEISHU_EMBED_CACHE_MAX_CELLS", "2000000"))
+
+
+def _sheet_data_cells(sheet_data: Dict[str, Any]) -> int:
+    """估算工作表数据占用的单元格数"""
+    values = sheet_data.get('valueRange', {}).get('values') or []
+    return max(1, sum(len(row) for row in values))
 
 
 class SheetHandler(BaseHandler):
     """
     处理电子表格类型的块
+    同一次运行中，同一电子表格的权限检查结果和同一工作表的数据只请求一次
     """
     
+    # 权限检查结果（电子表格token -> 是否有权限）
+    permission_cache = RunCache("sheet_permission", ttl=EMBED_CACHE_TTL, max_entries=10000)
+    # 工作表数据（嵌入token -> 接口返回数据），按单元格数限制总大小
+    data_cache = RunCache(
+        "sheet_data",
+        ttl=EMBED_CACHE_TTL,
+        max_entries=1024,
+        max_weight=EMBED_CACHE_MAX_CELLS,
+        weigher=_sheet_data_cells
+    )
+    
+    @classmethod
+    def clear_cache(cls):
+        """清空权限和工作表数据缓存（开始新一轮批量转换时调用）"""
+        cls.permission_cache.clear()
+        cls.data_cache.clear()
+    
     @staticmethod
-    def process_sheet(sheet_block: Dict[str, Any], markdown_lines: List[str]):
+    def load_embed(api: FeishuDocAPI, token: str) -> Tuple[Optional[bool], Optional[Dict[str, Any]]]:
+        """
+        检查嵌入电子表格的权限并获取工作表数据（经过运行期缓存，可在预取线程中调用）
+        只缓存明确的权限结果，检查出错时不缓存，仍尝试获取数据
+        
+        :param api: API客户端
+        :param token: 嵌入token（格式为 spreadsheet_token_sheet_id）
+        :return: (是否有权限，无法确定时为None, 工作表数据)，没有权限或获取失败时数据为None
+        """
+        spreadsheet_token = token.split('_', 1)[0]
+        has_permission = SheetHandler.permission_cache.get_or_load(
+            spreadsheet_token,
+            lambda: api.check_permission(spreadsheet_token, PermissionType.SHEET, "view")
+        )
+        if has_permission is False:
+            return False, None
+        return has_permission, SheetHandler.data_cache.get_or_load(token, lambda: api.get_spreadsheet_data(token))
+    
+    @staticmethod
+    def process_sheet(sheet_block: Dict[str, Any], markdown_lines: List[str], context: Optional[RenderContext] = None):
         """
         处理电子表格块，包括潜在的表格数据
         注意：只保留文本内容，不保留样式信息
         
         :param sheet_block: 电子表格块
         :param markdown_lines: Markdown行列表
+        :param context: 渲染上下文，提供时复用其中的API客户端
         """
         # 电子表格通常包含一些元数据，尝试提取相关信息
         sheet_info = sheet_block.get('sheet', {})
@@ -30,19 +81,31 @@ class SheetHandler(BaseHandler):
             spreadsheet_token = token_parts[0]
             sheet_id = token_parts[1] if len(token_parts) > 1 else None
             
-            # 检查是否有权限访问此电子表格
-            api = FeishuDocAPI()
-            has_permission = api.check_permission(spreadsheet_token, PermissionType.SHEET, "view")
+            # 渲染前已提交的预取任务，或获取文档时已预取的结果
+            future = context.sheet_futures.pop(token, None) if context is not None else None
+            resources = context.resources if context is not None else {}
+            permissions = resources.get('sheet_permissions', {})
+            prefetched_sheets = resources.get('sheets', {})
             
-            if not has_permission:
-                # 如果没有权限，添加引用字符串
+            if future is not None:
+                try:
+                    has_permission, sheet_data = future.result()
+                except Exception:
+                    has_permission, sheet_data = SheetHandler.load_embed(context.api, token)
+            elif spreadsheet_token in permissions and (permissions[spreadsheet_token] is False or token in prefetched_sheets):
+                has_permission = permissions[spreadsheet_token]
+                sheet_data = prefetched_sheets.get(token)
+            else:
+                # 检查权限并获取具体表格数据，使用原始token（包含电子表格token和工作表ID）
+                api = context.api if context is not None else FeishuDocAPI()
+                has_permission, sheet_data = SheetHandler.load_embed(api, token)
+            
+            if has_permission is False:
+                # 如果确定没有权限，添加引用字符串（无法确定权限时按获取到的数据处理）
                 title = sheet_info.get('title', '嵌入的电子表格')
                 markdown_lines.append(f"> [{title}](https://docs.feiShu.cn/sheets/{spreadsheet_token}): 需要权限才能访问")
                 SheetHandler.add_empty_line(markdown_lines)
                 return
-
-            # 获取具体表格数据
-            sheet_data = api.get_spreadsheet_data(token)  # 使用原始token，包含电子表格token和工作表ID
             
             if sheet_data:
                 # 获取电子表格数据并转换为Markdown表格
@@ -0,0 +1,104 @@
+"""
+嵌入电子表格预取
+块分页到达时提交嵌入电子表格的权限检查和数据获取，与后续分页的获取和渲染重叠执行，
+渲染到电子表格块时直接使用结果
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .render_context import RenderContext
+
+# 电子表格块类型
+SHEET_BLOCK_TYPE = 30
+
+# 默认并发请求数，FEISHU_RESOURCE_WORKERS=0 时关闭预取
+DEFAULT_RESOURCE_WORKERS = int(os.getenv("FEISHU_RESOURCE_WORKERS", "8"))
+
+
+def collect_sheet_tokens(blocks: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    按文档顺序收集嵌入电子表格token（去重，格式为 spreadsheet_token_sheet_id）
+
+    :param blocks: 文档块
+    :return: 嵌入token列表
+    """
+    tokens = []
+    seen = set()
+    for blk in blocks:
+        if blk.get('block_type') != SHEET_BLOCK_TYPE:
+            continue
+        token = blk.get('sheet', {}).get('token')
+        if token and token not in seen:
+            seen.add(token)
+            tokens.append(token)
+    return tokens
+
+
+class SheetPrefetcher:
+    """
+    嵌入电子表格预取器
+    所有转换共用一个线程池；权限和数据经过 SheetHandler 的运行期缓存，
+    同一电子表格的多个嵌入只检查一次权限
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_RESOURCE_WORKERS):
+        """
+        初始化预取器
+
+        :param max_workers: 最大并发请求数
+        """
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheet-prefetch")
+
+    def prefetch(self, context: RenderContext, tokens: Iterable[str]) -> int:
+        """
+        提交嵌入电子表格的获取任务，结果保存在渲染上下文中
+
+        :param context: 渲染上下文
+        :param tokens: 嵌入token
+        :return: 新提交的任务数
+        """
+        from .sheet_handler import SheetHandler
+
+        submitted = 0
+        for token in tokens:
+            if token in context.sheet_futures:
+                continue
+            context.sheet_futures[token] = self._executor.submit(SheetHandler.load_embed, context.api, token)
+            submitted += 1
+        if submitted:
+            self.logger.debug(f"已提交 {submitted} 个嵌入电子表格预取任务")
+        return submitted
+
+    def shutdown(self, wait: bool = True):
+        """
+        关闭线程池
+
+        :param wait: 是否等待未完成的任务
+        """
+        self._executor.shutdown(wait=wait)
+
+
+_prefetcher: Optional[SheetPrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_sheet_prefetcher() -> Optional[SheetPrefetcher]:
+    """
+    获取进程级共享的嵌入电子表格预取器
+
+    :return: 预取器，FEISHU_RESOURCE_WORKERS=0 时返回None
+    """
+    global _prefetcher
+    if DEFAULT_RESOURCE_WORKERS <= 0:
+        return None
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = SheetPrefetcher(DEFAULT_RESOURCE_WORKERS)
+    return _prefetcher
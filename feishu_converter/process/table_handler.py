@@ -1,8 +1,9 @@
 """
 表格处理器类
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .base_handler import BaseHandler
+from .document_index import DocumentIndex
 
 
 class TableHandler(BaseHandler):
@@ -11,169 +12,27 @@ class TableHandler(BaseHandler):
     """
     
     @staticmethod
-    def process_table(block: Dict[str, Any], markdown_lines: List[str], all_blocks: List[Dict[str, Any]] = None):
+    def process_table(
+        block: Dict[str, Any],
+        markdown_lines: List[str],
+        all_blocks: List[Dict[str, Any]] = None,
+        index: Optional[DocumentIndex] = None
+    ):
         """
         处理表格块
         
         :param block: 块数据
         :param markdown_lines: Markdown行列表
-        :param all_blocks: 所有块的列表，用于构建索引和ID到内容的映射
+        :param all_blocks: 所有块的列表，未提供 index 时用于构建文档索引
+        :param index: 文档索引，由适配器每次转换构建一次，多个表格共用
         """
         # 普通表格不需要权限检查，只有电子表格需要
         # 电子表格的权限检查已在SheetHandler中处理
         # 这里继续处理普通表格
         
-        # 如果提供了所有块的信息，构建索引和映射
-        block_index = {}
-        id_to_content = {}
-        
-        if all_blocks:
-            # 构建块索引
-            block_index = {blk['block_id']: blk for blk in all_blocks}
-            
-            # 构建ID到内容的映射
-            for blk in all_blocks:
-                blk_type = blk.get('block_type')
-                
-                # 为文本块建立ID映射
-                if blk_type == 2:  # 文本块
-                    elements = blk.get('text', {}).get('elements', [])
-                    text_parts = []
-                    
-                    for element in elements:
-                        if 'text_run' in element:
-                            content_val = element['text_run'].get('content', '')
-                            # 处理文本样式
-                            style = element['text_run'].get('text_element_style', {})
-                            if style:
-                                bold = style.get('bold', False)
-                                italic = style.get('italic', False)
-                                strikethrough = style.get('strikethrough', False)
-                                inline_code = style.get('inline_code', False)
-                                
-                                if bold:
-                                    content_val = f"**{content_val}**"
-                                if italic:
-                                    content_val = f"*{content_val}*"
-                                if strikethrough:
-                                    content_val = f"~~{content_val}~~"
-                                if inline_code:
-                                    content_val = f"`{content_val}`"
-                            
-                            text_parts.append(content_val)
-                    
-                    full_content = ''.join(text_parts)
-                    if full_content:
-                        id_to_content[blk['block_id']] = full_content
-                # 处理标题块
-                elif blk_type in [3, 4, 5, 6, 7, 8, 9, 10, 11]:  # 各级标题
-                    block_key_map = {
-                        3: 'heading1', 4: 'heading2', 5: 'heading3', 6: 'heading4',
-                        7: 'heading5', 8: 'heading6', 9: 'heading7', 10: 'heading8', 11: 'heading9'
-                    }
-                    block_key = block_key_map.get(blk_type)
-                    if block_key and block_key in blk:
-                        elements = blk[block_key].get('elements', [])
-                        text_parts = []
-                        
-                        for element in elements:
-                            if 'text_run' in element:
-                                content_val = element['text_run'].get('content', '')
-                                # 处理文本样式
-                                style = element['text_run'].get('text_element_style', {})
-                                if style:
-                                    bold = style.get('bold', False)
-                                    italic = style.get('italic', False)
-                                    strikethrough = style.get('strikethrough', False)
-                                    inline_code = style.get('inline_code', False)
-                                    
-                                    if bold:
-                                        content_val = f"**{content_val}**"
-                                    if italic:
-                                        content_val = f"*{content_val}*"
-                                    if strikethrough:
-                                        content_val = f"~~{content_val}~~"
-                                    if inline_code:
-                                        content_val = f"`{content_val}`"
-                                
-                                text_parts.append(content_val)
-                        
-                        full_content = ''.join(text_parts)
-                        if full_content:
-                            id_to_content[blk['block_id']] = full_content
-                # 处理引用块
-                elif blk_type == 15:  # 引用
-                    elements = blk.get('quote', {}).get('elements', [])
-                    text_parts = []
-                    
-                    for element in elements:
-                        if 'text_run' in element:
-                            content_val = element['text_run'].get('content', '')
-                            # 处理文本样式
-                            style = element['text_run'].get('text_element_style', {})
-                            if style:
-                                bold = style.get('bold', False)
-                                italic = style.get('italic', False)
-                                strikethrough = style.get('strikethrough', False)
-                                inline_code = style.get('inline_code', False)
-                                
-                                if bold:
-                                    content_val = f"**{content_val}**"
-                                if italic:
-                                    content_val = f"*{content_val}*"
-                                if strikethrough:
-                                    content_val = f"~~{content_val}~~"
-                                if inline_code:
-                                    content_val = f"`{content_val}`"
-                            
-                            text_parts.append(content_val)
-                    
-                    full_content = ''.join(text_parts)
-                    if full_content:
-                        id_to_content[blk['block_id']] = full_content
-                # 处理代码块
-                elif blk_type == 14:  # 代码块
-                    elements = blk.get('code', {}).get('elements', [])
-                    text_parts = []
-                    
-                    for element in elements:
-                        if 'text_run' in element:
-                            content_val = element['text_run'].get('content', '')
-                            text_parts.append(content_val)
-                    
-                    full_content = ''.join(text_parts)
-                    if full_content:
-                        id_to_content[blk['block_id']] = full_content
-                # 处理表格单元格
-                elif blk_type == 32:  # 表格单元格
-                    elements = blk.get('table_cell', {}).get('elements', [])
-                    text_parts = []
-                    
-                    for element in elements:
-                        if 'text_run' in element:
-                            content_val = element['text_run'].get('content', '')
-                            # 处理文本样式
-                            style = element['text_run'].get('text_element_style', {})
-                            if style:
-                                bold = style.get('bold', False)
-                                italic = style.get('italic', False)
-                                strikethrough = style.get('strikethrough', False)
-                                inline_code = style.get('inline_code', False)
-                                
-                                if bold:
-                                    content_val = f"**{content_val}**"
-                                if italic:
-                                    content_val = f"*{content_val}*"
-                                if strikethrough:
-                                    content_val = f"~~{content_val}~~"
-                                if inline_code:
-                                    content_val = f"`{content_val}`"
-                            
-                            text_parts.append(content_val)
-                    
-                    full_content = ''.join(text_parts)
-                    if full_content:
-                        id_to_content[blk['block_id']] = full_content
+        if index is None and all_blocks:
+            index = DocumentIndex(all_blocks)
+        block_index = index.block_index if index is not None else {}
         
         table_data = block.get('table', {})
         cells = table_data.get('cells', [])  # cells 包含单元格块 ID
@@ -192,9 +51,10 @@ class TableHandler(BaseHandler):
                         # 获取单元格ID
                         cell_id = cells[idx]
                         
-                        # 如果提供了ID到内容的映射，优先使用映射
-                        if id_to_content and isinstance(cell_id, str) and cell_id in id_to_content:
-                            cell_content = id_to_content[cell_id]
+                        # 优先使用单元格块自身的行内文本
+                        inline_text = index.inline_text(cell_id) if index is not None and isinstance(cell_id, str) else ''
+                        if inline_text:
+                            cell_content = inline_text
                         elif block_index and isinstance(cell_id, str) and cell_id in block_index:
                             # 如果单元格ID指向另一个块，获取该块的内容
                             cell_block = block_index[cell_id]
@@ -230,95 +90,70 @@ class TableHandler(BaseHandler):
         :param block_index: 块索引，用于查找子块
         :return: 提取的文本内容
         """
-        # 根据块类型处理内容
-        block_type = cell_block.get('block_type')
-        
-        if block_type == 32:  # 表格单元格
-            # 根据文档，单元格块的内容实体为空结构体，实际内容通过子块填充
-            # 获取单元格的子块ID列表
-            children = cell_block.get('children', [])
-            
-            # 如果有子块，处理子块内容
-            if children and block_index:
-                cell_text_parts = []
-                for child_id in children:
-                    if child_id in block_index:
-                        child_block = block_index[child_id]
-                        child_content = TableHandler._extract_content_from_any_block(child_block, block_index)
-                        if child_content.strip():  # 只有非空内容才添加
-                            cell_text_parts.append(child_content)
-                return ' '.join(cell_text_parts) or " "
-            else:
-                # 如果没有子块，尝试直接从元素获取内容
-                cell_data = cell_block.get('table_cell', {})
-                elements = cell_data.get('elements', [])
-                cell_text_parts = []
-                
-                for element in elements:
-                    content = TableHandler.extract_text_with_style(element)
-                    if content:
-                        cell_text_parts.append(content)
-                
-                return ''.join(cell_text_parts) or " "
-        else:
-            # 对于其他类型的块，使用通用提取方法
-            return TableHandler._extract_content_from_any_block(cell_block, block_index)
+        return TableHandler._extract_content_from_any_block(cell_block, block_index)
 
     @staticmethod
     def _extract_content_from_any_block(block: Dict[str, Any], block_index: Dict[str, Any] = None) -> str:
         """
         从任意类型的块中提取内容
+        容器块的内容为各子块非空内容以空格连接，使用显式栈后序遍历，嵌套深度不受递归深度限制
         
         :param block: 块数据
         :param block_index: 块索引，用于查找子块
         :return: 提取的文本内容
         """
+        values = []
+        # 栈帧: (块, None) 表示待处理；(块, 子块数) 表示子块内容已就绪，等待合并
+        stack = [(block, None)]
+        while stack:
+            blk, child_count = stack.pop()
+            if child_count is not None:
+                parts = values[len(values) - child_count:]
+                del values[len(values) - child_count:]
+                # 只有非空内容才添加
+                values.append(' '.join(part for part in parts if part.strip()) or " ")
+                continue
+            
+            content, child_ids = TableHandler._block_content(blk, block_index)
+            if child_ids is None:
+                values.append(content)
+                continue
+            children = [block_index[child_id] for child_id in child_ids if child_id in block_index]
+            stack.append((blk, len(children)))
+            stack.extend((child, None) for child in reversed(children))
+        return values[0]
+
+    @staticmethod
+    def _block_content(block: Dict[str, Any], block_index: Dict[str, Any] = None):
+        """
+        提取块自身的内容
+        
+        :param block: 块数据
+        :param block_index: 块索引
+        :return: (内容, None)；块内容由子块组成时返回 (None, 子块ID列表)
+        """
         block_type = block.get('block_type')
         
         if block_type == 2:  # 文本块
             elements = block.get('text', {}).get('elements', [])
-            cell_text_parts = []
-            
-            for element in elements:
-                content = TableHandler.extract_text_with_style(element)
-                if content:
-                    cell_text_parts.append(content)
-            
-            return ''.join(cell_text_parts) or " "
         elif block_type in [3, 4, 5, 6, 7, 8, 9, 10, 11]:  # 标题块
             level = block_type - 2  # 计算标题级别
             elements = block.get(f'heading{level}', {}).get('elements', [])
-            cell_text_parts = []
-            
-            for element in elements:
-                content = TableHandler.extract_text_with_style(element)
-                if content:
-                    cell_text_parts.append(content)
-            
-            return ''.join(cell_text_parts) or " "
         elif block_type in [12, 13]:  # 有序/无序列表
             elements = block.get('elements', [])
-            cell_text_parts = []
-            
-            for element in elements:
-                content = TableHandler.extract_text_with_style(element)
-                if content:
-                    cell_text_parts.append(content)
-            
-            return ''.join(cell_text_parts) or " "
-        elif block_type == 32:  # 表格单元格，递归处理
-            return TableHandler._extract_content_from_cell_block(block, block_index)
         else:
-            # 如果块类型未知，尝试从子块获取内容
             children = block.get('children', [])
             if children and block_index:
-                cell_text_parts = []
-                for child_id in children:
-                    if child_id in block_index:
-                        child_block = block_index[child_id]
-                        child_content = TableHandler._extract_content_from_any_block(child_block, block_index)
-                        if child_content.strip():  # 只有非空内容才添加
-                            cell_text_parts.append(child_content)
-                return ' '.join(cell_text_parts) or " "
-            else:
-                return " "
\ No newline at end of file
+                # 单元格的内容实体为空结构体，实际内容通过子块填充；未知块类型同样从子块获取内容
+                return None, children
+            if block_type != 32:
+                return " ", None
+            # 单元格没有子块时，尝试直接从元素获取内容
+            elements = block.get('table_cell', {}).get('elements', [])
+        
+        cell_text_parts = []
+        for element in elements:
+            content = TableHandler.extract_text_with_style(element)
+            if content:
+                cell_text_parts.append(content)
+        return ''.join(cell_text_parts) or " ", None
@@ -6,5 +6,6 @@
 from .batch_converter import BatchConverter, convert_from_json_file
 from .document_creator import DocumentCreator, create_demo_document, create_comprehensive_demo_document
 from .pdf_to_markdown import PdfToMarkdownConverter, convert_pdf_to_markdown
+from .wiki_crawler import WikiCrawler
 
-__all__ = ['BatchConverter', 'convert_from_json_file', 'DocumentCreator', 'create_demo_document', 'create_comprehensive_demo_document', 'PdfToMarkdownConverter', 'convert_pdf_to_markdown']
+__all__ = ['BatchConverter', 'convert_from_json_file', 'DocumentCreator', 'create_demo_document', 'create_comprehensive_demo_document', 'PdfToMarkdownConverter', 'convert_pdf_to_markdown', 'WikiCrawler']
@@ -7,16 +7,25 @@ import json
 import logging
 import os
 import re
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Callable
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Callable, Union
 from urllib.parse import urljoin
 
 from tqdm import tqdm
 
+from ..adapters.pdf_adapter import render_pdf
 from ..converter import FeishuConverter
 from ..api import FeishuDocAPI
+from ..process.sheet_handler import SheetHandler
+from ..utils.rate_limiter import configure_rate_limiter, parse_budgets
+from .job_store import JobState, JobStore
+from .pipeline import PipelineStage, StagedPipeline
+from .sync_manifest import SyncManifest
 
 
 class BatchConverter:
@@ -25,6 +34,9 @@ class BatchConverter:
     支持从JSON文件提取文档链接并批量转换为指定格式
     """
 
+    # 流水线阶段：检查文档状态 -> 获取内容 -> 渲染（PDF） -> 写出文件
+    PIPELINE_STAGES = ("resolve", "fetch", "render", "write")
+
     # 飞书文档URL模板
     WIKI_URL_TEMPLATE = "https://r3c0qt6yjw.feishu.cn/wiki/{token}"
     DOCX_URL_TEMPLATE = "https://r3c0qt6yjw.feishu.cn/docx/{token}"
@@ -34,9 +46,20 @@ class BatchConverter:
         output_dir: str,
         output_format: str = "markdown",
         max_workers: int = 3,
-        delay: float = 1.0,
+        delay: float = 0.0,
         progress_callback: Optional[Callable] = None,
-        use_title_as_filename: bool = True
+        use_title_as_filename: bool = True,
+        rate_limits: Optional[Dict[str, float]] = None,
+        rate_limit_dir: Optional[str] = None,
+        incremental: bool = False,
+        manifest_path: Optional[str] = None,
+        resume: bool = False,
+        job_db_path: Optional[str] = None,
+        max_attempts: int = 3,
+        retry_delay: float = 10.0,
+        use_pipeline: bool = False,
+        stage_workers: Optional[Dict[str, int]] = None,
+        render_processes: Optional[bool] = None
     ):
         """
         初始化批量转换器
@@ -44,9 +67,21 @@ class BatchConverter:
         :param output_dir: 输出目录
         :param output_format: 输出格式 (markdown, pdf)
         :param max_workers: 最大并发数
-        :param delay: 请求间隔（秒）
+        :param delay: 每个文档转换前的额外间隔（秒），请求频率已由限流器按接口族控制
         :param progress_callback: 进度回调函数
         :param use_title_as_filename: 是否使用文档标题作为文件名
+        :param rate_limits: 各接口族的配额（次/秒），如 {"docx": 5, "sheets": 80}
+        :param rate_limit_dir: 跨进程共享限流状态的目录，多个批量任务并行时使用
+        :param incremental: 增量同步模式：只重新转换版本变化的文档，并清理已移除或改名文档的旧输出
+        :param manifest_path: 增量同步清单路径，默认为输出目录下的 .feishu_sync_manifest.json
+        :param resume: 从任务库中上次的进度继续：跳过已完成的文档，恢复中断和失败的文档
+        :param job_db_path: 任务库路径，默认为输出目录下的 .feishu_jobs.db
+        :param max_attempts: 每个文档最多转换几次，失败后按指数退避重新排队
+        :param retry_delay: 第一次重试前的等待秒数，之后每次翻倍
+        :param use_pipeline: 使用分阶段流水线转换（检查状态、获取、渲染、写出分别在各自的线程池中执行）
+        :param stage_workers: 各阶段的并发数，如 {"fetch": 8, "render": 4}，未指定的阶段使用默认值
+        :param render_processes: 流水线输出PDF时是否在进程池中渲染，默认在多核机器上启用
+                                 （进程以 spawn 方式启动，调用方脚本需要有 if __name__ == '__main__' 保护）
         """
         self.output_dir = Path(output_dir)
         self.output_format = output_format.lower()
@@ -59,12 +94,49 @@ class BatchConverter:
         # 确保输出目录存在
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        # 初始化转换器
+        # 按需重新配置进程级限流器
+        if rate_limits or rate_limit_dir:
+            configure_rate_limiter(rate_limits, rate_limit_dir)
+
+        # 初始化转换器（连接池按并发数扩容，每个工作线程至少有两条可复用连接）
+        self.api = FeishuDocAPI(pool_size=max_workers * 2)
         self.converter = FeishuConverter()
-        self.api = FeishuDocAPI()
 
         # 用于跟踪已使用的文件名，避免重复
         self.used_filenames = set()
+        self._filename_lock = threading.Lock()
+
+        # 增量同步清单
+        self.incremental = incremental
+        self.manifest = SyncManifest(str(self.output_dir), manifest_path) if incremental else None
+        self._unchanged_tokens = set()
+
+        # 任务库：持久化每个文档的转换状态，中断后可用 resume 继续
+        self.resume = resume
+        self.job_store = JobStore(
+            job_db_path or str(self.output_dir / JobStore.FILENAME),
+            max_attempts=max_attempts,
+            retry_delay=retry_delay
+        )
+        # 重试无意义的失败（如没有权限）
+        self._permanent_failures = set()
+
+        # token -> 本次运行分配的文件名
+        self._job_filenames: Dict[str, str] = {}
+
+        # 分阶段流水线
+        self.use_pipeline = use_pipeline
+        self.render_processes = render_processes if render_processes is not None else (os.cpu_count() or 1) > 1
+        self.stage_workers = {
+            'resolve': max(1, max_workers),
+            'fetch': max(1, max_workers),
+            'render': min(4, os.cpu_count() or 1),
+            'write': 2
+        }
+        self.stage_workers.update({name: max(1, n) for name, n in (stage_workers or {}).items()})
+        # 流水线工作线程记录结果时加锁
+        self._result_lock = threading.Lock()
+        self._render_pool: Optional[ProcessPoolExecutor] = None
 
         # 统计信息
         self.stats = {
@@ -194,20 +266,21 @@ class BatchConverter:
             base_name = token
 
         # 确保文件名唯一
-        filename = base_name
-        counter = 1
-        while filename in self.used_filenames:
-            filename = f"{base_name}_{counter}"
-            counter += 1
-
-        self.used_filenames.add(filename)
+        with self._filename_lock:
+            filename = base_name
+            counter = 1
+            while filename in self.used_filenames:
+                filename = f"{base_name}_{counter}"
+                counter += 1
+
+            self.used_filenames.add(filename)
         return filename
 
     def convert_single(
         self,
         token: str,
         index: int,
-        total: int,
+        total: Union[int, str],
         doc_type: str = "wiki"
     ) -> Tuple[str, bool, Optional[str]]:
         """
@@ -215,70 +288,148 @@ class BatchConverter:
         
         :param token: 文档token
         :param index: 当前索引
-        :param total: 总数
+        :param total: 总数（流式转换时总数未知，为 "?"）
         :param doc_type: 文档类型
         :return: (token, 是否成功, 输出文件路径或错误信息)
         """
-        # 先检查文档状态
-        doc_status = self.api.check_document_status(token)
+        job, result = self._prepare_job(token, index, total, doc_type)
+        if job is None:
+            return result
+        
+        try:
+            # 请求频率由限流器控制，这里只保留可选的额外间隔
+            if self.delay > 0:
+                time.sleep(self.delay)
+            
+            # 执行转换（复用已解析的文档描述，不再重复检查状态）
+            success = self.converter.convert_resolved(
+                job['doc_status'],
+                output_format=self.output_format,
+                output_path=str(job['output_path'])
+            )
+            return self._complete_job(job, success)
+        
+        except Exception as e:
+            return self._job_error(job, e)
+
+    def _prepare_job(
+        self,
+        token: str,
+        index: int,
+        total: Union[int, str],
+        doc_type: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[str, bool, Optional[str]]]]:
+        """
+        检查文档状态并确定输出路径（转换的第一步）
+        
+        :param token: 文档token
+        :param index: 当前索引
+        :param total: 总数
+        :param doc_type: 文档类型
+        :return: (转换任务, None)；无需转换（不可访问、未变化或已存在）时为 (None, 转换结果)
+        """
+        # 先检查文档状态（结果在本次运行内缓存，转换时直接复用）
+        doc_status = self.converter.resolve_document(token)
         
         if not doc_status["accessible"]:
-            error_msg = doc_status.get("error", "文档不可访问")
+            error_msg = doc_status.get("error") or "文档不可访问"
+            if "无权限" in error_msg:
+                # 没有权限时重试无意义
+                self._permanent_failures.add(token)
+            else:
+                # 其他原因（如获取令牌失败）重试前重新检查
+                self.converter.invalidate_metadata(token)
             self.logger.warning(f"[{index}/{total}] 文档不可访问: {token[:20]} - {error_msg}")
-            return token, False, error_msg
+            return None, (token, False, error_msg)
         
         # 获取文档标题（优先使用状态检查返回的标题）
         title = doc_status.get("title")
         actual_doc_type = doc_status.get("doc_type", doc_type)
         
-        # 根据实际文档类型生成URL
-        if actual_doc_type in ["sheet", "spreadsheet"]:
-            url = self.token_to_url(token, "sheet") if hasattr(self, 'SHEET_URL_TEMPLATE') else f"https://r3c0qt6yjw.feishu.cn/sheets/{token}"
-        elif actual_doc_type in ["bitable"]:
-            url = f"https://r3c0qt6yjw.feishu.cn/base/{token}"
-        else:
-            url = self.token_to_url(token, doc_type)
+        # 状态检查没有返回标题且没有带回文档信息时（如 wiki 节点），尝试获取
+        if not title and self.use_title_as_filename and not doc_status.get("document_info"):
+            title = self.get_document_title(doc_status.get("document_id", token), doc_type)
         
-        # 如果状态检查没有返回标题，尝试获取
-        if not title and self.use_title_as_filename:
-            title = self.get_document_title(token, doc_type)
+        # 增量模式：版本和标题都未变化且输出完好时跳过
+        revision = doc_status.get("revision")
+        revision_kind = doc_status.get("revision_kind")
+        if self.incremental:
+            if revision is None and actual_doc_type in ["sheet", "spreadsheet"]:
+                revision = self.api.get_spreadsheet_revision(doc_status.get("document_id", token))
+                revision_kind = "version"
+                # 写回文档描述，转换时不再重复请求版本号
+                doc_status["revision"] = revision
+                doc_status["revision_kind"] = revision_kind
+            if self.manifest.is_unchanged(token, revision, title, self.output_format, revision_kind):
+                entry = self.manifest.get(token)
+                self._unchanged_tokens.add(token)
+                self.logger.info(f"[{index}/{total}] 未变化，跳过: {entry['output']}")
+                return None, (token, True, str(self.manifest.output_path(entry)))
         
-        # 生成文件名
-        filename = self.generate_filename(token, title)
-        output_path = self.output_dir / f"{filename}.{self.output_format}"
+        # 生成文件名（增量模式下标题未变时沿用上次的文件名）
+        entry = self.manifest.get(token) if self.incremental else None
+        if entry and entry.get('title') == title and entry.get('format') == self.output_format:
+            output_path = self.manifest.output_path(entry)
+            filename = output_path.stem
+        else:
+            # 重试时沿用第一次分配的文件名
+            filename = self._job_filenames.get(token)
+            if filename is None:
+                filename = self.generate_filename(token, title)
+                self._job_filenames[token] = filename
+            output_path = self.output_dir / f"{filename}.{self.output_format}"
         
-        # 检查是否已存在
-        if output_path.exists():
+        # 检查是否已存在（增量模式下由清单判断）
+        if not self.incremental and output_path.exists():
             self.logger.info(f"[{index}/{total}] 已存在，跳过: {filename}")
-            return token, True, str(output_path)
+            return None, (token, True, str(output_path))
         
         display_name = title if title else token[:20]
         self.logger.info(f"[{index}/{total}] 正在转换: {display_name} (类型: {actual_doc_type})")
         
-        try:
-            # 添加延迟避免请求过快
-            if self.delay > 0:
-                time.sleep(self.delay)
-            
-            # 执行转换
-            success = self.converter.convert(
-                document_url=url,
-                output_format=self.output_format,
-                output_path=str(output_path)
-            )
-            
-            if success and output_path.exists():
-                self.logger.info(f"[{index}/{total}] 转换成功: {filename}")
-                return token, True, str(output_path)
-            else:
-                error_msg = "转换失败或输出文件未生成"
-                self.logger.error(f"[{index}/{total}] 转换失败: {filename} - {error_msg}")
-                return token, False, error_msg
+        job = {
+            'token': token,
+            'index': index,
+            'total': total,
+            'doc_status': doc_status,
+            'title': title,
+            'revision': revision,
+            'revision_kind': revision_kind,
+            'filename': filename,
+            'output_path': output_path
+        }
+        return job, None
+
+    def _complete_job(self, job: Dict[str, Any], success: bool) -> Tuple[str, bool, Optional[str]]:
+        """
+        检查输出并记录到增量同步清单（转换的最后一步）
         
-        except Exception as e:
-            error_msg = str(e)
-            self.logger.error(f"[{index}/{total}] 转换异常: {filename} - {error_msg}")
-            return token, False, error_msg
+        :param job: 转换任务
+        :param success: 转换是否成功
+        :return: (token, 是否成功, 输出文件路径或错误信息)
+        """
+        token, output_path = job['token'], job['output_path']
+        prefix = f"[{job['index']}/{job['total']}]"
+        if success and output_path.exists():
+            self.logger.info(f"{prefix} 转换成功: {job['filename']}")
+            if self.incremental:
+                # 文档改名后删除旧文件名的输出
+                self.manifest.remove_output(token, keep_path=str(output_path))
+                self.manifest.record(
+                    token, job['revision'], job['title'], self.output_format, str(output_path), job['revision_kind']
+                )
+            return token, True, str(output_path)
+        
+        error_msg = "转换失败或输出文件未生成"
+        self.logger.error(f"{prefix} 转换失败: {job['filename']} - {error_msg}")
+        return token, False, error_msg
+
+    def _job_error(self, job: Dict[str, Any], error: BaseException) -> Tuple[str, bool, Optional[str]]:
+        """记录转换异常"""
+        error_msg = str(error)
+        name = job.get('filename') or job['token'][:20]
+        self.logger.error(f"[{job['index']}/{job.get('total', '?')}] 转换异常: {name} - {error_msg}")
+        return job['token'], False, error_msg
 
     def convert_all(
         self,
@@ -294,65 +445,436 @@ class BatchConverter:
         :param use_parallel: 是否使用并行处理
         :return: 转换结果统计
         """
-        self.stats = {
-            'total': len(tokens),
-            'success': 0,
-            'failed': 0,
-            'skipped': 0,
-            'errors': [],
-            'results': []
-        }
+        self._start_run(len(tokens))
+        self._open_job_store()
+        pending = self._admit_jobs(tokens, doc_type)
+
+        # 批量解析待转换和待重试文档的类型、标题和版本，转换时直接复用
+        retrying = set(self.job_store.tokens(JobState.FAILED))
+        unresolved = pending + [token for token in tokens if token in retrying]
+        if unresolved:
+            self.converter.prime_metadata(
+                self.api.resolve_documents(unresolved, doc_type, max_workers=self.max_workers)
+            )
 
-        # 重置已使用文件名集合
-        self.used_filenames = set()
+        # 增量模式：先占用清单中已有输出的文件名，避免新文档与之重名
+        if self.incremental:
+            for token in tokens:
+                entry = self.manifest.get(token)
+                if entry:
+                    self.used_filenames.add(Path(entry['output']).stem)
 
         total = len(tokens)
-        self.logger.info(f"开始批量转换 {total} 个文档")
+        self.logger.info(f"开始批量转换 {total} 个文档，待转换 {len(pending)} 个")
+
+        indexes = {token: i + 1 for i, token in enumerate(tokens)}
+        try:
+            self._run_jobs(pending, indexes, total, doc_type, use_parallel)
+            self._run_retries(indexes, total, doc_type, use_parallel)
+        finally:
+            # 中断时也保存已完成的进度
+            self.job_store.flush()
+            self._shutdown_render_pool()
+
+        self._finish_run(tokens)
+        return self.stats
+
+    def _open_job_store(self):
+        """开始运行时准备任务库：resume 模式下恢复上次中断的任务，否则清空"""
+        if not self.resume:
+            self.job_store.reset()
+            return
+
+        self.job_store.recover()
+        counts = self.job_store.counts()
+        self.logger.info(
+            f"继续上次的批量转换: 已完成 {counts[JobState.DONE]}，待重试 {counts[JobState.FAILED]}，"
+            f"已放弃 {counts[JobState.DEAD]}"
+        )
+
+    def _admit_jobs(self, tokens: List[str], doc_type: str) -> List[str]:
+        """
+        在任务库中登记文档
+
+        :param tokens: 文档token列表
+        :param doc_type: 文档类型
+        :return: 需要立即转换的文档token（resume 模式下不含已完成、已放弃和等待重试的文档）
+        """
+        self.job_store.add(tokens, doc_type)
+        if not self.resume:
+            return list(tokens)
+
+        pending = []
+        # 流式转换时流水线工作线程同时在记录结果
+        with self._result_lock:
+            for token in tokens:
+                job = self.job_store.get(token)
+                if job['state'] == JobState.DONE:
+                    # 上次运行已完成，计为跳过
+                    self.stats['skipped'] += 1
+                    self.stats['results'].append({'token': token, 'success': True, 'result': job['result']})
+                elif job['state'] == JobState.DEAD:
+                    self.stats['failed'] += 1
+                    self.stats['errors'].append({'token': token, 'error': job['result']})
+                    self.stats['results'].append({'token': token, 'success': False, 'result': job['result']})
+                elif job['state'] != JobState.FAILED:
+                    # 失败的文档等待退避时间后由重试流程处理
+                    pending.append(token)
+        return pending
+
+    def _run_job(self, token: str, index: int, total: Union[int, str], doc_type: str) -> Tuple[str, bool, Optional[str]]:
+        """转换单个文档并在任务库中标记为转换中"""
+        self.job_store.mark_in_flight(token)
+        return self.convert_single(token, index, total, doc_type)
+
+    def _run_jobs(
+        self,
+        tokens: List[str],
+        indexes: Dict[str, int],
+        total: Union[int, str],
+        doc_type: str,
+        use_parallel: bool
+    ):
+        """
+        转换一组文档并记录结果
 
-        if use_parallel and self.max_workers > 1:
+        :param tokens: 文档token列表
+        :param indexes: token -> 序号（用于日志）
+        :param total: 总数
+        :param doc_type: 文档类型
+        :param use_parallel: 是否使用并行处理
+        """
+        if not tokens:
+            return
+        if self.use_pipeline:
+            self._run_pipeline(((token, indexes[token]) for token in tokens), total, doc_type, count=len(tokens))
+        elif use_parallel and self.max_workers > 1:
             # 并行处理
             with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = {
-                    executor.submit(
-                        self.convert_single,
-                        token,
-                        i + 1,
-                        total,
-                        doc_type
-                    ): token
-                    for i, token in enumerate(tokens)
-                }
+                futures = [
+                    executor.submit(self._run_job, token, indexes[token], total, doc_type)
+                    for token in tokens
+                ]
 
                 # 使用tqdm显示进度
-                with tqdm(total=total, desc="转换进度") as pbar:
+                with tqdm(total=len(tokens), desc="转换进度") as pbar:
                     for future in as_completed(futures):
-                        token, success, result = future.result()
-                        self._update_stats(token, success, result)
+                        self._record_result(*future.result())
                         pbar.update(1)
-
-                        # 调用进度回调
-                        if self.progress_callback:
-                            self.progress_callback(token, success, result)
         else:
             # 串行处理
-            for i, token in enumerate(tqdm(tokens, desc="转换进度")):
-                token, success, result = self.convert_single(
-                    token, i + 1, total, doc_type
+            for token in tqdm(tokens, desc="转换进度"):
+                self._record_result(*self._run_job(token, indexes[token], total, doc_type))
+
+    def _run_pipeline(
+        self,
+        jobs: Iterable[Tuple[str, int]],
+        total: Union[int, str],
+        doc_type: str,
+        count: Optional[int] = None
+    ):
+        """
+        用分阶段流水线转换一组文档并记录结果
+        提交在第一阶段的队列满时等待，因此 jobs 可以是边产出边转换的迭代器
+
+        :param jobs: (文档token, 序号) 迭代器
+        :param total: 总数（用于日志）
+        :param doc_type: 文档类型
+        :param count: 本次转换的文档数（用于进度条），未知时为None
+        """
+        if self.output_format == 'pdf':
+            render_pool = self._get_render_pool()
+            if render_pool is not None:
+                # 预先启动渲染进程，进程启动与第一批文档的获取并行
+                for _ in range(self.stage_workers['render']):
+                    render_pool.submit(os.getpid)
+
+        with tqdm(total=count, desc="转换进度", unit="doc") as pbar:
+            def finish(result: Tuple[str, bool, Optional[str]]):
+                with self._result_lock:
+                    self._record_result(*result)
+                    pbar.update(1)
+
+            pipeline = self._create_pipeline(doc_type, finish)
+            try:
+                for token, index in jobs:
+                    pipeline.submit({'token': token, 'index': index, 'total': total, 'doc_type': doc_type})
+            finally:
+                pipeline.join()
+                self._merge_pipeline_metrics(pipeline.get_metrics())
+
+    def _get_render_pool(self) -> Optional[ProcessPoolExecutor]:
+        """
+        获取PDF渲染进程池（首次使用时创建，本次运行内的多轮流水线共用）
+
+        :return: 进程池，未启用进程渲染或进程池不可用时返回None
+        """
+        if not self.render_processes:
+            return None
+        with self._result_lock:
+            if self._render_pool is None:
+                self._render_pool = ProcessPoolExecutor(
+                    max_workers=self.stage_workers['render'],
+                    mp_context=multiprocessing.get_context("spawn")
                 )
-                self._update_stats(token, success, result)
+            return self._render_pool
 
-                # 调用进度回调
-                if self.progress_callback:
-                    self.progress_callback(token, success, result)
+    def _shutdown_render_pool(self):
+        """关闭PDF渲染进程池"""
+        if self._render_pool is not None:
+            self._render_pool.shutdown()
+            self._render_pool = None
 
-        # 生成报告
-        self._generate_report()
+    def _create_pipeline(
+        self,
+        doc_type: str,
+        finish: Callable[[Tuple[str, bool, Optional[str]]], None]
+    ) -> StagedPipeline:
+        """
+        创建转换流水线
+        Markdown 边获取边渲染并下载图片，在获取阶段完成转换；PDF 获取完整内容后交给渲染阶段，
+        渲染得到的数据由写出阶段原子地写入输出文件
+
+        :param doc_type: 文档类型
+        :param finish: 文档转换结束时的回调（参数为转换结果）
+        :return: 流水线
+        """
+
+        def resolve(item):
+            self.job_store.mark_in_flight(item['token'])
+            job, result = self._prepare_job(item['token'], item['index'], item['total'], doc_type)
+            if job is None:
+                finish(result)
+                return None
+            return 'fetch', job
+
+        def fetch(job):
+            # 请求频率由限流器控制，这里只保留可选的额外间隔
+            if self.delay > 0:
+                time.sleep(self.delay)
+            if self.output_format != 'pdf':
+                success = self.converter.convert_resolved(
+                    job['doc_status'], output_format=self.output_format, output_path=str(job['output_path'])
+                )
+                finish(self._complete_job(job, success))
+                return None
+            job['content'] = self.converter.fetch_resolved(job['doc_status'], self.output_format)
+            if not job['content']:
+                finish(self._complete_job(job, False))
+                return None
+            return 'render', job
+
+        def render(job):
+            content = job.pop('content')
+            render_pool = self._get_render_pool()
+            if render_pool is not None:
+                try:
+                    data = render_pool.submit(render_pdf, content).result()
+                except BrokenProcessPool as e:
+                    # 渲染进程异常退出后本次运行改为在线程中渲染
+                    self.logger.warning(f"PDF渲染进程池不可用，改为在线程中渲染: {e}")
+                    self.render_processes = False
+                    render_pool = None
+                except Exception as e:
+                    # render_pdf 自身不抛异常，这里的异常来自内容无法序列化到渲染进程，本文档改为在线程中渲染
+                    self.logger.warning(f"文档内容无法交给渲染进程，改为在线程中渲染: {e}")
+                    render_pool = None
+            if render_pool is None:
+                data = self.converter.pdf_adapter.render(content)
+            if data is None:
+                finish(self._complete_job(job, False))
+                return None
+            job['data'] = data
+            return 'write', job
+
+        def write(job):
+            output_path = job['output_path']
+            temp_path = output_path.with_name(output_path.name + '.tmp')
+            with open(temp_path, 'wb') as f:
+                f.write(job.pop('data'))
+            os.replace(temp_path, output_path)
+            finish(self._complete_job(job, True))
+            return None
+
+        def on_error(stage_name, job, error):
+            finish(self._job_error(job, error))
+
+        handlers = {'resolve': resolve, 'fetch': fetch, 'render': render, 'write': write}
+        stages = [
+            PipelineStage(name, handlers[name], workers=self.stage_workers[name])
+            for name in self.PIPELINE_STAGES
+        ]
+        return StagedPipeline(stages, on_error=on_error)
+
+    def _merge_pipeline_metrics(self, metrics: Dict[str, Dict[str, Any]]):
+        """累加流水线各阶段的统计（重试时流水线会运行多次）"""
+        merged = self.stats.setdefault('pipeline', {})
+        for name, stage in metrics.items():
+            current = merged.get(name)
+            if current is None:
+                merged[name] = dict(stage)
+                continue
+            for key in ('processed', 'errors', 'busy_seconds', 'blocked_seconds'):
+                current[key] = round(current[key] + stage[key], 3)
+            current['max_queue_depth'] = max(current['max_queue_depth'], stage['max_queue_depth'])
+        for name, stage in merged.items():
+            self.logger.info(
+                f"流水线阶段 {name}: 并发 {stage['workers']}，处理 {stage['processed']}，错误 {stage['errors']}，"
+                f"最大队列深度 {stage['max_queue_depth']}/{stage['queue_size']}，"
+                f"处理耗时 {stage['busy_seconds']:.1f}s，等待下游 {stage['blocked_seconds']:.1f}s"
+            )
+
+    def _run_retries(self, indexes: Dict[str, int], total: Union[int, str], doc_type: str, use_parallel: bool):
+        """按退避时间重试失败的文档，直到全部成功或放弃"""
+        while True:
+            due, wait_seconds = self.job_store.due_retries(indexes)
+            if due:
+                self.logger.info(f"重试 {len(due)} 个失败的文档")
+                self._run_jobs(due, indexes, total, doc_type, use_parallel)
+            elif wait_seconds is None:
+                return
+            else:
+                self.job_store.flush()
+                self.logger.info(f"等待 {wait_seconds:.1f} 秒后重试失败的文档")
+                time.sleep(wait_seconds)
+
+    def _record_result(self, token: str, success: bool, result: Optional[str]):
+        """
+        在任务库中记录转换结果，最终结果（成功或放弃重试）计入统计
+
+        :param token: 文档token
+        :param success: 是否成功
+        :param result: 输出文件路径或错误信息
+        """
+        if success:
+            self.job_store.mark_done(token, result)
+        else:
+            state = self.job_store.mark_failed(token, result, retryable=token not in self._permanent_failures)
+            if state == JobState.FAILED:
+                job = self.job_store.get(token)
+                self.logger.warning(f"转换失败（第 {job['attempts']} 次），稍后重试: {token[:20]} - {result}")
+                return
+
+        self._update_stats(token, success, result)
+
+        # 调用进度回调
+        if self.progress_callback:
+            self.progress_callback(token, success, result)
+
+    def convert_stream(
+        self,
+        documents: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+        doc_type: str = "wiki",
+        is_complete: Optional[Callable[[], bool]] = None
+    ) -> Dict:
+        """
+        边接收文档边转换（如知识库爬取器边爬取边产出的节点），总数事先未知
+        转换任务在线程池中执行，最多 max_workers * 2 个文档在排队或转换中，生产方过快时等待
+
+        :param documents: (文档token, 文档描述) 迭代器，文档描述为None时转换前再解析
+        :param doc_type: 文档类型
+        :param is_complete: 文档全部产出后调用，返回False表示文档列表不完整，增量模式下不清理未出现的文档
+        :return: 转换结果统计
+        """
+        self._start_run(0)
+
+        # 增量模式：先占用清单中所有输出的文件名，避免新文档与之重名
+        if self.incremental:
+            for token in self.manifest.tokens():
+                self.used_filenames.add(Path(self.manifest.get(token)['output']).stem)
+
+        tokens: List[str] = []
+        indexes: Dict[str, int] = {}
+        self._open_job_store()
+        self.logger.info("开始流式批量转换")
+
+        def admitted():
+            for token, document in documents:
+                if token in indexes:
+                    continue
+                tokens.append(token)
+                indexes[token] = len(tokens)
+                self.stats['total'] += 1
+                if not self._admit_jobs([token], doc_type):
+                    continue
+                if document is not None:
+                    self.converter.prime_metadata({token: document})
+                yield token, indexes[token]
+
+        def record(future):
+            self._record_result(*future.result())
+            pbar.update(1)
 
+        try:
+            if self.use_pipeline:
+                # 流水线第一阶段的队列满时等待，生产方（如爬取器）不会无限领先
+                self._run_pipeline(admitted(), "?", doc_type)
+            else:
+                with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor, \
+                        tqdm(desc="转换进度", unit="doc") as pbar:
+                    in_flight = set()
+                    for token, index in admitted():
+                        # 限制排队任务数，生产方（如爬取器）不会无限领先
+                        while len(in_flight) >= self.max_workers * 2:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                record(future)
+                        in_flight.add(executor.submit(self._run_job, token, index, "?", doc_type))
+
+                    for future in as_completed(in_flight):
+                        record(future)
+
+            self._run_retries(indexes, "?", doc_type, use_parallel=True)
+        finally:
+            self.job_store.flush()
+            self._shutdown_render_pool()
+
+        complete = is_complete() if is_complete is not None else True
+        self._finish_run(tokens, prune=complete)
         return self.stats
 
+    def _start_run(self, total: int):
+        """重置统计和本次运行的缓存"""
+        self.stats = {
+            'total': total,
+            'success': 0,
+            'failed': 0,
+            'skipped': 0,
+            'errors': [],
+            'results': []
+        }
+
+        # 重置已使用文件名集合
+        self.used_filenames = set()
+        self._unchanged_tokens = set()
+        self._permanent_failures = set()
+        self._job_filenames = {}
+        self.converter.clear_metadata_cache()
+        SheetHandler.clear_cache()
+
+    def _finish_run(self, tokens: List[str], prune: bool = True):
+        """
+        保存增量同步清单并生成报告
+
+        :param tokens: 本次运行的全部文档token
+        :param prune: 增量模式下是否清理不在 tokens 中的文档
+        """
+        # 增量模式：清理已从文档列表中移除的文档的输出，保存清单
+        if self.incremental:
+            if tokens and prune:
+                self.stats['removed'] = len(self.manifest.prune(tokens))
+            elif not prune:
+                self.logger.warning("文档列表不完整，本次不清理已移除文档的输出")
+            self.manifest.save()
+
+        # 生成报告
+        self._generate_report()
+
     def _update_stats(self, token: str, success: bool, result: str):
         """更新统计信息"""
-        if success:
+        if success and token in self._unchanged_tokens:
+            self.stats['skipped'] += 1
+        elif success:
             if "跳过" in result or (isinstance(result, str) and Path(result).exists()):
                 # 检查是否是已存在的文件
                 if Path(result).exists() and self.stats['results']:
@@ -389,11 +911,13 @@ class BatchConverter:
                 'success': self.stats['success'],
                 'failed': self.stats['failed'],
                 'skipped': self.stats['skipped'],
-                'success_rate': f"{(self.stats['success'] / self.stats['total'] * 100):.2f}%"
+                'success_rate': f"{(self.stats['success'] / self.stats['total'] * 100 if self.stats['total'] else 0):.2f}%"
             },
             'errors': self.stats['errors'],
             'results': self.stats['results']
         }
+        if self.stats.get('pipeline'):
+            report['pipeline'] = self.stats['pipeline']
 
         with open(report_path, 'w', encoding='utf-8') as f:
             json.dump(report, f, ensure_ascii=False, indent=2)
@@ -434,9 +958,20 @@ def convert_from_json_file(
     output_format: str = "markdown",
     doc_type: str = "wiki",
     max_workers: int = 1,
-    delay: float = 1.0,
+    delay: float = 0.0,
     progress_callback: Optional[Callable] = None,
-    use_title_as_filename: bool = True
+    use_title_as_filename: bool = True,
+    rate_limits: Optional[Dict[str, float]] = None,
+    rate_limit_dir: Optional[str] = None,
+    incremental: bool = False,
+    manifest_path: Optional[str] = None,
+    resume: bool = False,
+    job_db_path: Optional[str] = None,
+    max_attempts: int = 3,
+    retry_delay: float = 10.0,
+    use_pipeline: bool = False,
+    stage_workers: Optional[Dict[str, int]] = None,
+    render_processes: Optional[bool] = None
 ) -> Dict:
     """
     从JSON文件批量转换文档的便捷函数
@@ -446,9 +981,20 @@ def convert_from_json_file(
     :param output_format: 输出格式 (markdown, pdf)
     :param doc_type: 文档类型 (wiki, docx)
     :param max_workers: 最大并发数
-    :param delay: 请求间隔（秒）
+    :param delay: 每个文档转换前的额外间隔（秒）
     :param progress_callback: 进度回调函数
     :param use_title_as_filename: 是否使用文档标题作为文件名
+    :param rate_limits: 各接口族的配额（次/秒）
+    :param rate_limit_dir: 跨进程共享限流状态的目录
+    :param incremental: 是否使用增量同步模式
+    :param manifest_path: 增量同步清单路径
+    :param resume: 是否从任务库中上次的进度继续
+    :param job_db_path: 任务库路径
+    :param max_attempts: 每个文档最多转换几次
+    :param retry_delay: 第一次重试前的等待秒数
+    :param use_pipeline: 是否使用分阶段流水线转换
+    :param stage_workers: 流水线各阶段的并发数
+    :param render_processes: 流水线输出PDF时是否在进程池中渲染
     :return: 转换结果统计
     """
     # 创建转换器
@@ -458,7 +1004,18 @@ def convert_from_json_file(
         max_workers=max_workers,
         delay=delay,
         progress_callback=progress_callback,
-        use_title_as_filename=use_title_as_filename
+        use_title_as_filename=use_title_as_filename,
+        rate_limits=rate_limits,
+        rate_limit_dir=rate_limit_dir,
+        incremental=incremental,
+        manifest_path=manifest_path,
+        resume=resume,
+        job_db_path=job_db_path,
+        max_attempts=max_attempts,
+        retry_delay=retry_delay,
+        use_pipeline=use_pipeline,
+        stage_workers=stage_workers,
+        render_processes=render_processes
     )
 
     # 提取tokens
@@ -479,6 +1036,21 @@ def convert_from_json_file(
     return converter.convert_all(tokens, doc_type, use_parallel=max_workers > 1)
 
 
+def stage_workers_from_args(args) -> Dict[str, int]:
+    """
+    从命令行参数中取出流水线各阶段的并发数
+
+    :param args: 解析后的命令行参数（含 --resolve-workers 等选项）
+    :return: 阶段名称 -> 并发数，只包含指定了的阶段
+    """
+    workers = {}
+    for stage in BatchConverter.PIPELINE_STAGES:
+        value = getattr(args, f'{stage}_workers', None)
+        if value is not None:
+            workers[stage] = value
+    return workers
+
+
 # 命令行入口
 def main():
     """命令行入口"""
@@ -492,8 +1064,12 @@ def main():
 示例:
   %(prog)s get_info.json ./output markdown
   %(prog)s get_info.json ./output pdf --doc-type wiki --workers 3
-  %(prog)s get_info.json ./output markdown --delay 0.5
+  %(prog)s get_info.json ./output markdown --qps docx=4 --qps sheets=50
+  %(prog)s get_info.json ./output markdown --rate-limit-dir /tmp/feishu_rl  # 多个进程共享配额
   %(prog)s get_info.json ./output markdown --use-token-filename  # 使用token作为文件名
+  %(prog)s get_info.json ./output markdown --incremental  # 只重新转换有变化的文档
+  %(prog)s get_info.json ./output markdown --resume  # 中断后从上次的进度继续
+  %(prog)s get_info.json ./output pdf --pipeline --fetch-workers 8 --render-workers 4  # 分阶段流水线
         """
     )
 
@@ -523,8 +1099,23 @@ def main():
     parser.add_argument(
         '--delay',
         type=float,
-        default=1.0,
-        help='请求间隔秒数 (默认: 1.0)'
+        default=0.0,
+        help='每个文档转换前的额外间隔秒数，请求频率已由限流器控制 (默认: 0)'
+    )
+
+    parser.add_argument(
+        '--qps',
+        action='append',
+        default=[],
+        metavar='FAMILY=RATE',
+        help='覆盖接口族配额，可重复指定，如 --qps docx=4 --qps sheets=50 '
+             '(接口族: docx, docx_write, sheets, drive_media, permission, default)'
+    )
+
+    parser.add_argument(
+        '--rate-limit-dir',
+        default=None,
+        help='跨进程共享限流状态的目录，多个批量任务同时运行时指向同一目录'
     )
 
     parser.add_argument(
@@ -533,6 +1124,64 @@ def main():
         help='使用token作为文件名（默认使用文档标题）'
     )
 
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='增量同步：只重新转换版本变化的文档，删除已移除或改名文档的旧输出'
+    )
+
+    parser.add_argument(
+        '--manifest',
+        default=None,
+        help='增量同步清单路径 (默认: 输出目录/.feishu_sync_manifest.json)'
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='从上次中断的进度继续：跳过已完成的文档，重新转换中断和失败的文档'
+    )
+
+    parser.add_argument(
+        '--job-db',
+        default=None,
+        help='任务库路径 (默认: 输出目录/.feishu_jobs.db)'
+    )
+
+    parser.add_argument(
+        '--max-attempts',
+        type=int,
+        default=3,
+        help='每个文档最多转换几次，失败后按指数退避重试 (默认: 3)'
+    )
+
+    parser.add_argument(
+        '--retry-delay',
+        type=float,
+        default=10.0,
+        help='第一次重试前的等待秒数，之后每次翻倍 (默认: 10)'
+    )
+
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='使用分阶段流水线：检查状态、获取、渲染（PDF在进程池中）、写出分别并发执行'
+    )
+
+    for stage, help_text in (
+        ('resolve', '流水线检查状态阶段的并发数 (默认: --workers)'),
+        ('fetch', '流水线获取阶段的并发数 (默认: --workers)'),
+        ('render', '流水线PDF渲染阶段的并发数 (默认: CPU核数，最多4)'),
+        ('write', '流水线写出阶段的并发数 (默认: 2)'),
+    ):
+        parser.add_argument(f'--{stage}-workers', type=int, default=None, help=help_text)
+
+    parser.add_argument(
+        '--render-in-threads',
+        action='store_true',
+        help='流水线在线程中渲染PDF，不使用进程池'
+    )
+
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -553,6 +1202,13 @@ def main():
         print(f"错误: 文件不存在: {args.json_file}", file=sys.stderr)
         sys.exit(1)
 
+    rate_limits = None
+    if args.qps:
+        try:
+            rate_limits = parse_budgets(','.join(args.qps))
+        except ValueError as e:
+            parser.error(str(e))
+
     # 标准化格式
     output_format = 'markdown' if args.format in ['markdown', 'md'] else 'pdf'
 
@@ -565,7 +1221,18 @@ def main():
             doc_type=args.doc_type,
             max_workers=args.workers,
             delay=args.delay,
-            use_title_as_filename=not args.use_token_filename
+            use_title_as_filename=not args.use_token_filename,
+            rate_limits=rate_limits,
+            rate_limit_dir=args.rate_limit_dir,
+            incremental=args.incremental,
+            manifest_path=args.manifest,
+            resume=args.resume,
+            job_db_path=args.job_db,
+            max_attempts=args.max_attempts,
+            retry_delay=args.retry_delay,
+            use_pipeline=args.pipeline,
+            stage_workers=stage_workers_from_args(args),
+            render_processes=False if args.render_in_threads else None
         )
 
         # 输出结果
@@ -576,6 +1243,8 @@ def main():
         print(f"成功: {stats['success']}")
         print(f"失败: {stats['failed']}")
         print(f"跳过: {stats.get('skipped', 0)}")
+        if args.incremental:
+            print(f"删除: {stats.get('removed', 0)}")
 
         if stats['errors']:
             print(f"\n错误详情 ({len(stats['errors'])} 个):")
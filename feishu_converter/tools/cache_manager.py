@@ -0,0 +1,131 @@
+"""
+快照缓存管理工具
+查看和清理本地文档快照缓存和素材库
+"""
+
+import logging
+import sys
+from datetime import datetime
+
+from ..utils.snapshot_cache import DocumentSnapshotCache, DEFAULT_CACHE_DIR
+from ..utils.media_store import MediaStore
+
+
+def _format_time(timestamp: float) -> str:
+    """格式化时间戳"""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# 命令行入口
+def main():
+    """命令行入口"""
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(
+        description='管理飞书文档快照缓存',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  %(prog)s stats
+  %(prog)s list
+  %(prog)s prune --max-age-days 30 --max-size-mb 200
+  %(prog)s remove doxcnXXXXXXXX
+  %(prog)s clear
+  %(prog)s media-stats
+  %(prog)s media-prune --max-size-mb 1000
+        """
+    )
+
+    parser.add_argument(
+        '--db',
+        default=os.path.join(DEFAULT_CACHE_DIR, 'snapshots.db'),
+        help='缓存数据库路径 (默认: $FEISHU_CACHE_DIR/snapshots.db)'
+    )
+    parser.add_argument(
+        '--media-dir',
+        default=os.path.join(DEFAULT_CACHE_DIR, 'media'),
+        help='素材库目录 (默认: $FEISHU_CACHE_DIR/media)'
+    )
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='显示缓存统计信息')
+    subparsers.add_parser('list', help='列出所有快照')
+
+    prune_parser = subparsers.add_parser('prune', help='淘汰过期或超出大小上限的快照')
+    prune_parser.add_argument('--max-age-days', type=float, default=None, help='删除超过指定天数未访问的快照')
+    prune_parser.add_argument('--max-size-mb', type=float, default=None, help='按最久未访问的顺序删除，直到总大小低于上限')
+
+    remove_parser = subparsers.add_parser('remove', help='删除指定文档的快照')
+    remove_parser.add_argument('document_ids', nargs='+', help='文档ID')
+
+    subparsers.add_parser('clear', help='清空缓存')
+
+    subparsers.add_parser('media-stats', help='显示素材库统计信息')
+    media_prune_parser = subparsers.add_parser('media-prune', help='淘汰素材库中过期或超出大小上限的素材')
+    media_prune_parser.add_argument('--max-age-days', type=float, default=None, help='删除超过指定天数未访问的素材')
+    media_prune_parser.add_argument('--max-size-mb', type=float, default=None, help='按最久未访问的顺序删除，直到总大小低于上限')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command.startswith('media-'):
+        store = MediaStore(args.media_dir)
+        if args.command == 'media-stats':
+            stats = store.get_stats()
+            print(f"素材库: {stats['root_dir']}")
+            print(f"素材数: {stats['objects']}")
+            print(f"token数: {stats['tokens']}")
+            print(f"数据大小: {stats['size_mb']:.2f} MB")
+        else:
+            if args.max_age_days is None and args.max_size_mb is None:
+                print("错误: 请指定 --max-age-days 或 --max-size-mb", file=sys.stderr)
+                sys.exit(1)
+            max_age = args.max_age_days * 86400 if args.max_age_days is not None else None
+            removed = store.evict(max_age=max_age, max_size_mb=args.max_size_mb)
+            print(f"已删除 {removed} 个素材")
+        return
+
+    cache = DocumentSnapshotCache(args.db)
+
+    if args.command == 'stats':
+        stats = cache.get_stats()
+        print(f"数据库: {stats['db_path']}")
+        print(f"快照数: {stats['snapshots']}")
+        print(f"数据大小: {stats['size_mb']:.2f} MB")
+        print(f"文件大小: {stats['file_size_mb']:.2f} MB")
+
+    elif args.command == 'list':
+        snapshots = cache.list_snapshots()
+        if not snapshots:
+            print("缓存为空")
+        for item in snapshots:
+            print(
+                f"{item['document_id']}  版本 {item['revision_id']}  {item['doc_type']}  "
+                f"{item['page_count']} 页  {item['size'] / 1024:.1f} KB  "
+                f"最近访问 {_format_time(item['accessed_at'])}"
+            )
+
+    elif args.command == 'prune':
+        if args.max_age_days is None and args.max_size_mb is None:
+            print("错误: 请指定 --max-age-days 或 --max-size-mb", file=sys.stderr)
+            sys.exit(1)
+        max_age = args.max_age_days * 86400 if args.max_age_days is not None else None
+        removed = cache.evict(max_age=max_age, max_size_mb=args.max_size_mb)
+        print(f"已删除 {removed} 个快照")
+
+    elif args.command == 'remove':
+        for document_id in args.document_ids:
+            if cache.remove(document_id):
+                print(f"已删除: {document_id}")
+            else:
+                print(f"未找到: {document_id}")
+
+    elif args.command == 'clear':
+        cache.clear()
+        print("缓存已清空")
+
+
+if __name__ == '__main__':
+    main()
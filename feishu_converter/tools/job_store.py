@@ -0,0 +1,289 @@
+"""
+批量转换任务库
+以 SQLite（WAL 模式）持久化每个文档的转换状态，进程崩溃或中断后可以从上次的进度继续，
+失败的文档按指数退避重新排队，多次失败后标记为放弃
+"""
+
+import logging
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Container, Dict, Iterable, List, Optional, Tuple
+
+from ..utils.sqlite_utils import connect_db, init_db
+
+
+class JobState:
+    """任务状态"""
+
+    PENDING = "pending"        # 等待转换
+    IN_FLIGHT = "in_flight"    # 转换中（进程中断后恢复为 pending）
+    DONE = "done"              # 转换成功
+    FAILED = "failed"          # 转换失败，等待退避后重试
+    DEAD = "dead"              # 多次失败或不可重试，不再转换
+
+    ALL = (PENDING, IN_FLIGHT, DONE, FAILED, DEAD)
+
+
+class JobStore:
+    """
+    批量转换任务库
+    状态变更先写入内存并缓冲，每累计 commit_interval 条或间隔 commit_seconds 秒在一个事务中批量提交，
+    记账不会拖慢转换；中断时最多丢失最后一批变更，对应文档在恢复时重新转换
+    """
+
+    FILENAME = ".feishu_jobs.db"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            token TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            doc_type TEXT NOT NULL,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            result TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state);
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_attempts: int = 3,
+        retry_delay: float = 10.0,
+        max_retry_delay: float = 300.0,
+        commit_interval: int = 50,
+        commit_seconds: float = 2.0
+    ):
+        """
+        初始化任务库
+
+        :param db_path: SQLite数据库文件路径
+        :param max_attempts: 每个文档最多转换几次，超过后标记为放弃
+        :param retry_delay: 第一次重试前的等待秒数，之后每次翻倍
+        :param max_retry_delay: 重试等待秒数上限
+        :param commit_interval: 累计多少条状态变更提交一次
+        :param commit_seconds: 距上次提交超过多少秒时提交
+        """
+        self.db_path = Path(db_path)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.commit_interval = max(1, commit_interval)
+        self.commit_seconds = commit_seconds
+        self.logger = logging.getLogger(__name__)
+
+        # token -> 任务记录（与数据库一致，含尚未提交的变更）
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._pending_writes: List[Tuple] = []
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+
+        init_db(self.db_path, self.SCHEMA)
+        self._load()
+
+    def _load(self):
+        """加载已有任务"""
+        with connect_db(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT token, seq, doc_type, state, attempts, next_attempt_at, result FROM jobs ORDER BY seq"
+            ).fetchall()
+        self._jobs = {
+            row[0]: {
+                'seq': row[1],
+                'doc_type': row[2],
+                'state': row[3],
+                'attempts': row[4],
+                'next_attempt_at': row[5],
+                'result': row[6]
+            }
+            for row in rows
+        }
+
+    def reset(self):
+        """清空任务库（开始一次全新的批量转换）"""
+        with self._lock:
+            self._pending_writes.clear()
+            self._jobs.clear()
+            with connect_db(self.db_path) as conn:
+                conn.execute("DELETE FROM jobs")
+
+    def recover(self) -> int:
+        """
+        恢复上次中断时正在转换的任务为待转换
+
+        :return: 恢复的任务数
+        """
+        with self._lock:
+            tokens = [token for token, job in self._jobs.items() if job['state'] == JobState.IN_FLIGHT]
+            for token in tokens:
+                self._set(token, JobState.PENDING)
+            self._commit()
+        if tokens:
+            self.logger.info(f"恢复 {len(tokens)} 个上次中断的转换任务")
+        return len(tokens)
+
+    def add(self, tokens: Iterable[str], doc_type: str = "wiki") -> int:
+        """
+        登记任务，已存在的任务保持原状态
+
+        :param tokens: 文档token
+        :param doc_type: 文档类型
+        :return: 新登记的任务数
+        """
+        now = time.time()
+        with self._lock:
+            rows = []
+            seq = len(self._jobs)
+            for token in tokens:
+                if token in self._jobs:
+                    continue
+                self._jobs[token] = {
+                    'seq': seq,
+                    'doc_type': doc_type,
+                    'state': JobState.PENDING,
+                    'attempts': 0,
+                    'next_attempt_at': 0,
+                    'result': None
+                }
+                rows.append((token, seq, doc_type, JobState.PENDING, now))
+                seq += 1
+            if rows:
+                self._commit()
+                with connect_db(self.db_path) as conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO jobs (token, seq, doc_type, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+        return len(rows)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务记录
+
+        :param token: 文档token
+        :return: 任务记录（state、attempts、next_attempt_at、result），不存在返回None
+        """
+        with self._lock:
+            job = self._jobs.get(token)
+            return dict(job) if job else None
+
+    def tokens(self, *states: str) -> List[str]:
+        """
+        按登记顺序列出处于指定状态的任务
+
+        :param states: 任务状态，为空时列出全部任务
+        :return: 文档token列表
+        """
+        with self._lock:
+            items = sorted(self._jobs.items(), key=lambda item: item[1]['seq'])
+            return [token for token, job in items if not states or job['state'] in states]
+
+    def mark_in_flight(self, token: str):
+        """标记任务开始转换"""
+        with self._lock:
+            self._set(token, JobState.IN_FLIGHT, attempts=self._jobs[token]['attempts'] + 1)
+
+    def mark_done(self, token: str, result: Optional[str] = None):
+        """
+        标记任务转换成功
+
+        :param token: 文档token
+        :param result: 输出文件路径
+        """
+        with self._lock:
+            self._set(token, JobState.DONE, result=result)
+
+    def mark_failed(self, token: str, error: Optional[str] = None, retryable: bool = True) -> str:
+        """
+        标记任务转换失败，未超过最大次数时按指数退避安排重试
+
+        :param token: 文档token
+        :param error: 错误信息
+        :param retryable: 是否可以重试（如没有权限时重试无意义）
+        :return: 新状态（failed 或 dead）
+        """
+        with self._lock:
+            attempts = self._jobs[token]['attempts']
+            if not retryable or attempts >= self.max_attempts:
+                self._set(token, JobState.DEAD, result=error)
+                return JobState.DEAD
+
+            delay = min(self.max_retry_delay, self.retry_delay * (2 ** max(0, attempts - 1)))
+            # 加入抖动，避免同时失败的文档同时重试
+            delay *= random.uniform(0.8, 1.2)
+            self._set(token, JobState.FAILED, result=error, next_attempt_at=time.time() + delay)
+            return JobState.FAILED
+
+    def due_retries(self, among: Optional[Container[str]] = None) -> Tuple[List[str], Optional[float]]:
+        """
+        获取已到重试时间的失败任务
+
+        :param among: 只考虑这些token（如本次运行的文档），为None时考虑全部任务
+        :return: (可以重试的token列表, 距下一个任务可重试的秒数；没有待重试任务时为None)
+        """
+        now = time.time()
+        due = []
+        next_at = None
+        with self._lock:
+            for token, job in sorted(self._jobs.items(), key=lambda item: item[1]['seq']):
+                if job['state'] != JobState.FAILED or (among is not None and token not in among):
+                    continue
+                if job['next_attempt_at'] <= now:
+                    due.append(token)
+                elif next_at is None or job['next_attempt_at'] < next_at:
+                    next_at = job['next_attempt_at']
+        if due:
+            return due, 0.0
+        return due, None if next_at is None else max(0.0, next_at - now)
+
+    def counts(self) -> Dict[str, int]:
+        """
+        统计各状态的任务数
+
+        :return: 状态 -> 任务数
+        """
+        counts = {state: 0 for state in JobState.ALL}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job['state']] += 1
+        return counts
+
+    def flush(self):
+        """立即提交缓冲的状态变更"""
+        with self._lock:
+            self._commit()
+
+    def _set(self, token: str, state: str, **fields):
+        """更新任务状态并缓冲写入（调用方持有锁）"""
+        job = self._jobs[token]
+        job['state'] = state
+        job.update(fields)
+        self._pending_writes.append(
+            (state, job['attempts'], job['next_attempt_at'], job['result'], time.time(), token)
+        )
+        if (len(self._pending_writes) >= self.commit_interval
+                or time.monotonic() - self._last_commit >= self.commit_seconds):
+            self._commit()
+
+    def _commit(self):
+        """在一个事务中写入缓冲的状态变更（调用方持有锁）"""
+        self._last_commit = time.monotonic()
+        if not self._pending_writes:
+            return
+        writes, self._pending_writes = self._pending_writes, []
+        try:
+            with connect_db(self.db_path) as conn:
+                conn.executemany(
+                    "UPDATE jobs SET state = ?, attempts = ?, next_attempt_at = ?, result = ?, updated_at = ? "
+                    "WHERE token = ?",
+                    writes
+                )
+        except sqlite3.Error as e:
+            # 写入失败时保留变更，下次提交时重试
+            self._pending_writes = writes + self._pending_writes
+            self.logger.warning(f"保存任务状态失败: {e}")
@@ -0,0 +1,204 @@
+"""
+分阶段流水线
+每个阶段有独立的有界队列和工作线程，阶段之间通过队列传递任务：上游过快时在队列满时等待（背压），
+各阶段可以分别设置并发数；阶段内的处理函数也可以把任务交给进程池执行（如CPU密集的PDF渲染）
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 处理函数的返回值：(下一阶段名称, 任务)，返回None表示任务在本阶段结束
+StageResult = Optional[Tuple[str, Any]]
+
+# 通知工作线程退出
+_STOP = object()
+
+
+class PipelineStage:
+    """
+    流水线阶段
+    统计队列深度（当前、平均、最大）、处理数、错误数、处理耗时和向下游投递时的等待耗时
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], StageResult], workers: int = 1, queue_size: Optional[int] = None):
+        """
+        初始化阶段
+
+        :param name: 阶段名称
+        :param handler: 处理函数，返回 (下一阶段名称, 任务) 或 None
+        :param workers: 工作线程数
+        :param queue_size: 输入队列容量，默认为工作线程数的2倍
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = queue_size or self.workers * 2
+        self.queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    def sample_depth(self):
+        """记录一次当前队列深度（每次入队时调用）"""
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    def record(self, busy: float, blocked: float = 0.0, error: bool = False):
+        """记录一个任务的处理结果"""
+        with self._lock:
+            self.processed += 1
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            if error:
+                self.errors += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取阶段统计
+
+        :return: 并发数、队列容量、队列深度、处理数、错误数和耗时
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queue_depth': self.queue.qsize(),
+                'avg_queue_depth': round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0.0,
+                'max_queue_depth': self.max_depth,
+                'processed': self.processed,
+                'errors': self.errors,
+                'busy_seconds': round(self.busy_seconds, 3),
+                'blocked_seconds': round(self.blocked_seconds, 3)
+            }
+
+
+class StagedPipeline:
+    """
+    分阶段流水线
+    任务只能投递到后面的阶段，因此队列满时的等待不会形成环路死锁；
+    submit 在第一个阶段的队列满时等待，join 等待所有已提交的任务结束后停止工作线程
+    """
+
+    def __init__(self, stages: List[PipelineStage], on_error: Optional[Callable[[str, Any, BaseException], None]] = None):
+        """
+        初始化流水线
+
+        :param stages: 按顺序排列的阶段
+        :param on_error: 处理函数抛出异常时的回调 (阶段名称, 任务, 异常)，任务在该阶段结束
+        """
+        self.stages = stages
+        self.on_error = on_error
+        self.logger = logging.getLogger(__name__)
+
+        self._stages: Dict[str, PipelineStage] = {stage.name: stage for stage in stages}
+        self._order = {stage.name: i for i, stage in enumerate(stages)}
+        self._threads: List[threading.Thread] = []
+        # 已提交但尚未结束的任务数
+        self._outstanding = 0
+        self._outstanding_cond = threading.Condition()
+        self._started = False
+
+    def start(self):
+        """启动所有阶段的工作线程"""
+        if self._started:
+            return
+        self._started = True
+        for stage in self.stages:
+            for i in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(stage,), name=f"pipeline-{stage.name}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, item: Any, stage: Optional[str] = None):
+        """
+        提交任务（队列满时等待）
+
+        :param item: 任务
+        :param stage: 进入的阶段，默认为第一个阶段
+        """
+        self.start()
+        with self._outstanding_cond:
+            self._outstanding += 1
+        target = self._stages[stage] if stage else self.stages[0]
+        target.queue.put(item)
+        target.sample_depth()
+
+    def join(self):
+        """等待所有已提交的任务结束并停止工作线程"""
+        with self._outstanding_cond:
+            while self._outstanding:
+                self._outstanding_cond.wait()
+        for stage in self.stages:
+            for _ in range(stage.workers):
+                stage.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._started = False
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各阶段统计
+
+        :return: 阶段名称 -> 阶段统计
+        """
+        return {stage.name: stage.get_metrics() for stage in self.stages}
+
+    def _worker(self, stage: PipelineStage):
+        """阶段工作线程：处理任务并投递到下一阶段"""
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                return
+
+            started = time.monotonic()
+            try:
+                result = stage.handler(item)
+                if result is not None:
+                    next_name, next_item = result
+                    next_stage = self._stages[next_name]
+                    if self._order[next_name] <= self._order[stage.name]:
+                        raise ValueError(f"只能投递到后面的阶段: {next_name}")
+            except Exception as e:
+                stage.record(time.monotonic() - started, error=True)
+                if self.on_error:
+                    try:
+                        self.on_error(stage.name, item, e)
+                    except Exception as callback_error:
+                        self.logger.error(f"流水线错误回调失败: {callback_error}")
+                else:
+                    self.logger.error(f"流水线阶段 {stage.name} 处理失败: {e}")
+                self._finish()
+                continue
+
+            busy = time.monotonic() - started
+            if result is None:
+                stage.record(busy)
+                self._finish()
+                continue
+
+            put_started = time.monotonic()
+            next_stage.queue.put(next_item)
+            next_stage.sample_depth()
+            stage.record(busy, blocked=time.monotonic() - put_started)
+
+    def _finish(self):
+        """一个任务结束"""
+        with self._outstanding_cond:
+            self._outstanding -= 1
+            if not self._outstanding:
+                self._outstanding_cond.notify_all()
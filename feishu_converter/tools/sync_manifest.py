@@ -0,0 +1,229 @@
+"""
+增量同步清单
+记录每个文档 token 对应的版本号、输出文件和内容哈希，用于判断哪些文档需要重新转换
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..utils.file_utils import file_hash
+
+
+class SyncManifest:
+    """
+    增量同步清单
+    清单以JSON文件保存在输出目录中，输出文件路径以相对路径记录，
+    判断输出文件是否完好时先比较大小和修改时间，只有两者变化时才重新计算哈希
+    """
+
+    FILENAME = ".feishu_sync_manifest.json"
+    VERSION = 1
+
+    def __init__(self, output_dir: str, manifest_path: Optional[str] = None, save_interval: int = 50):
+        """
+        初始化同步清单
+
+        :param output_dir: 输出目录
+        :param manifest_path: 清单文件路径，默认为输出目录下的 .feishu_sync_manifest.json
+        :param save_interval: 每记录多少次变更自动保存一次，避免中断后丢失进度
+        """
+        self.output_dir = Path(output_dir)
+        self.path = Path(manifest_path) if manifest_path else self.output_dir / self.FILENAME
+        self.save_interval = save_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.load()
+
+    def load(self):
+        """从文件加载清单"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._entries = data.get('documents', {})
+            self.logger.info(f"已加载同步清单: {len(self._entries)} 个文档")
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取同步清单失败，将全量转换: {e}")
+            self._entries = {}
+
+    def save(self):
+        """保存清单（先写临时文件再替换，避免中断时损坏）"""
+        with self._lock:
+            data = {
+                'version': self.VERSION,
+                'updated_at': time.time(),
+                'documents': self._entries
+            }
+            temp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+            self._dirty = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        获取文档的清单记录
+
+        :param token: 文档token
+        :return: 清单记录，不存在返回None
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            return dict(entry) if entry else None
+
+    def tokens(self) -> List[str]:
+        """返回清单中的所有文档token"""
+        with self._lock:
+            return list(self._entries)
+
+    def output_path(self, entry: Dict[str, Any]) -> Path:
+        """
+        获取清单记录对应的输出文件路径
+
+        :param entry: 清单记录
+        :return: 输出文件路径
+        """
+        return self.output_dir / entry['output']
+
+    def is_unchanged(
+        self,
+        token: str,
+        revision: Any,
+        title: Optional[str],
+        output_format: str,
+        revision_kind: Optional[str] = None
+    ) -> bool:
+        """
+        判断文档自上次同步后是否未变化且输出文件完好
+        版本号和修改时间不能相互比较，只有与上次记录的版本标识含义相同时才比较
+
+        :param token: 文档token
+        :param revision: 当前版本标识
+        :param title: 当前标题
+        :param output_format: 输出格式
+        :param revision_kind: 版本标识的含义（version 或 edit_time，见 FeishuDocAPI.check_document_status）
+        :return: 是否可以跳过
+        """
+        entry = self.get(token)
+        if not entry or revision is None:
+            return False
+        if entry.get('revision_kind') != revision_kind or str(entry.get('revision')) != str(revision):
+            return False
+        if entry.get('title') != title or entry.get('format') != output_format:
+            return False
+        return self._output_intact(token, entry)
+
+    def _output_intact(self, token: str, entry: Dict[str, Any]) -> bool:
+        """输出文件存在且内容与记录一致"""
+        path = self.output_path(entry)
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+
+        if stat.st_size == entry.get('size') and stat.st_mtime == entry.get('mtime'):
+            return True
+
+        # 大小或修改时间变化时才计算哈希
+        if file_hash(path) != entry.get('content_hash'):
+            return False
+        with self._lock:
+            if token in self._entries:
+                self._entries[token].update(size=stat.st_size, mtime=stat.st_mtime)
+                self._dirty += 1
+        return True
+
+    def record(
+        self,
+        token: str,
+        revision: Any,
+        title: Optional[str],
+        output_format: str,
+        output_path: str,
+        revision_kind: Optional[str] = None
+    ):
+        """
+        记录一次成功的转换
+
+        :param token: 文档token
+        :param revision: 版本标识
+        :param title: 标题
+        :param output_format: 输出格式
+        :param output_path: 输出文件路径
+        :param revision_kind: 版本标识的含义（version 或 edit_time）
+        """
+        path = Path(output_path)
+        stat = path.stat()
+        entry = {
+            'revision': revision,
+            'revision_kind': revision_kind,
+            'title': title,
+            'format': output_format,
+            'output': os.path.relpath(path, self.output_dir),
+            'content_hash': file_hash(path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'synced_at': time.time()
+        }
+        with self._lock:
+            self._entries[token] = entry
+            self._dirty += 1
+            should_save = self._dirty >= self.save_interval
+        if should_save:
+            self.save()
+
+    def remove_output(self, token: str, keep_path: Optional[str] = None) -> bool:
+        """
+        删除清单记录对应的输出文件和图片目录
+
+        :param token: 文档token
+        :param keep_path: 不删除的路径（文档改名后新旧路径相同时使用）
+        :return: 是否删除了文件
+        """
+        entry = self.get(token)
+        if not entry:
+            return False
+
+        path = self.output_path(entry)
+        if keep_path and Path(keep_path).resolve() == path.resolve():
+            return False
+
+        removed = False
+        try:
+            if path.exists():
+                path.unlink()
+                removed = True
+            images_dir = path.with_name(f"{path.stem}_images")
+            if images_dir.is_dir():
+                shutil.rmtree(images_dir)
+        except OSError as e:
+            self.logger.warning(f"删除旧输出失败 {path}: {e}")
+        return removed
+
+    def prune(self, active_tokens: Iterable[str]) -> List[str]:
+        """
+        删除不在本次文档列表中的记录及其输出文件
+
+        :param active_tokens: 本次同步的文档token
+        :return: 被删除的文档token
+        """
+        active = set(active_tokens)
+        removed = [token for token in self.tokens() if token not in active]
+        for token in removed:
+            self.remove_output(token)
+            with self._lock:
+                self._entries.pop(token, None)
+                self._dirty += 1
+        if removed:
+            self.logger.info(f"已删除 {len(removed)} 个不再存在的文档的输出")
+        return removed
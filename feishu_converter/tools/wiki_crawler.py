@@ -0,0 +1,250 @@
+"""
+知识库爬取工具
+从根节点（或整个知识空间）开始按层遍历知识库节点，有子节点的节点在线程池中并发展开，
+发现的节点立即交给批量转换器，不需要先导出目录JSON
+"""
+
+import logging
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from ..api import FeishuDocAPI
+from ..utils.rate_limiter import parse_budgets
+from .batch_converter import BatchConverter, stage_workers_from_args
+
+
+def node_to_document(node: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将知识库节点转换为文档描述（格式同 FeishuDocAPI.check_document_status 对知识库节点的结果）
+
+    :param node: 知识库节点
+    :return: 文档描述
+    """
+    obj_type = (node.get("obj_type") or "").lower()
+    return {
+        "accessible": True,
+        "doc_type": obj_type or "wiki",
+        "title": node.get("title"),
+        "revision": node.get("obj_edit_time"),
+        "revision_kind": "edit_time",
+        "document_id": node.get("obj_token") or node.get("node_token"),
+        "document_info": None,
+        "source": "wiki_crawl",
+        "error": None
+    }
+
+
+class WikiCrawler:
+    """
+    知识库节点爬取器
+    同时展开的节点数不超过 max_workers，每个节点的子节点列表自动翻页
+    """
+
+    def __init__(self, api: Optional[FeishuDocAPI] = None, max_workers: int = 4, max_depth: Optional[int] = None):
+        """
+        初始化爬取器
+
+        :param api: API客户端
+        :param max_workers: 并发展开的节点数
+        :param max_depth: 最大深度（根节点或顶层节点为0），为None时不限制
+        """
+        self.api = api or FeishuDocAPI()
+        self.max_workers = max(1, max_workers)
+        self.max_depth = max_depth
+        self.logger = logging.getLogger(__name__)
+        # 子节点获取失败的节点（其子树未被爬取）
+        self.failed_nodes: List[str] = []
+
+    @property
+    def complete(self) -> bool:
+        """上一次爬取是否覆盖了全部节点"""
+        return not self.failed_nodes
+
+    def crawl(self, root_token: Optional[str] = None, space_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        按层遍历知识库节点，边爬取边产出
+
+        :param root_token: 根节点token（包含根节点本身）
+        :param space_id: 知识空间ID，未指定根节点时遍历整个知识空间
+        :return: 节点迭代器（节点含 node_token、obj_token、obj_type、title、has_child 等字段）
+        """
+        self.failed_nodes = []
+        if root_token:
+            root = self.api.get_wiki_node(root_token)
+            if not root:
+                self.logger.error(f"获取知识库根节点失败: {root_token}")
+                self.failed_nodes.append(root_token)
+                return
+            space_id = root.get("space_id") or space_id
+            roots = [root]
+        elif space_id:
+            try:
+                roots = list(self.api.iter_wiki_child_nodes(space_id, raise_on_error=True))
+            except RuntimeError as e:
+                self.logger.error(f"获取知识空间顶层节点失败: {e}")
+                self.failed_nodes.append(space_id)
+                return
+        else:
+            raise ValueError("需要指定根节点token或知识空间ID")
+
+        seen: Set[str] = set()
+        discovered = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="wiki-crawl") as executor:
+            pending: Dict[Future, int] = {}
+
+            def visit(node: Dict[str, Any], depth: int) -> bool:
+                node_token = node.get("node_token")
+                if not node_token or node_token in seen:
+                    return False
+                seen.add(node_token)
+                if node.get("has_child") and (self.max_depth is None or depth < self.max_depth):
+                    future = executor.submit(self._list_children, space_id, node_token)
+                    pending[future] = depth + 1
+                return True
+
+            for node in roots:
+                if visit(node, 0):
+                    discovered += 1
+                    yield node
+
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth = pending.pop(future)
+                    try:
+                        children = future.result()
+                    except RuntimeError as e:
+                        self.logger.error(f"展开知识库节点失败，跳过其子树: {e}")
+                        continue
+                    for child in children:
+                        if visit(child, depth):
+                            discovered += 1
+                            yield child
+
+        if self.failed_nodes:
+            self.logger.warning(f"知识库爬取完成，共发现 {discovered} 个节点，{len(self.failed_nodes)} 个节点的子节点获取失败")
+        else:
+            self.logger.info(f"知识库爬取完成，共发现 {discovered} 个节点")
+
+    def _list_children(self, space_id: str, node_token: str) -> List[Dict[str, Any]]:
+        """获取节点的全部子节点"""
+        try:
+            return list(self.api.iter_wiki_child_nodes(space_id, node_token, raise_on_error=True))
+        except RuntimeError:
+            self.failed_nodes.append(node_token)
+            raise
+
+    def crawl_documents(
+        self, root_token: Optional[str] = None, space_id: Optional[str] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        爬取知识库并产出 (节点token, 文档描述)，供 BatchConverter.convert_stream 使用
+
+        :param root_token: 根节点token
+        :param space_id: 知识空间ID
+        :return: (节点token, 文档描述) 迭代器
+        """
+        for node in self.crawl(root_token, space_id):
+            yield node["node_token"], node_to_document(node)
+
+
+# 命令行入口
+def main():
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='爬取飞书知识库并边爬取边批量转换',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  %(prog)s --root wikcnXXXXXXXX ./output markdown
+  %(prog)s --space-id 7000000000000000000 ./output markdown --workers 4 --crawl-workers 8
+  %(prog)s --root wikcnXXXXXXXX ./output markdown --incremental
+        """
+    )
+
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--root', help='根节点token（从该节点开始爬取，包含根节点）')
+    source.add_argument('--space-id', help='知识空间ID（爬取整个知识空间）')
+    parser.add_argument('output_dir', help='输出目录')
+    parser.add_argument('format', choices=['markdown', 'md', 'pdf'], default='markdown', help='输出格式')
+    parser.add_argument('--workers', type=int, default=3, help='转换并发数 (默认: 3)')
+    parser.add_argument('--crawl-workers', type=int, default=4, help='并发展开的节点数 (默认: 4)')
+    parser.add_argument('--max-depth', type=int, default=None, help='最大爬取深度（根节点为0）')
+    parser.add_argument(
+        '--qps',
+        action='append',
+        default=[],
+        metavar='FAMILY=RATE',
+        help='覆盖接口族配额，可重复指定，如 --qps docx=4 --qps sheets=50'
+    )
+    parser.add_argument('--rate-limit-dir', default=None, help='跨进程共享限流状态的目录')
+    parser.add_argument('--use-token-filename', action='store_true', help='使用token作为文件名（默认使用文档标题）')
+    parser.add_argument('--incremental', action='store_true', help='增量同步：只重新转换版本变化的文档')
+    parser.add_argument('--manifest', default=None, help='增量同步清单路径 (默认: 输出目录/.feishu_sync_manifest.json)')
+    parser.add_argument('--resume', action='store_true', help='从上次中断的进度继续，跳过已完成的文档')
+    parser.add_argument('--max-attempts', type=int, default=3, help='每个文档最多转换几次 (默认: 3)')
+    parser.add_argument('--pipeline', action='store_true', help='使用分阶段流水线转换')
+    for stage in BatchConverter.PIPELINE_STAGES:
+        parser.add_argument(f'--{stage}-workers', type=int, default=None, help=f'流水线 {stage} 阶段的并发数')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示详细日志')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    rate_limits = None
+    if args.qps:
+        try:
+            rate_limits = parse_budgets(','.join(args.qps))
+        except ValueError as e:
+            parser.error(str(e))
+
+    output_format = 'markdown' if args.format in ['markdown', 'md'] else 'pdf'
+
+    try:
+        converter = BatchConverter(
+            output_dir=args.output_dir,
+            output_format=output_format,
+            max_workers=args.workers,
+            use_title_as_filename=not args.use_token_filename,
+            rate_limits=rate_limits,
+            rate_limit_dir=args.rate_limit_dir,
+            incremental=args.incremental,
+            manifest_path=args.manifest,
+            resume=args.resume,
+            max_attempts=args.max_attempts,
+            use_pipeline=args.pipeline,
+            stage_workers=stage_workers_from_args(args)
+        )
+        crawler = WikiCrawler(converter.api, max_workers=args.crawl_workers, max_depth=args.max_depth)
+        stats = converter.convert_stream(
+            crawler.crawl_documents(args.root, args.space_id),
+            # 爬取不完整时不删除未爬到的文档的旧输出
+            is_complete=lambda: crawler.complete
+        )
+
+        print("\n" + "=" * 50)
+        print("知识库转换完成!")
+        print("=" * 50)
+        print(f"总计: {stats['total']}")
+        print(f"成功: {stats['success']}")
+        print(f"失败: {stats['failed']}")
+        print(f"跳过: {stats.get('skipped', 0)}")
+        if args.incremental:
+            print(f"删除: {stats.get('removed', 0)}")
+
+        sys.exit(0 if stats['failed'] == 0 else 1)
+
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,15 +8,36 @@ from urllib.parse import urlparse
 
 # 导出新的工具类
 from .image_utils import ImageUtils, ImageCacheManager
+from .cache_index import ImageCacheIndex, get_cache_index
+from .token_utils import TenantTokenProvider, get_token_provider
+from .snapshot_cache import DocumentSnapshotCache, get_snapshot_cache
+from .media_store import MediaStore, get_media_store
+from .file_utils import file_hash
+from .run_cache import RunCache
+from .rate_limiter import (
+    TokenBucket,
+    FileTokenBucket,
+    RateLimiter,
+    endpoint_family,
+    get_rate_limiter,
+    configure_rate_limiter
+)
 from .retry_utils import (
     RetryConfig,
     retry_with_backoff,
     retry_on_rate_limit,
+    RateLimitError,
+    is_rate_limited,
+    parse_retry_after,
+    check_rate_limit,
     CircuitBreaker,
     CircuitBreakerOpenError,
     FallbackStrategy,
     with_fallback,
     RequestSessionManager,
+    get_shared_session_manager,
+    get_shared_session,
+    close_shared_session,
     safe_request,
     safe_get,
     safe_post
@@ -69,16 +90,45 @@ __all__ = [
     # 图片工具
     'ImageUtils',
     'ImageCacheManager',
+    'ImageCacheIndex',
+    'get_cache_index',
     # 重试工具
     'RetryConfig',
     'retry_with_backoff',
     'retry_on_rate_limit',
+    'RateLimitError',
+    'is_rate_limited',
+    'parse_retry_after',
+    'check_rate_limit',
     'CircuitBreaker',
     'CircuitBreakerOpenError',
     'FallbackStrategy',
     'with_fallback',
     'RequestSessionManager',
+    'get_shared_session_manager',
+    'get_shared_session',
+    'close_shared_session',
     'safe_request',
     'safe_get',
     'safe_post',
+    # 令牌工具
+    'TenantTokenProvider',
+    'get_token_provider',
+    # 快照缓存
+    'DocumentSnapshotCache',
+    'get_snapshot_cache',
+    # 素材库
+    'MediaStore',
+    'get_media_store',
+    # 文件工具
+    'file_hash',
+    # 运行期缓存
+    'RunCache',
+    # 限流工具
+    'TokenBucket',
+    'FileTokenBucket',
+    'RateLimiter',
+    'endpoint_family',
+    'get_rate_limiter',
+    'configure_rate_limiter',
 ]
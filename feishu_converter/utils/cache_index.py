@@ -0,0 +1,262 @@
+"""
+图片缓存索引
+在缓存目录中用 SQLite 记录每个文件的大小和最近访问时间，并增量维护总大小和命中统计，
+计算缓存大小和淘汰最旧文件时不再遍历整个目录
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .sqlite_utils import connect_db, init_db
+
+# 索引数据库文件名（保存在缓存目录中，不计入缓存）
+INDEX_FILENAME = ".cache_index.db"
+
+# 每批淘汰的文件数
+_EVICT_BATCH = 256
+
+
+class ImageCacheIndex:
+    """
+    缓存目录索引
+    文件按相对路径记录，写入和访问只更新一行和计数器，淘汰按访问时间索引顺序读取最旧的k个文件
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            name TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed ON cache_entries (accessed_at);
+        CREATE TABLE IF NOT EXISTS cache_counters (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    COUNTERS = ("total_size", "entries", "hits", "misses", "admissions", "evictions")
+
+    def __init__(self, cache_dir: str):
+        """
+        打开缓存目录的索引，索引不存在时扫描一次目录建立索引
+
+        :param cache_dir: 缓存目录
+        """
+        self.cache_dir = Path(cache_dir)
+        self.db_path = self.cache_dir / INDEX_FILENAME
+        self.logger = logging.getLogger(__name__)
+
+        init_db(self.db_path, self.SCHEMA)
+        with connect_db(self.db_path) as conn:
+            initialized = conn.execute(
+                "SELECT value FROM cache_counters WHERE key = 'initialized'"
+            ).fetchone()
+        if initialized is None:
+            self.rebuild()
+
+    @staticmethod
+    def _add_counters(conn: sqlite3.Connection, **deltas: int):
+        for key, delta in deltas.items():
+            if delta:
+                conn.execute(
+                    "INSERT INTO cache_counters (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                    (key, delta)
+                )
+
+    def _name(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.cache_dir)
+
+    def rebuild(self):
+        """扫描缓存目录重建索引（只在索引不存在或需要校正时调用）"""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.startswith(INDEX_FILENAME) or filename.endswith('.part'):
+                    continue
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((os.path.relpath(file_path, self.cache_dir), stat.st_size, stat.st_mtime))
+
+        with connect_db(self.db_path) as conn:
+            conn.execute("DELETE FROM cache_entries")
+            conn.executemany("INSERT INTO cache_entries (name, size, accessed_at) VALUES (?, ?, ?)", entries)
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_counters (key, value) VALUES (?, ?)",
+                [("total_size", sum(size for _, size, _ in entries)), ("entries", len(entries)), ("initialized", 1)]
+            )
+        self.logger.debug(f"已重建缓存索引: {self.cache_dir}，{len(entries)} 个文件")
+
+    def admit(self, path: str, size: Optional[int] = None, miss: bool = True):
+        """
+        记录写入缓存的文件
+
+        :param path: 文件路径
+        :param size: 文件大小，未提供时读取文件
+        :param miss: 是否计为一次未命中（下载后写入时为True）
+        """
+        name = self._name(path)
+        if size is None:
+            size = os.path.getsize(path)
+        with connect_db(self.db_path) as conn:
+            row = conn.execute("SELECT size FROM cache_entries WHERE name = ?", (name,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (name, size, accessed_at) VALUES (?, ?, ?)",
+                (name, size, time.time())
+            )
+            self._add_counters(
+                conn,
+                total_size=size - (row[0] if row else 0),
+                entries=0 if row else 1,
+                admissions=1,
+                misses=1 if miss else 0
+            )
+
+    def touch(self, path: str) -> bool:
+        """
+        记录一次缓存命中并更新访问时间
+
+        :param path: 文件路径
+        :return: 文件是否在索引中
+        """
+        with connect_db(self.db_path) as conn:
+            updated = conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE name = ?",
+                (time.time(), self._name(path))
+            ).rowcount
+            if updated:
+                self._add_counters(conn, hits=1)
+        return bool(updated)
+
+    def discard(self, path: str):
+        """
+        从索引中移除文件（文件已被外部删除时调用）
+
+        :param path: 文件路径
+        """
+        with connect_db(self.db_path) as conn:
+            self._remove_entries(conn, [(self._name(path), None)])
+
+    def total_size(self) -> int:
+        """缓存总大小（字节）"""
+        with connect_db(self.db_path) as conn:
+            row = conn.execute("SELECT value FROM cache_counters WHERE key = 'total_size'").fetchone()
+        return row[0] if row else 0
+
+    def evict_to(self, max_size: int) -> int:
+        """
+        按最久未访问的顺序删除文件，直到总大小不超过上限
+
+        :param max_size: 大小上限（字节）
+        :return: 删除的文件数
+        """
+        removed = 0
+        while True:
+            with connect_db(self.db_path) as conn:
+                total = conn.execute("SELECT value FROM cache_counters WHERE key = 'total_size'").fetchone()
+                total = total[0] if total else 0
+                if total <= max_size:
+                    break
+                batch = []
+                for name, size in conn.execute(
+                    "SELECT name, size FROM cache_entries ORDER BY accessed_at LIMIT ?", (_EVICT_BATCH,)
+                ):
+                    if total <= max_size:
+                        break
+                    batch.append((name, size))
+                    total -= size
+                if not batch:
+                    break
+                self._delete_files(batch)
+                self._remove_entries(conn, batch, evicted=True)
+            removed += len(batch)
+        return removed
+
+    def evict_older_than(self, max_age: float) -> int:
+        """
+        删除超过指定时间未访问的文件
+
+        :param max_age: 秒数
+        :return: 删除的文件数
+        """
+        cutoff = time.time() - max_age
+        with connect_db(self.db_path) as conn:
+            batch = conn.execute(
+                "SELECT name, size FROM cache_entries WHERE accessed_at < ?", (cutoff,)
+            ).fetchall()
+            self._delete_files(batch)
+            self._remove_entries(conn, batch, evicted=True)
+        return len(batch)
+
+    def _delete_files(self, entries: Iterable[Tuple[str, Optional[int]]]):
+        for name, _ in entries:
+            file_path = self.cache_dir / name
+            try:
+                file_path.unlink()
+                self.logger.debug(f"删除缓存文件: {file_path}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"删除缓存文件失败 {file_path}: {e}")
+
+    def _remove_entries(self, conn: sqlite3.Connection, entries: List[Tuple[str, Optional[int]]],
+                        evicted: bool = False):
+        total_size = 0
+        count = 0
+        for name, _ in entries:
+            row = conn.execute("SELECT size FROM cache_entries WHERE name = ?", (name,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM cache_entries WHERE name = ?", (name,))
+                total_size += row[0]
+                count += 1
+        self._add_counters(conn, total_size=-total_size, entries=-count, evictions=count if evicted else 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        :return: 统计信息（文件数、总大小、命中、未命中、写入和淘汰次数）
+        """
+        with connect_db(self.db_path) as conn:
+            counters = dict(conn.execute("SELECT key, value FROM cache_counters").fetchall())
+        stats: Dict[str, Any] = {key: counters.get(key, 0) for key in self.COUNTERS}
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['size_mb'] = stats['total_size'] / 1024 / 1024
+        stats['cache_dir'] = str(self.cache_dir)
+        return stats
+
+
+_indexes: Dict[str, ImageCacheIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_cache_index(cache_dir: str) -> Optional[ImageCacheIndex]:
+    """
+    获取缓存目录的共享索引（同一目录在进程内只打开一次）
+
+    :param cache_dir: 缓存目录
+    :return: 缓存索引，打开失败返回None
+    """
+    key = os.path.abspath(cache_dir)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                try:
+                    index = ImageCacheIndex(key)
+                except (sqlite3.Error, OSError) as e:
+                    logging.getLogger(__name__).warning(f"打开缓存索引失败 {cache_dir}: {e}")
+                    return None
+                _indexes[key] = index
+    return index
@@ -0,0 +1,21 @@
+"""
+文件工具
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Union
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """
+    计算文件内容的 SHA-256
+
+    :param path: 文件路径
+    :return: 十六进制哈希值
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
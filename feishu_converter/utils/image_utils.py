@@ -7,6 +7,7 @@ import hashlib
 import logging
 import os
 import tempfile
+import threading
 from pathlib import Path
 from typing import Optional
 from urllib.parse import urlparse
@@ -14,19 +15,33 @@ from urllib.parse import urlparse
 import requests
 from PIL import Image
 
+from .retry_utils import RateLimitError, RetryConfig, check_rate_limit, get_shared_session, retry_with_backoff
+from .rate_limiter import get_rate_limiter
+from .media_store import MediaStore
+from .cache_index import INDEX_FILENAME, ImageCacheIndex, get_cache_index
+
+
+# 缓存图片可能使用的扩展名
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
 
 class ImageUtils:
     """图片处理工具类"""
 
-    def __init__(self, cache_dir: Optional[str] = None, access_token: Optional[str] = None):
+    def __init__(self, cache_dir: Optional[str] = None, access_token: Optional[str] = None,
+                 media_store: Optional[MediaStore] = None, track_cache: Optional[bool] = None):
         """
         初始化图片工具类
 
         :param cache_dir: 图片缓存目录，默认为系统临时目录
         :param access_token: 飞书访问令牌，用于下载受保护的图片
+        :param media_store: 全局素材库，提供时先按token查素材库，缓存目录中只保存指向素材库的链接
+        :param track_cache: 是否在缓存索引中记录文件大小和访问时间，默认记录系统临时目录中的共享缓存
+                            和已建立索引的目录（如由 ImageCacheManager 管理的目录），索引与目录内容保持一致
         """
         self.logger = logging.getLogger(__name__)
         self.access_token = access_token
+        self.media_store = media_store
 
         # 设置缓存目录
         if cache_dir:
@@ -38,6 +53,10 @@ class ImageUtils:
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.logger.debug(f"图片缓存目录: {self.cache_dir}")
 
+        if track_cache is None:
+            track_cache = cache_dir is None or (self.cache_dir / INDEX_FILENAME).exists()
+        self.cache_index: Optional[ImageCacheIndex] = get_cache_index(str(self.cache_dir)) if track_cache else None
+
     def download_image(self, image_token: str, base_url: str = "https://open.feishu.cn/open-apis") -> Optional[str]:
         """
         从飞书下载图片
@@ -46,37 +65,38 @@ class ImageUtils:
         :param base_url: API基础URL
         :return: 下载后的本地文件路径，失败返回None
         """
+        # 素材库中已有该图片时直接链接，不再下载
+        if self.media_store is not None:
+            object_path = self.media_store.lookup(image_token)
+            if object_path is not None:
+                linked = self.media_store.link(object_path, self.cache_dir / f"{image_token}{object_path.suffix}")
+                if linked:
+                    self.logger.debug(f"使用素材库图片: {object_path}")
+                    if self.cache_index is not None:
+                        self.cache_index.admit(linked, miss=False)
+                    return linked
+
         if not self.access_token:
             self.logger.warning("未提供访问令牌，无法下载图片")
             return None
 
         # 检查缓存
         cached_path = self._get_cached_path(image_token)
-        if cached_path.exists():
+        if cached_path is not None:
             self.logger.debug(f"使用缓存图片: {cached_path}")
+            self._record_hit(cached_path)
             return str(cached_path)
 
         # 下载图片
         try:
             url = f"{base_url}/drive/v1/medias/{image_token}/download"
-            headers = {"Authorization": f"Bearer {self.access_token}"}
-
             self.logger.debug(f"下载图片: {image_token}")
-            response = requests.get(url, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
-
-            # 确定文件扩展名
-            content_type = response.headers.get('content-type', '')
-            ext = self._get_extension_from_content_type(content_type)
-
-            # 保存图片
-            image_path = self.cache_dir / f"{image_token}{ext}"
-            with open(image_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-
+            image_path = self._fetch_media(url, image_token)
             self.logger.info(f"图片下载成功: {image_path}")
+            if self.media_store is not None:
+                self.media_store.add(image_token, image_path)
+            if self.cache_index is not None:
+                self.cache_index.admit(str(image_path))
             return str(image_path)
 
         except requests.exceptions.RequestException as e:
@@ -86,6 +106,46 @@ class ImageUtils:
             self.logger.error(f"处理图片时出错 {image_token}: {e}")
             return None
 
+    @retry_with_backoff(RetryConfig(max_retries=3))
+    def _fetch_media(self, url: str, image_token: str) -> Path:
+        """
+        下载素材到缓存目录，与API请求共用限流配额和重试策略
+        先写入临时文件再重命名，并发下载同一图片时不会读到不完整的文件
+
+        :param url: 下载地址
+        :param image_token: 图片token
+        :return: 本地文件路径
+        """
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        limiter = get_rate_limiter()
+        limiter.acquire("drive_media")
+        # 使用共享连接池，流式响应读完后连接归还池中复用
+        with get_shared_session().get(url, headers=headers, stream=True, timeout=30) as response:
+            try:
+                check_rate_limit(response)
+            except RateLimitError as e:
+                limiter.pause("drive_media", e.retry_after)
+                raise
+            response.raise_for_status()
+
+            # 确定文件扩展名
+            content_type = response.headers.get('content-type', '')
+            ext = self._get_extension_from_content_type(content_type)
+
+            # 保存图片
+            image_path = self.cache_dir / f"{image_token}{ext}"
+            temp_path = image_path.with_name(f"{image_path.name}.{os.getpid()}.{threading.get_ident()}.part")
+            try:
+                with open(temp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
+                os.replace(temp_path, image_path)
+            finally:
+                if temp_path.exists():
+                    temp_path.unlink()
+        return image_path
+
     def download_image_from_url(self, image_url: str) -> Optional[str]:
         """
         从URL下载图片
@@ -98,8 +158,9 @@ class ImageUtils:
         cached_path = self.cache_dir / f"url_{url_hash}"
 
         # 尝试找到已缓存的文件（任何扩展名）
-        for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
+        for ext in _IMAGE_EXTENSIONS:
             if (cached_path.with_suffix(ext)).exists():
+                self._record_hit(cached_path.with_suffix(ext))
                 return str(cached_path.with_suffix(ext))
 
         try:
@@ -108,21 +169,23 @@ class ImageUtils:
             if self.access_token:
                 headers["Authorization"] = f"Bearer {self.access_token}"
 
-            response = requests.get(image_url, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
+            with get_shared_session().get(image_url, headers=headers, stream=True, timeout=30) as response:
+                response.raise_for_status()
 
-            # 确定文件扩展名
-            content_type = response.headers.get('content-type', '')
-            ext = self._get_extension_from_content_type(content_type)
+                # 确定文件扩展名
+                content_type = response.headers.get('content-type', '')
+                ext = self._get_extension_from_content_type(content_type)
 
-            # 保存图片
-            image_path = cached_path.with_suffix(ext)
-            with open(image_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+                # 保存图片
+                image_path = cached_path.with_suffix(ext)
+                with open(image_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
 
             self.logger.info(f"图片下载成功: {image_path}")
+            if self.cache_index is not None:
+                self.cache_index.admit(str(image_path))
             return str(image_path)
 
         except Exception as e:
@@ -220,9 +283,18 @@ class ImageUtils:
         """
         import time
 
+        max_age_seconds = max_age_days * 24 * 60 * 60
+        # 有缓存索引时只读取过期的条目，不再遍历目录
+        if self.cache_index is not None:
+            try:
+                removed = self.cache_index.evict_older_than(max_age_seconds)
+                self.logger.debug(f"删除过期缓存 {removed} 个")
+            except Exception as e:
+                self.logger.error(f"清理缓存失败: {e}")
+            return
+
         try:
             current_time = time.time()
-            max_age_seconds = max_age_days * 24 * 60 * 60
 
             for file_path in self.cache_dir.iterdir():
                 if file_path.is_file():
@@ -234,9 +306,18 @@ class ImageUtils:
         except Exception as e:
             self.logger.error(f"清理缓存失败: {e}")
 
-    def _get_cached_path(self, image_token: str) -> Path:
-        """获取缓存路径"""
-        return self.cache_dir / image_token
+    def _get_cached_path(self, image_token: str) -> Optional[Path]:
+        """获取已缓存的图片路径（文件名为 token + 扩展名），未缓存返回None"""
+        for ext in _IMAGE_EXTENSIONS:
+            cached_path = self.cache_dir / f"{image_token}{ext}"
+            if cached_path.exists():
+                return cached_path
+        return None
+
+    def _record_hit(self, path: Path):
+        """在缓存索引中记录命中，文件不在索引中时补记"""
+        if self.cache_index is not None and not self.cache_index.touch(str(path)):
+            self.cache_index.admit(str(path), miss=False)
 
     @staticmethod
     def _get_extension_from_content_type(content_type: str) -> str:
@@ -258,7 +339,11 @@ class ImageUtils:
 
 
 class ImageCacheManager:
-    """图片缓存管理器"""
+    """
+    图片缓存管理器
+    缓存大小和文件访问时间记录在缓存目录的索引中（首次使用时扫描一次目录建立），
+    之后计算大小为 O(1)，淘汰只读取最旧的k个文件
+    """
 
     def __init__(self, max_cache_size_mb: int = 100):
         """
@@ -271,46 +356,70 @@ class ImageCacheManager:
 
     def get_cache_size(self, cache_dir: str) -> int:
         """获取缓存目录大小"""
-        total_size = 0
+        index = get_cache_index(cache_dir)
+        if index is None:
+            return 0
         try:
-            for dirpath, dirnames, filenames in os.walk(cache_dir):
-                for f in filenames:
-                    fp = os.path.join(dirpath, f)
-                    total_size += os.path.getsize(fp)
+            return index.total_size()
         except Exception as e:
             self.logger.error(f"计算缓存大小失败: {e}")
+            return 0
 
-        return total_size
+    def record_admission(self, cache_dir: str, file_path: str):
+        """
+        记录写入缓存目录的文件
+
+        :param cache_dir: 缓存目录
+        :param file_path: 文件路径
+        """
+        index = get_cache_index(cache_dir)
+        if index is not None:
+            index.admit(file_path)
+
+    def record_access(self, cache_dir: str, file_path: str) -> bool:
+        """
+        记录缓存命中（更新文件的访问时间）
+
+        :param cache_dir: 缓存目录
+        :param file_path: 文件路径
+        :return: 文件是否在索引中
+        """
+        index = get_cache_index(cache_dir)
+        return index.touch(file_path) if index is not None else False
 
     def enforce_cache_limit(self, cache_dir: str):
         """强制执行缓存大小限制"""
+        index = get_cache_index(cache_dir)
+        if index is None:
+            return
         try:
-            current_size = self.get_cache_size(cache_dir)
+            current_size = index.total_size()
 
             if current_size > self.max_cache_size:
                 self.logger.info(f"缓存超出限制，开始清理: {current_size / 1024 / 1024:.2f} MB")
+                # 按最近访问时间删除最旧的文件，直到低于限制
+                removed = index.evict_to(self.max_cache_size)
+                self.logger.debug(f"删除缓存文件 {removed} 个")
 
-                # 按修改时间排序，删除最旧的文件
-                files = []
-                for dirpath, dirnames, filenames in os.walk(cache_dir):
-                    for f in filenames:
-                        fp = os.path.join(dirpath, f)
-                        files.append((fp, os.path.getmtime(fp)))
+        except Exception as e:
+            self.logger.error(f"强制执行缓存限制失败: {e}")
 
-                files.sort(key=lambda x: x[1])  # 按时间排序
+    def get_stats(self, cache_dir: str) -> dict:
+        """
+        获取缓存统计信息
 
-                # 删除文件直到低于限制
-                for file_path, _ in files:
-                    if current_size <= self.max_cache_size:
-                        break
+        :param cache_dir: 缓存目录
+        :return: 文件数、总大小、命中、未命中、写入和淘汰次数
+        """
+        index = get_cache_index(cache_dir)
+        return index.get_stats() if index is not None else {}
 
-                    try:
-                        file_size = os.path.getsize(file_path)
-                        os.remove(file_path)
-                        current_size -= file_size
-                        self.logger.debug(f"删除缓存文件: {file_path}")
-                    except Exception as e:
-                        self.logger.warning(f"删除缓存文件失败 {file_path}: {e}")
+    def rebuild_index(self, cache_dir: str):
+        """
+        重新扫描缓存目录校正索引（缓存目录被外部修改后使用）
 
-        except Exception as e:
-            self.logger.error(f"强制执行缓存限制失败: {e}")
+        :param cache_dir: 缓存目录
+        """
+        index = get_cache_index(cache_dir)
+        if index is not None:
+            index.rebuild()
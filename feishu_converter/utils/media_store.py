@@ -0,0 +1,281 @@
+"""
+全局素材库
+按内容哈希保存下载过的图片等素材（哈希 -> 文件），并记录素材token到哈希的索引，
+下载前先查索引；各文档的图片目录中只放指向素材库的硬链接，
+同一张图片在成千上万个文档中只下载和存储一次
+"""
+
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .file_utils import file_hash
+from .snapshot_cache import DEFAULT_CACHE_DIR
+from .sqlite_utils import connect_db, init_db
+
+# 链接方式
+LINK_MODES = ("hardlink", "symlink", "copy")
+
+
+class MediaStore:
+    """
+    内容寻址的素材库
+    素材文件保存在 objects/<哈希前两位>/<哈希><扩展名>，索引保存在同目录的 SQLite 中
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS media_objects (
+            hash TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS media_tokens (
+            token TEXT PRIMARY KEY,
+            hash TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_media_tokens_hash ON media_tokens (hash);
+        CREATE INDEX IF NOT EXISTS idx_media_objects_accessed ON media_objects (accessed_at);
+        CREATE TABLE IF NOT EXISTS media_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, root_dir: str, link_mode: str = "hardlink"):
+        """
+        初始化素材库
+
+        :param root_dir: 素材库目录
+        :param link_mode: 文档引用素材的方式：hardlink（硬链接，跨文件系统时复制）、symlink（相对符号链接）或 copy
+        """
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"不支持的链接方式: {link_mode}")
+        self.root_dir = Path(root_dir)
+        self.objects_dir = self.root_dir / "objects"
+        self.db_path = self.root_dir / "media.db"
+        self.link_mode = link_mode
+        self.logger = logging.getLogger(__name__)
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        init_db(self.db_path, self.SCHEMA)
+        if link_mode == "symlink":
+            # 记录曾以符号链接引用素材，之后以任何方式打开素材库都不再淘汰
+            with connect_db(self.db_path) as conn:
+                conn.execute("INSERT OR REPLACE INTO media_meta (key, value) VALUES ('symlinked', '1')")
+
+    def lookup(self, token: str) -> Optional[Path]:
+        """
+        按素材token查找素材文件，命中时更新访问时间
+
+        :param token: 素材token
+        :return: 素材文件路径，未命中返回None
+        """
+        try:
+            with connect_db(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT o.hash, o.path FROM media_tokens t JOIN media_objects o ON o.hash = t.hash "
+                    "WHERE t.token = ?",
+                    (token,)
+                ).fetchone()
+                if row is None:
+                    return None
+                path = self.root_dir / row[1]
+                if not path.exists():
+                    # 素材文件被外部删除，清理索引后重新下载
+                    conn.execute("DELETE FROM media_tokens WHERE hash = ?", (row[0],))
+                    conn.execute("DELETE FROM media_objects WHERE hash = ?", (row[0],))
+                    return None
+                conn.execute("UPDATE media_objects SET accessed_at = ? WHERE hash = ?", (time.time(), row[0]))
+                return path
+        except sqlite3.Error as e:
+            self.logger.warning(f"读取素材库索引失败: {e}")
+            return None
+
+    def add(self, token: str, file_path: str) -> Optional[Path]:
+        """
+        将刚下载的文件加入素材库，原文件替换为指向素材库的链接
+
+        :param token: 素材token
+        :param file_path: 已下载的文件
+        :return: 素材文件路径，失败返回None
+        """
+        source = Path(file_path)
+        try:
+            digest = file_hash(source)
+            object_path = self.objects_dir / digest[:2] / f"{digest}{source.suffix}"
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                # 先放到临时名再重命名，并发加入同一内容时不会出现不完整的素材文件
+                temp_path = object_path.with_name(f"{object_path.name}.{os.getpid()}.{threading.get_ident()}.part")
+                try:
+                    os.link(source, temp_path)
+                except OSError:
+                    shutil.copyfile(source, temp_path)
+                os.replace(temp_path, object_path)
+
+            now = time.time()
+            with connect_db(self.db_path) as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO media_objects (hash, path, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (digest, str(object_path.relative_to(self.root_dir)), object_path.stat().st_size, now, now)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO media_tokens (token, hash, created_at) VALUES (?, ?, ?)",
+                    (token, digest, now)
+                )
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning(f"加入素材库失败 {token}: {e}")
+            return None
+
+        # 内容与已有素材相同时，原文件改为指向已有素材
+        if not _same_file(source, object_path):
+            self.link(object_path, source)
+        return object_path
+
+    def link(self, object_path: Path, dest_path: Path) -> Optional[str]:
+        """
+        在文档目录中创建指向素材的链接（已存在时替换）
+
+        :param object_path: 素材文件路径
+        :param dest_path: 链接路径
+        :return: 链接路径，失败返回None
+        """
+        dest_path = Path(dest_path)
+        temp_path = dest_path.with_name(f"{dest_path.name}.{os.getpid()}.{threading.get_ident()}.part")
+        try:
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.link_mode == "symlink":
+                os.symlink(os.path.relpath(object_path, dest_path.parent), temp_path)
+            elif self.link_mode == "hardlink":
+                try:
+                    os.link(object_path, temp_path)
+                except OSError:
+                    # 跨文件系统无法硬链接时复制
+                    shutil.copyfile(object_path, temp_path)
+            else:
+                shutil.copyfile(object_path, temp_path)
+            os.replace(temp_path, dest_path)
+            return str(dest_path)
+        except OSError as e:
+            self.logger.warning(f"链接素材失败 {dest_path}: {e}")
+            if temp_path.is_symlink() or temp_path.exists():
+                temp_path.unlink()
+            return None
+
+    def evict(self, max_age: Optional[float] = None, max_size_mb: Optional[float] = None) -> int:
+        """
+        淘汰长时间未使用的素材
+        硬链接或复制到文档目录的文件不受影响；素材库曾以符号链接方式使用时，
+        删除素材会使文档目录中的链接失效，因此不执行淘汰
+
+        :param max_age: 删除超过该秒数未访问的素材
+        :param max_size_mb: 按最久未访问的顺序删除，直到总大小低于上限
+        :return: 删除的素材数
+        """
+        removed = []
+        try:
+            with connect_db(self.db_path) as conn:
+                if conn.execute("SELECT 1 FROM media_meta WHERE key = 'symlinked'").fetchone():
+                    self.logger.warning("素材库以符号链接方式被文档引用，淘汰素材会导致链接失效，已跳过")
+                    return 0
+                if max_age is not None:
+                    removed.extend(conn.execute(
+                        "SELECT hash, path FROM media_objects WHERE accessed_at < ?",
+                        (time.time() - max_age,)
+                    ).fetchall())
+                if max_size_mb is not None:
+                    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM media_objects").fetchone()[0]
+                    total -= sum(self._object_size(conn, digest) for digest, _ in removed)
+                    limit = max_size_mb * 1024 * 1024
+                    removed_hashes = {digest for digest, _ in removed}
+                    for digest, path, size in conn.execute(
+                        "SELECT hash, path, size FROM media_objects ORDER BY accessed_at"
+                    ):
+                        if total <= limit:
+                            break
+                        if digest in removed_hashes:
+                            continue
+                        removed.append((digest, path))
+                        total -= size
+                for digest, _ in removed:
+                    conn.execute("DELETE FROM media_tokens WHERE hash = ?", (digest,))
+                    conn.execute("DELETE FROM media_objects WHERE hash = ?", (digest,))
+        except sqlite3.Error as e:
+            self.logger.warning(f"淘汰素材失败: {e}")
+            return 0
+
+        for _, path in removed:
+            try:
+                (self.root_dir / path).unlink()
+            except OSError:
+                pass
+        if removed:
+            self.logger.info(f"已淘汰 {len(removed)} 个素材")
+        return len(removed)
+
+    @staticmethod
+    def _object_size(conn: sqlite3.Connection, digest: str) -> int:
+        row = conn.execute("SELECT size FROM media_objects WHERE hash = ?", (digest,)).fetchone()
+        return row[0] if row else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取素材库统计信息
+
+        :return: 统计信息
+        """
+        with connect_db(self.db_path) as conn:
+            objects, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media_objects").fetchone()
+            tokens = conn.execute("SELECT COUNT(*) FROM media_tokens").fetchone()[0]
+        return {
+            'root_dir': str(self.root_dir),
+            'objects': objects,
+            'tokens': tokens,
+            'size_mb': size / 1024 / 1024
+        }
+
+
+def _same_file(a: Path, b: Path) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+_shared_store: Optional[MediaStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_media_store() -> Optional[MediaStore]:
+    """
+    获取进程级共享的素材库
+    读取环境变量 FEISHU_MEDIA_STORE（设为0关闭，也可以指定素材库目录，默认 $FEISHU_CACHE_DIR/media）
+    和 FEISHU_MEDIA_LINK（hardlink、symlink 或 copy）
+
+    :return: 共享素材库，已关闭或初始化失败时返回None
+    """
+    global _shared_store
+
+    setting = os.getenv("FEISHU_MEDIA_STORE", "1")
+    if setting.lower() in ("0", "false", "off"):
+        return None
+
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                root_dir = setting if setting.lower() not in ("1", "true", "on") else os.path.join(DEFAULT_CACHE_DIR, "media")
+                try:
+                    _shared_store = MediaStore(root_dir, link_mode=os.getenv("FEISHU_MEDIA_LINK", "hardlink"))
+                except (sqlite3.Error, OSError, ValueError) as e:
+                    logging.getLogger(__name__).warning(f"初始化素材库失败，将不使用素材库: {e}")
+                    return None
+    return _shared_store
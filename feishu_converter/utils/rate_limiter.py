@@ -0,0 +1,320 @@
+"""
+速率限制工具
+按飞书开放平台的接口族频控配额对请求进行限速，可跨线程共享，也可通过状态文件跨进程共享
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，只能在进程内限速
+    fcntl = None
+
+
+# 各接口族的默认配额（次/秒），取自开放平台文档中的应用频率限制
+DEFAULT_BUDGETS: Dict[str, float] = {
+    "docx": 5.0,          # 获取文档信息/所有块：单应用5次/秒
+    "docx_write": 3.0,    # 创建/更新/删除块：单应用3次/秒
+    "sheets": 100.0,      # 电子表格读写：单租户单应用100次/秒
+    "drive_media": 5.0,   # 素材下载
+    "permission": 10.0,   # 协作者权限判断
+    "default": 10.0,      # 其他接口
+}
+
+
+def endpoint_family(method: str, url: str) -> str:
+    """
+    根据请求方法和URL判断所属的接口族
+
+    :param method: HTTP方法
+    :param url: 请求URL
+    :return: 接口族名称
+    """
+    if "/docx/" in url or "/docs/v1/content" in url:
+        return "docx" if method.upper() == "GET" else "docx_write"
+    if "/sheets/" in url:
+        return "sheets"
+    if "/drive/v1/medias/" in url:
+        return "drive_media"
+    if "/drive/permission/" in url:
+        return "permission"
+    return "default"
+
+
+class TokenBucket:
+    """
+    令牌桶
+    以“理论到达时间”(GCRA) 的形式实现：状态只有一个时间戳，便于加锁和持久化。
+    调用方先预约令牌再按返回的等待时间休眠，因此既能在线程中使用，也能在协程中使用
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        初始化令牌桶
+
+        :param rate: 每秒发放的令牌数
+        :param burst: 桶容量（允许的突发请求数），默认等于每秒配额
+        """
+        self.rate = rate
+        self.interval = 1.0 / rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self._tat = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        预约令牌
+
+        :param tokens: 需要的令牌数
+        :return: 需要等待的秒数
+        """
+        with self._lock:
+            now = time.time()
+            self._tat, wait = self._advance(self._tat, now, tokens)
+            return wait
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        获取令牌，必要时阻塞等待
+
+        :param tokens: 需要的令牌数
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        在指定时间内暂停发放令牌（例如服务端返回限流时）
+
+        :param seconds: 暂停秒数
+        """
+        with self._lock:
+            self._tat = self._paused_tat(self._tat, time.time() + seconds)
+
+    def _advance(self, tat: float, now: float, tokens: float):
+        """计算预约后的理论到达时间和等待时间"""
+        new_tat = max(tat, now) + tokens * self.interval
+        wait = new_tat - self.burst * self.interval - now
+        return new_tat, max(0.0, wait)
+
+    def _paused_tat(self, tat: float, until: float) -> float:
+        """暂停到 until 之后，恢复时不允许突发"""
+        return max(tat, until + self.burst * self.interval)
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    基于状态文件的令牌桶
+    多个进程指向同一状态文件时共享配额，通过文件锁保证原子更新
+    """
+
+    def __init__(self, rate: float, state_file: str, burst: Optional[float] = None):
+        """
+        初始化跨进程令牌桶
+
+        :param rate: 每秒发放的令牌数
+        :param state_file: 状态文件路径
+        :param burst: 桶容量
+        """
+        super().__init__(rate, burst)
+        self.state_file = Path(state_file)
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self.state_file.touch(exist_ok=True)
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        with self._lock, open(self.state_file, 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                tat, wait = self._advance(self._read(f), now, tokens)
+                self._write(f, tat)
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def pause(self, seconds: float):
+        with self._lock, open(self.state_file, 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self._write(f, self._paused_tat(self._read(f), time.time() + seconds))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read(f) -> float:
+        f.seek(0)
+        content = f.read().strip()
+        try:
+            return float(content) if content else 0.0
+        except ValueError:
+            return 0.0
+
+    @staticmethod
+    def _write(f, tat: float):
+        f.seek(0)
+        f.truncate()
+        f.write(repr(tat))
+        f.flush()
+
+
+class RateLimiter:
+    """
+    按接口族限速的限流器
+    每个接口族一个令牌桶，配置了 state_dir 时各进程通过状态文件共享配额
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, float]] = None, state_dir: Optional[str] = None):
+        """
+        初始化限流器
+
+        :param budgets: 各接口族的配额（次/秒），未配置的接口族使用默认值
+        :param state_dir: 跨进程共享状态目录，不传则仅在进程内共享
+        """
+        self.logger = logging.getLogger(__name__)
+        self.budgets = dict(DEFAULT_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+
+        if state_dir and fcntl is None:
+            self.logger.warning("当前平台不支持文件锁，限流仅在进程内生效")
+            state_dir = None
+        self.state_dir = state_dir
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, family: str) -> TokenBucket:
+        """
+        获取接口族对应的令牌桶
+
+        :param family: 接口族名称
+        :return: 令牌桶
+        """
+        bucket = self._buckets.get(family)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(family)
+                if bucket is None:
+                    rate = self.budgets.get(family, self.budgets["default"])
+                    if self.state_dir:
+                        bucket = FileTokenBucket(rate, os.path.join(self.state_dir, f"{family}.bucket"))
+                    else:
+                        bucket = TokenBucket(rate)
+                    self._buckets[family] = bucket
+        return bucket
+
+    def reserve(self, family: str) -> float:
+        """
+        为接口族预约一次请求
+
+        :param family: 接口族名称
+        :return: 需要等待的秒数
+        """
+        return self.bucket(family).reserve()
+
+    def acquire(self, family: str):
+        """
+        获取一次请求配额，必要时阻塞等待
+
+        :param family: 接口族名称
+        """
+        wait = self.reserve(family)
+        if wait > 0:
+            self.logger.debug(f"接口族 {family} 限流等待 {wait:.2f} 秒")
+            time.sleep(wait)
+
+    def acquire_for(self, method: str, url: str):
+        """
+        按请求方法和URL获取配额
+
+        :param method: HTTP方法
+        :param url: 请求URL
+        """
+        self.acquire(endpoint_family(method, url))
+
+    def pause(self, family: str, seconds: float):
+        """
+        暂停接口族的请求
+
+        :param family: 接口族名称
+        :param seconds: 暂停秒数
+        """
+        self.bucket(family).pause(seconds)
+
+
+def parse_budgets(spec: str) -> Dict[str, float]:
+    """
+    解析配额配置字符串，例如 "docx=5,sheets=80"
+
+    :param spec: 配置字符串
+    :return: 接口族到配额的映射
+    :raises ValueError: 配置项缺少接口族名称，或配额不是正数
+    """
+    budgets = {}
+    for item in re.split(r'[,\s]+', spec.strip()):
+        if not item:
+            continue
+        family, _, rate = item.partition('=')
+        family = family.strip()
+        try:
+            value = float(rate)
+        except ValueError:
+            value = None
+        if not family or value is None or not math.isfinite(value) or value <= 0:
+            raise ValueError(f"无效的配额配置 '{item}'，应为 接口族=每秒请求数（大于0），如 docx=5")
+        budgets[family] = value
+    return budgets
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    获取进程级共享的限流器
+    首次创建时读取环境变量 FEISHU_RATE_LIMITS（如 "docx=5,sheets=80"）和
+    FEISHU_RATE_LIMIT_DIR（跨进程共享状态目录）
+
+    :return: 共享限流器
+    """
+    global _shared_limiter
+
+    if _shared_limiter is None:
+        with _shared_limiter_lock:
+            if _shared_limiter is None:
+                spec = os.getenv("FEISHU_RATE_LIMITS", "")
+                budgets = None
+                if spec:
+                    try:
+                        budgets = parse_budgets(spec)
+                    except ValueError as e:
+                        logging.getLogger(__name__).warning(f"FEISHU_RATE_LIMITS 配置无效，使用默认配额: {e}")
+                _shared_limiter = RateLimiter(
+                    budgets=budgets,
+                    state_dir=os.getenv("FEISHU_RATE_LIMIT_DIR") or None
+                )
+    return _shared_limiter
+
+
+def configure_rate_limiter(budgets: Optional[Dict[str, float]] = None, state_dir: Optional[str] = None) -> RateLimiter:
+    """
+    重新配置进程级共享的限流器
+
+    :param budgets: 各接口族的配额（次/秒）
+    :param state_dir: 跨进程共享状态目录
+    :return: 新的共享限流器
+    """
+    global _shared_limiter
+
+    with _shared_limiter_lock:
+        _shared_limiter = RateLimiter(budgets=budgets, state_dir=state_dir)
+    return _shared_limiter
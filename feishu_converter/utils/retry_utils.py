@@ -5,13 +5,100 @@
 
 import functools
 import logging
+import os
 import random
+import threading
 import time
-from typing import Callable, Optional, Tuple, Type, Union
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Type, Union
 
 import requests
 
 
+# 飞书开放平台表示触发频控的业务错误码（HTTP状态码可能是400而不是429）
+RATE_LIMIT_ERROR_CODES = (
+    99991400,  # 应用频率限制
+    90217,     # 电子表格：请求过于频繁
+    1254290,   # 多维表格：请求过于频繁
+)
+
+
+class RateLimitError(requests.exceptions.HTTPError):
+    """
+    触发服务端频控
+    retry_after 为服务端建议的等待秒数
+    """
+
+    def __init__(self, message: str, retry_after: float, response: Optional[requests.Response] = None):
+        super().__init__(message, response=response)
+        self.retry_after = retry_after
+
+
+def is_rate_limited(status_code: int, body: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    判断响应是否为频控响应
+
+    :param status_code: HTTP状态码
+    :param body: 已解析的响应JSON
+    :return: 是否触发频控
+    """
+    if status_code == 429:
+        return True
+    return bool(body) and body.get("code") in RATE_LIMIT_ERROR_CODES
+
+
+def parse_retry_after(headers: Mapping[str, str], default: float = 1.0) -> float:
+    """
+    从响应头解析需要等待的秒数
+    优先使用飞书的 x-ogw-ratelimit-reset（距离配额重置的秒数），其次是标准的 Retry-After
+
+    :param headers: 响应头
+    :param default: 响应头中没有相关信息时的默认值
+    :return: 等待秒数
+    """
+    reset = headers.get("x-ogw-ratelimit-reset")
+    if reset:
+        try:
+            return max(0.0, float(reset))
+        except ValueError:
+            pass
+
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            # Retry-After 也可能是HTTP日期
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    return default
+
+
+def check_rate_limit(response: requests.Response):
+    """
+    检查响应是否触发频控，触发时抛出 RateLimitError
+
+    :param response: 响应对象
+    :raises RateLimitError: 触发频控
+    """
+    if response.status_code not in (400, 429):
+        return
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    if is_rate_limited(response.status_code, body if isinstance(body, dict) else None):
+        retry_after = parse_retry_after(response.headers)
+        raise RateLimitError(
+            f"触发频控（HTTP {response.status_code}），{retry_after:.2f}秒后重置: {response.url}",
+            retry_after=retry_after,
+            response=response
+        )
+
+
 class RetryConfig:
     """重试配置类"""
 
@@ -74,8 +161,10 @@ def retry_with_backoff(config: Optional[RetryConfig] = None):
                     # 检查是否需要重试
                     should_retry = True
 
-                    # 如果是HTTP错误，检查状态码
-                    if hasattr(e, 'response') and e.response is not None:
+                    # 频控错误总是重试；其他HTTP错误检查状态码
+                    if isinstance(e, RateLimitError):
+                        pass
+                    elif hasattr(e, 'response') and e.response is not None:
                         status_code = e.response.status_code
                         if status_code not in config.retry_status_codes:
                             should_retry = False
@@ -91,14 +180,18 @@ def retry_with_backoff(config: Optional[RetryConfig] = None):
                             config.on_failure(e, attempt)
                         raise
 
-                    # 计算延迟时间（指数退避 + 随机抖动）
-                    delay = min(
-                        config.base_delay * (config.exponential_base ** attempt),
-                        config.max_delay
-                    )
-                    # 添加随机抖动（±20%）
-                    jitter = delay * 0.2 * (2 * random.random() - 1)
-                    actual_delay = delay + jitter
+                    if isinstance(e, RateLimitError):
+                        # 服务端给出了重置时间，精确等待到重置为止
+                        actual_delay = e.retry_after
+                    else:
+                        # 计算延迟时间（指数退避 + 随机抖动）
+                        delay = min(
+                            config.base_delay * (config.exponential_base ** attempt),
+                            config.max_delay
+                        )
+                        # 添加随机抖动（±20%）
+                        jitter = delay * 0.2 * (2 * random.random() - 1)
+                        actual_delay = delay + jitter
 
                     logger.warning(
                         f"函数 {func.__name__} 第 {attempt + 1} 次尝试失败: {e}. "
@@ -121,6 +214,7 @@ def retry_with_backoff(config: Optional[RetryConfig] = None):
 def retry_on_rate_limit(max_retries: int = 3, base_delay: float = 2.0):
     """
     专门用于处理速率限制的重试装饰器
+    被装饰函数抛出 RateLimitError 时按服务端给出的重置时间等待，其他429错误按指数退避
 
     :param max_retries: 最大重试次数
     :param base_delay: 基础延迟时间
@@ -281,8 +375,11 @@ class RequestSessionManager:
         self,
         max_retries: int = 3,
         backoff_factor: float = 0.3,
-        status_forcelist: Tuple[int, ...] = (500, 502, 503, 504),
-        timeout: float = 30.0
+        status_forcelist: Tuple[int, ...] = (429, 500, 502, 503, 504),
+        timeout: float = 30.0,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        close_on_exit: bool = True
     ):
         """
         初始化会话管理器
@@ -291,46 +388,155 @@ class RequestSessionManager:
         :param backoff_factor: 退避因子
         :param status_forcelist: 需要重试的状态码
         :param timeout: 超时时间
+        :param pool_connections: 连接池缓存的主机数
+        :param pool_maxsize: 每个主机保持的最大连接数
+        :param close_on_exit: 退出with块时是否关闭会话（共享会话应设为False以保持长连接）
         """
         self.max_retries = max_retries
         self.backoff_factor = backoff_factor
         self.status_forcelist = status_forcelist
         self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.close_on_exit = close_on_exit
         self._session = None
+        self._lock = threading.Lock()
+
+    def _build_adapter(self):
+        """构建带重试策略和连接池的适配器"""
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry_strategy = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            respect_retry_after_header=True,
+            # 只自动重试幂等请求；POST/PATCH 在服务端可能已生效，由调用方的重试策略决定是否重发
+            allowed_methods=["HEAD", "GET", "OPTIONS", "PUT", "DELETE"]
+        )
+
+        return HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
 
     def get_session(self) -> requests.Session:
         """获取配置好的会话"""
         if self._session is None:
-            self._session = requests.Session()
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = self._build_adapter()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
 
-            # 配置重试策略
-            from requests.adapters import HTTPAdapter
-            from urllib3.util.retry import Retry
+        return self._session
 
-            retry_strategy = Retry(
-                total=self.max_retries,
-                backoff_factor=self.backoff_factor,
-                status_forcelist=self.status_forcelist,
-                allowed_methods=["HEAD", "GET", "OPTIONS", "POST", "PUT", "DELETE", "PATCH"]
-            )
+    def resize_pool(self, pool_maxsize: int):
+        """
+        扩大连接池容量（只增不减），已建立的会话会重新挂载适配器
 
-            adapter = HTTPAdapter(max_retries=retry_strategy)
-            self._session.mount("http://", adapter)
-            self._session.mount("https://", adapter)
+        :param pool_maxsize: 每个主机保持的最大连接数
+        """
+        with self._lock:
+            if pool_maxsize <= self.pool_maxsize:
+                return
+            self.pool_maxsize = pool_maxsize
+            if self._session is not None:
+                old_adapters = []
+                for prefix in ("http://", "https://"):
+                    old_adapter = self._session.get_adapter(prefix)
+                    if old_adapter not in old_adapters:
+                        old_adapters.append(old_adapter)
+                adapter = self._build_adapter()
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+                # 关闭旧连接池的空闲连接，正在使用的连接归还时随之关闭
+                for old_adapter in old_adapters:
+                    old_adapter.close()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        通过会话发送请求，未指定超时时使用默认超时
 
-        return self._session
+        :param method: HTTP方法
+        :param url: 请求URL
+        :param kwargs: 其他请求参数
+        :return: 响应对象
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.get_session().request(method, url, **kwargs)
 
     def close(self):
         """关闭会话"""
-        if self._session:
-            self._session.close()
-            self._session = None
+        with self._lock:
+            if self._session:
+                self._session.close()
+                self._session = None
 
     def __enter__(self):
         return self.get_session()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
+        if self.close_on_exit:
+            self.close()
+
+
+# 进程级共享的HTTP连接池，所有飞书API调用复用同一组长连接
+DEFAULT_POOL_SIZE = int(os.getenv("FEISHU_HTTP_POOL_SIZE", "20"))
+
+_shared_session_manager: Optional[RequestSessionManager] = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session_manager(pool_size: Optional[int] = None) -> RequestSessionManager:
+    """
+    获取进程级共享的会话管理器（线程安全，保持长连接）
+
+    :param pool_size: 期望的连接池大小，大于当前容量时会自动扩容
+    :return: 共享的会话管理器
+    """
+    global _shared_session_manager
+
+    if _shared_session_manager is None:
+        with _shared_session_lock:
+            if _shared_session_manager is None:
+                size = max(pool_size or 0, DEFAULT_POOL_SIZE)
+                # 不在连接层重试429：频控响应交给上层按接口族暂停并精确等待
+                _shared_session_manager = RequestSessionManager(
+                    max_retries=3,
+                    backoff_factor=0.5,
+                    status_forcelist=(500, 502, 503, 504),
+                    timeout=30.0,
+                    pool_connections=10,
+                    pool_maxsize=size,
+                    close_on_exit=False
+                )
+
+    if pool_size:
+        _shared_session_manager.resize_pool(pool_size)
+
+    return _shared_session_manager
+
+
+def get_shared_session(pool_size: Optional[int] = None) -> requests.Session:
+    """
+    获取进程级共享的HTTP会话
+
+    :param pool_size: 期望的连接池大小
+    :return: 共享会话
+    """
+    return get_shared_session_manager(pool_size).get_session()
+
+
+def close_shared_session():
+    """关闭进程级共享会话，释放所有连接"""
+    with _shared_session_lock:
+        if _shared_session_manager is not None:
+            _shared_session_manager.close()
 
 
 # 便捷函数
@@ -356,7 +562,8 @@ def safe_request(
 
     for attempt in range(max_retries + 1):
         try:
-            response = requests.request(method, url, timeout=timeout, **kwargs)
+            response = get_shared_session().request(method, url, timeout=timeout, **kwargs)
+            check_rate_limit(response)
             response.raise_for_status()
             return response
 
@@ -365,7 +572,10 @@ def safe_request(
                 logger.error(f"请求 {url} 在 {max_retries} 次重试后仍然失败")
                 raise
 
-            delay = min(2 ** attempt, 30)  # 最大30秒
+            if isinstance(e, RateLimitError):
+                delay = e.retry_after
+            else:
+                delay = min(2 ** attempt, 30)  # 最大30秒
             logger.warning(f"请求失败（尝试 {attempt + 1}/{max_retries + 1}）: {e}，{delay}秒后重试...")
             time.sleep(delay)
 
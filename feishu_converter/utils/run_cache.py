@@ -0,0 +1,162 @@
+"""
+运行期结果缓存
+在一次批量转换内缓存接口结果（如嵌入电子表格的权限和数据），带过期时间和容量上限；
+多个线程同时请求同一个键时只执行一次加载，其余线程等待结果
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Loading:
+    """正在加载的键：其他线程等待 done 后读取结果"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class RunCache:
+    """
+    带过期时间的LRU缓存
+    容量按条目数和可选的权重（如单元格数）限制，超出时淘汰最久未使用的条目
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = 600.0,
+        max_entries: int = 1024,
+        max_weight: Optional[int] = None,
+        weigher: Optional[Callable[[Any], int]] = None
+    ):
+        """
+        初始化缓存
+
+        :param name: 缓存名称（用于日志）
+        :param ttl: 条目有效期（秒），0表示不过期
+        :param max_entries: 最大条目数
+        :param max_weight: 最大总权重，为None时不限制
+        :param weigher: 计算条目权重的函数，默认每个条目权重为1
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.max_weight = max_weight
+        self.weigher = weigher or (lambda value: 1)
+        self.logger = logging.getLogger(__name__)
+
+        # 键 -> (过期时间, 权重, 值)，按最近使用顺序排列
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._loading: Dict[Hashable, _Loading] = {}
+        self._weight = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], cache_none: bool = False) -> Any:
+        """
+        读取缓存，未命中时调用 loader 加载并写入缓存
+
+        :param key: 缓存键
+        :param loader: 加载函数
+        :param cache_none: loader 返回None时是否缓存（默认不缓存，下次重新加载）
+        :return: 缓存值或加载结果
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, value = entry
+                if not expires_at or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+            loading = self._loading.get(key)
+            owner = loading is None
+            if owner:
+                loading = _Loading()
+                self._loading[key] = loading
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not owner:
+            loading.done.wait()
+            if loading.error is not None:
+                raise loading.error
+            return loading.value
+
+        try:
+            value = loader()
+            loading.value = value
+        except BaseException as e:
+            loading.error = e
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+                if loading.error is None and (value is not None or cache_none):
+                    self._put(key, value)
+            loading.done.set()
+        return value
+
+    def _put(self, key: Hashable, value: Any):
+        """写入条目并按容量淘汰（调用方持有锁）"""
+        if key in self._entries:
+            self._remove(key)
+        weight = self.weigher(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            # 单个条目超过上限时不缓存
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        self._entries[key] = (expires_at, weight, value)
+        self._weight += weight
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_weight is not None and self._weight > self.max_weight)
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        """删除条目（调用方持有锁）"""
+        _, weight, _ = self._entries.pop(key)
+        self._weight -= weight
+
+    def clear(self):
+        """清空缓存（开始新一轮批量转换时调用）"""
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        :return: 条目数、总权重、命中、未命中和淘汰次数
+        """
+        with self._lock:
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'weight': self._weight,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
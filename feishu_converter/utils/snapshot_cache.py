@@ -0,0 +1,362 @@
+"""
+文档快照缓存
+以 (document_id, revision_id) 为键，把文档信息和块分页持久化到本地 SQLite，
+文档版本未变化时只需一次元数据请求即可复用上次获取的内容
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .sqlite_utils import connect_db, init_db
+
+
+class DocumentSnapshotCache:
+    """
+    文档快照缓存
+    每个文档只保留最新版本的快照；块分页逐页写入，全部写完后才登记快照，
+    因此中途失败的获取不会留下不完整的缓存
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            document_id TEXT NOT NULL,
+            revision_id TEXT NOT NULL,
+            doc_type TEXT NOT NULL,
+            info BLOB NOT NULL,
+            page_count INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (document_id, revision_id)
+        );
+        CREATE TABLE IF NOT EXISTS snapshot_pages (
+            document_id TEXT NOT NULL,
+            revision_id TEXT NOT NULL,
+            page_no INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (document_id, revision_id, page_no)
+        );
+        CREATE INDEX IF NOT EXISTS idx_snapshots_accessed ON snapshots (accessed_at);
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: Optional[float] = None, max_size_mb: Optional[float] = None):
+        """
+        初始化快照缓存
+
+        :param db_path: SQLite数据库文件路径
+        :param ttl_seconds: 快照在多久未被访问后过期（秒），None表示不过期
+        :param max_size_mb: 缓存总大小上限（MB），超出时淘汰最久未访问的快照，None表示不限制
+        """
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size_mb * 1024 * 1024 if max_size_mb else None
+        self.logger = logging.getLogger(__name__)
+
+        init_db(self.db_path, self.SCHEMA)
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        return zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+    @staticmethod
+    def _decode(data: bytes) -> Any:
+        return json.loads(zlib.decompress(data).decode('utf-8'))
+
+    def has_snapshot(self, document_id: str, revision_id: Any) -> bool:
+        """
+        检查指定版本的快照是否存在（不过期），命中时更新访问时间
+
+        :param document_id: 文档ID
+        :param revision_id: 文档版本号
+        :return: 是否命中
+        """
+        if revision_id is None:
+            return False
+        try:
+            with connect_db(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT accessed_at FROM snapshots WHERE document_id = ? AND revision_id = ?",
+                    (document_id, str(revision_id))
+                ).fetchone()
+                if row is None:
+                    return False
+                if self.ttl_seconds is not None and time.time() - row[0] > self.ttl_seconds:
+                    return False
+                conn.execute(
+                    "UPDATE snapshots SET accessed_at = ? WHERE document_id = ? AND revision_id = ?",
+                    (time.time(), document_id, str(revision_id))
+                )
+                return True
+        except sqlite3.Error as e:
+            self.logger.warning(f"读取快照缓存失败: {e}")
+            return False
+
+    def get_info(self, document_id: str, revision_id: Any) -> Optional[Any]:
+        """
+        获取快照中保存的文档信息
+
+        :param document_id: 文档ID
+        :param revision_id: 文档版本号
+        :return: 文档信息，未命中返回None
+        """
+        if not self.has_snapshot(document_id, revision_id):
+            return None
+        try:
+            with connect_db(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT info FROM snapshots WHERE document_id = ? AND revision_id = ?",
+                    (document_id, str(revision_id))
+                ).fetchone()
+            return self._decode(row[0]) if row else None
+        except (sqlite3.Error, ValueError, zlib.error) as e:
+            self.logger.warning(f"读取快照缓存失败: {e}")
+            return None
+
+    def iter_pages(self, document_id: str, revision_id: Any) -> Iterator[List[Dict[str, Any]]]:
+        """
+        逐页读取快照中的块
+
+        :param document_id: 文档ID
+        :param revision_id: 文档版本号
+        :return: 每页的块列表
+        """
+        with connect_db(self.db_path) as conn:
+            cursor = conn.execute(
+                "SELECT data FROM snapshot_pages WHERE document_id = ? AND revision_id = ? ORDER BY page_no",
+                (document_id, str(revision_id))
+            )
+            for (data,) in cursor:
+                yield self._decode(data)
+
+    def record(
+        self,
+        document_id: str,
+        revision_id: Any,
+        doc_type: str,
+        info: Any,
+        pages: Iterable[List[Dict[str, Any]]]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        边返回块分页边写入缓存，分页全部返回后登记快照
+
+        :param document_id: 文档ID
+        :param revision_id: 文档版本号
+        :param doc_type: 文档类型
+        :param info: 文档信息
+        :param pages: 块分页迭代器
+        :return: 原样返回的块分页
+        """
+        if revision_id is None:
+            yield from pages
+            return
+
+        revision = str(revision_id)
+        size = 0
+        page_count = 0
+        try:
+            with connect_db(self.db_path) as conn:
+                conn.execute(
+                    "DELETE FROM snapshot_pages WHERE document_id = ? AND revision_id = ?",
+                    (document_id, revision)
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"写入快照缓存失败: {e}")
+            yield from pages
+            return
+
+        for items in pages:
+            data = self._encode(items)
+            try:
+                with connect_db(self.db_path) as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO snapshot_pages VALUES (?, ?, ?, ?)",
+                        (document_id, revision, page_count, data)
+                    )
+                size += len(data)
+                page_count += 1
+            except sqlite3.Error as e:
+                self.logger.warning(f"写入快照缓存失败: {e}")
+                revision = None
+            yield items
+            if revision is None:
+                # 写入失败后不再缓存，剩余分页原样返回
+                yield from pages
+                return
+
+        self._commit_snapshot(document_id, revision, doc_type, info, page_count, size)
+
+    def put(
+        self,
+        document_id: str,
+        revision_id: Any,
+        doc_type: str,
+        info: Any,
+        pages: Iterable[List[Dict[str, Any]]] = ()
+    ):
+        """
+        写入完整快照
+
+        :param document_id: 文档ID
+        :param revision_id: 文档版本号
+        :param doc_type: 文档类型
+        :param info: 文档信息（电子表格可直接保存完整内容）
+        :param pages: 块分页
+        """
+        for _ in self.record(document_id, revision_id, doc_type, info, pages):
+            pass
+
+    def _commit_snapshot(self, document_id: str, revision: str, doc_type: str, info: Any, page_count: int, size: int):
+        """登记快照并删除该文档的旧版本"""
+        info_data = self._encode(info)
+        now = time.time()
+        try:
+            with connect_db(self.db_path) as conn:
+                conn.execute(
+                    "DELETE FROM snapshot_pages WHERE document_id = ? AND revision_id != ?",
+                    (document_id, revision)
+                )
+                conn.execute("DELETE FROM snapshots WHERE document_id = ?", (document_id,))
+                conn.execute(
+                    "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (document_id, revision, doc_type, info_data, page_count, size + len(info_data), now, now)
+                )
+            self.logger.debug(f"已缓存文档快照: {document_id} (版本 {revision})")
+        except sqlite3.Error as e:
+            self.logger.warning(f"写入快照缓存失败: {e}")
+            return
+
+        if self.max_size is not None:
+            self.evict()
+
+    def remove(self, document_id: str) -> bool:
+        """
+        删除文档的所有快照
+
+        :param document_id: 文档ID
+        :return: 是否删除了快照
+        """
+        with connect_db(self.db_path) as conn:
+            conn.execute("DELETE FROM snapshot_pages WHERE document_id = ?", (document_id,))
+            cursor = conn.execute("DELETE FROM snapshots WHERE document_id = ?", (document_id,))
+            return cursor.rowcount > 0
+
+    def evict(self, max_age: Optional[float] = None, max_size_mb: Optional[float] = None) -> int:
+        """
+        淘汰过期快照，并在超出大小上限时按最久未访问的顺序删除
+
+        :param max_age: 未被访问的最长时间（秒），默认使用 ttl_seconds
+        :param max_size_mb: 大小上限（MB），默认使用初始化时的上限
+        :return: 删除的快照数
+        """
+        max_age = max_age if max_age is not None else self.ttl_seconds
+        max_size = max_size_mb * 1024 * 1024 if max_size_mb is not None else self.max_size
+
+        victims = []
+        with connect_db(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT document_id, revision_id, size, accessed_at FROM snapshots ORDER BY accessed_at"
+            ).fetchall()
+            total = sum(row[2] for row in rows)
+            now = time.time()
+            for document_id, revision, size, accessed_at in rows:
+                expired = max_age is not None and now - accessed_at > max_age
+                oversize = max_size is not None and total > max_size
+                if not (expired or oversize):
+                    continue
+                victims.append((document_id, revision))
+                total -= size
+
+            for document_id, revision in victims:
+                conn.execute(
+                    "DELETE FROM snapshot_pages WHERE document_id = ? AND revision_id = ?",
+                    (document_id, revision)
+                )
+                conn.execute(
+                    "DELETE FROM snapshots WHERE document_id = ? AND revision_id = ?",
+                    (document_id, revision)
+                )
+
+        if victims:
+            self.logger.info(f"淘汰文档快照 {len(victims)} 个")
+        return len(victims)
+
+    def clear(self):
+        """清空缓存"""
+        with connect_db(self.db_path) as conn:
+            conn.execute("DELETE FROM snapshot_pages")
+            conn.execute("DELETE FROM snapshots")
+        with connect_db(self.db_path) as conn:
+            conn.execute("VACUUM")
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """
+        列出所有快照
+
+        :return: 快照信息列表（按最近访问时间倒序）
+        """
+        with connect_db(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT document_id, revision_id, doc_type, page_count, size, created_at, accessed_at "
+                "FROM snapshots ORDER BY accessed_at DESC"
+            ).fetchall()
+        keys = ('document_id', 'revision_id', 'doc_type', 'page_count', 'size', 'created_at', 'accessed_at')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        :return: 统计信息
+        """
+        with connect_db(self.db_path) as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM snapshots").fetchone()
+        return {
+            'db_path': str(self.db_path),
+            'snapshots': count,
+            'size_mb': size / 1024 / 1024,
+            'file_size_mb': self.db_path.stat().st_size / 1024 / 1024 if self.db_path.exists() else 0
+        }
+
+
+DEFAULT_CACHE_DIR = os.getenv("FEISHU_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "feishu_cache")
+
+_shared_cache: Optional[DocumentSnapshotCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_snapshot_cache() -> Optional[DocumentSnapshotCache]:
+    """
+    获取进程级共享的快照缓存
+    读取环境变量 FEISHU_SNAPSHOT_CACHE（设为0关闭缓存）、FEISHU_CACHE_DIR（缓存目录）、
+    FEISHU_SNAPSHOT_TTL（过期秒数）和 FEISHU_SNAPSHOT_MAX_MB（大小上限）
+
+    :return: 共享缓存，已关闭或初始化失败时返回None
+    """
+    global _shared_cache
+
+    if os.getenv("FEISHU_SNAPSHOT_CACHE", "1").lower() in ("0", "false", "off"):
+        return None
+
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                ttl = os.getenv("FEISHU_SNAPSHOT_TTL")
+                max_mb = os.getenv("FEISHU_SNAPSHOT_MAX_MB", "500")
+                try:
+                    _shared_cache = DocumentSnapshotCache(
+                        os.path.join(DEFAULT_CACHE_DIR, "snapshots.db"),
+                        ttl_seconds=float(ttl) if ttl else None,
+                        max_size_mb=float(max_mb) if max_mb else None
+                    )
+                except (sqlite3.Error, OSError) as e:
+                    logging.getLogger(__name__).warning(f"初始化快照缓存失败，将不使用缓存: {e}")
+                    return None
+    return _shared_cache
@@ -0,0 +1,40 @@
+"""
+SQLite 工具
+本地缓存和任务库共用的连接与建库方式：每次操作使用独立连接（可在多个线程中安全使用），
+数据库以 WAL 模式打开，读写可以并发
+"""
+
+import sqlite3
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+# 等待其他连接释放写锁的秒数
+DEFAULT_TIMEOUT = 30
+
+
+@contextmanager
+def connect_db(db_path: Union[str, Path], timeout: float = DEFAULT_TIMEOUT) -> Iterator[sqlite3.Connection]:
+    """
+    打开一个独立连接，代码块正常结束时提交、出现异常时回滚，退出时关闭连接
+
+    :param db_path: 数据库文件路径
+    :param timeout: 等待写锁的秒数
+    :return: 数据库连接
+    """
+    with closing(sqlite3.connect(str(db_path), timeout=timeout)) as conn:
+        with conn:
+            yield conn
+
+
+def init_db(db_path: Union[str, Path], schema: str):
+    """
+    创建数据库（所在目录不存在时创建），开启 WAL 模式并执行建表语句
+
+    :param db_path: 数据库文件路径
+    :param schema: 建表语句（应使用 IF NOT EXISTS）
+    """
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    with connect_db(db_path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(schema)
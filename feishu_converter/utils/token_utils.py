@@ -0,0 +1,191 @@
+"""
+访问令牌工具
+提供进程级共享、感知过期时间并可后台预刷新的 tenant_access_token 缓存
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from .retry_utils import RetryConfig, get_shared_session, retry_with_backoff
+
+
+class TenantTokenProvider:
+    """
+    tenant_access_token 提供者
+    同一个 app_id 在进程内只保留一份令牌，过期前在后台自动刷新，
+    并保证同一时刻只有一个线程在请求新令牌
+    """
+
+    TOKEN_URL = "/auth/v3/tenant_access_token/internal"
+
+    def __init__(
+        self,
+        app_id: Optional[str],
+        app_secret: Optional[str],
+        base_url: str = "https://open.feishu.cn/open-apis",
+        refresh_margin: float = 300.0,
+        auto_refresh: bool = True
+    ):
+        """
+        初始化令牌提供者
+
+        :param app_id: 应用ID
+        :param app_secret: 应用密钥
+        :param base_url: API基础URL
+        :param refresh_margin: 距离过期多少秒时开始刷新
+        :param auto_refresh: 是否在后台定时预刷新
+        """
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.base_url = base_url
+        self.refresh_margin = refresh_margin
+        self.auto_refresh = auto_refresh
+        self.logger = logging.getLogger(__name__)
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def get_token(self) -> Optional[str]:
+        """
+        获取有效的访问令牌，必要时同步刷新
+
+        :return: 访问令牌，获取失败返回None
+        """
+        if self._is_fresh():
+            return self._token
+        return self.refresh()
+
+    def cached_token(self) -> Optional[str]:
+        """
+        返回缓存中仍然新鲜的令牌，不触发网络请求
+
+        :return: 访问令牌，需要刷新时返回None
+        """
+        return self._token if self._is_fresh() else None
+
+    def refresh(self, force: bool = False) -> Optional[str]:
+        """
+        刷新访问令牌（单飞：并发调用时只有一个线程真正发起请求）
+
+        :param force: 是否忽略当前令牌的有效期强制刷新
+        :return: 访问令牌，获取失败时若旧令牌尚未过期则返回旧令牌
+        """
+        with self._refresh_lock:
+            # 等锁期间可能已被其他线程刷新
+            if not force and self._is_fresh():
+                return self._token
+
+            try:
+                token, expire = self._request_token()
+            except Exception as e:
+                self.logger.error(f"请求访问令牌异常: {str(e)}")
+                token, expire = None, 0
+
+            if token:
+                self._token = token
+                self._expires_at = time.time() + expire
+                self.logger.debug(f"访问令牌已刷新，{expire} 秒后过期")
+                self._schedule_refresh(max(expire - self.refresh_margin, 1.0))
+                return self._token
+
+            # 刷新失败：旧令牌仍可用时继续使用，稍后重试
+            if self._token and time.time() < self._expires_at:
+                self._schedule_refresh(30.0)
+                return self._token
+            return None
+
+    def invalidate(self):
+        """使当前令牌失效，下次获取时重新请求"""
+        with self._refresh_lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def close(self):
+        """停止后台刷新"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _is_fresh(self) -> bool:
+        """令牌存在且未进入刷新窗口"""
+        return bool(self._token) and time.time() < self._expires_at - self.refresh_margin
+
+    @retry_with_backoff(RetryConfig(
+        max_retries=3,
+        base_delay=1.0,
+        retry_exceptions=(requests.exceptions.RequestException,)
+    ))
+    def _request_token(self) -> Tuple[Optional[str], int]:
+        """
+        向开放平台请求新的令牌
+
+        :return: (令牌, 有效期秒数)
+        """
+        url = f"{self.base_url}{self.TOKEN_URL}"
+        headers = {
+            "Content-Type": "application/json; charset=utf-8"
+        }
+        data = {
+            "app_id": self.app_id,
+            "app_secret": self.app_secret
+        }
+
+        response = get_shared_session().post(url, headers=headers, json=data, timeout=30)
+        response.raise_for_status()
+
+        result = response.json()
+        if result.get("code") == 0:
+            return result["tenant_access_token"], int(result.get("expire", 7200))
+
+        self.logger.error(f"获取访问令牌失败: {result}")
+        return None, 0
+
+    def _schedule_refresh(self, delay: float):
+        """安排后台预刷新"""
+        if not self.auto_refresh:
+            return
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        """后台定时器回调"""
+        self.logger.debug(f"后台刷新访问令牌: {self.app_id}")
+        self.refresh(force=True)
+
+
+_providers: Dict[Optional[str], TenantTokenProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_token_provider(
+    app_id: Optional[str],
+    app_secret: Optional[str],
+    base_url: str = "https://open.feishu.cn/open-apis"
+) -> TenantTokenProvider:
+    """
+    获取进程级共享的令牌提供者（按 app_id 区分）
+
+    :param app_id: 应用ID
+    :param app_secret: 应用密钥
+    :param base_url: API基础URL
+    :return: 令牌提供者
+    """
+    with _providers_lock:
+        provider = _providers.get(app_id)
+        if provider is None:
+            provider = TenantTokenProvider(app_id, app_secret, base_url)
+            _providers[app_id] = provider
+        elif provider.app_secret != app_secret:
+            # 同一应用更换了密钥，旧令牌作废
+            provider.app_secret = app_secret
+            provider.invalidate()
+        return provider
@@ -212,17 +212,16 @@ execute_batch_conversion() {
     print_info "JSON文件: $JSON_FILE"
     print_info "输出目录: $OUTPUT_DIR"
     print_info "输出格式: $OUTPUT_FORMAT"
-    print_info "请求间隔: 6秒（避免触发API限制）"
+    print_info "请求频率: 按接口族自动限流（避免触发API限制）"
     print_highlight "========================================"
     
     # 确保输出目录存在
     mkdir -p "$OUTPUT_DIR"
     
     # 执行批量转换
-    # 使用 --delay 6 参数设置6秒间隔
-    # 使用 --workers 1 参数确保串行处理（配合delay更安全）
+    # 请求频率由限流器按接口族控制，可并发处理
     # 默认使用文档标题作为文件名
-    python batch_convert.py "$JSON_FILE" "$OUTPUT_DIR" "$OUTPUT_FORMAT" --delay 6.0 --workers 1
+    python batch_convert.py "$JSON_FILE" "$OUTPUT_DIR" "$OUTPUT_FORMAT" --workers 3
     
     # 检查命令执行结果
     if [ $? -eq 0 ]; then
@@ -283,7 +282,7 @@ show_help() {
     echo "       $0 batch get_info.json ./output pdf"
     echo ""
     echo "     特性:"
-    echo "       - 自动设置6秒间隔，避免触发API速率限制"
+    echo "       - 按接口族（docx、sheets、素材下载等）自动限流，遇到限流自动退避重试"
     echo "       - 默认使用文档标题作为文件名（更友好）"
     echo "       - 如需使用token作为文件名，添加 --use-token-filename 参数"
     echo ""
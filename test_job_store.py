@@ -0,0 +1,129 @@
+"""
+测试批量转换任务库
+覆盖 --resume 依赖的行为：中断后恢复、缓冲写入丢失后重新转换、失败退避和放弃
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from feishu_converter.tools.job_store import JobState, JobStore
+
+
+def _open(tmp_path, **kwargs) -> JobStore:
+    """在临时目录中打开任务库（默认不自动提交，由测试控制提交时机）"""
+    kwargs.setdefault('commit_interval', 1000)
+    kwargs.setdefault('commit_seconds', 3600)
+    return JobStore(str(tmp_path / JobStore.FILENAME), **kwargs)
+
+
+def test_add_keeps_existing_state(tmp_path):
+    """重复登记的任务保持原状态，登记顺序不变"""
+    store = _open(tmp_path)
+    assert store.add(['a', 'b']) == 2
+    store.mark_in_flight('a')
+    store.mark_done('a', 'a.md')
+    assert store.add(['b', 'a', 'c']) == 1
+    assert store.tokens() == ['a', 'b', 'c']
+    assert store.get('a')['state'] == JobState.DONE
+
+
+def test_recover_after_crash(tmp_path):
+    """转换中途进程退出：重新打开后正在转换的任务恢复为待转换，已用次数保留"""
+    store = _open(tmp_path)
+    store.add(['a', 'b'])
+    store.mark_in_flight('a')
+    store.mark_in_flight('b')
+    store.mark_done('b', 'b.md')
+    store.flush()
+    # 模拟崩溃：不关闭旧实例，直接从数据库重新打开
+    reopened = _open(tmp_path)
+    assert reopened.get('a')['state'] == JobState.IN_FLIGHT
+    assert reopened.recover() == 1
+    assert reopened.get('a')['state'] == JobState.PENDING
+    assert reopened.get('a')['attempts'] == 1
+    assert reopened.get('b')['state'] == JobState.DONE
+    assert reopened.get('b')['result'] == 'b.md'
+    # 恢复结果已提交
+    assert _open(tmp_path).get('a')['state'] == JobState.PENDING
+
+
+def test_unflushed_changes_are_lost_and_rerun(tmp_path):
+    """未提交的状态变更在中断时丢失，对应文档恢复后重新转换"""
+    store = _open(tmp_path)
+    store.add(['a'])
+    store.mark_in_flight('a')
+    store.mark_done('a', 'a.md')
+    # 未调用 flush，缓冲的变更没有写入数据库
+    reopened = _open(tmp_path)
+    assert reopened.get('a')['state'] == JobState.PENDING
+    assert reopened.tokens(JobState.PENDING) == ['a']
+
+
+def test_commit_interval_flushes_automatically(tmp_path):
+    """累计变更数达到提交间隔时自动提交"""
+    store = _open(tmp_path, commit_interval=2)
+    store.add(['a'])
+    store.mark_in_flight('a')
+    store.mark_done('a', 'a.md')
+    assert _open(tmp_path).get('a')['state'] == JobState.DONE
+
+
+def test_mark_failed_backoff_then_dead(tmp_path):
+    """失败后按退避时间重试，达到最大次数后放弃"""
+    store = _open(tmp_path, max_attempts=2, retry_delay=10.0)
+    store.add(['a'])
+
+    store.mark_in_flight('a')
+    before = time.time()
+    assert store.mark_failed('a', 'boom') == JobState.FAILED
+    job = store.get('a')
+    assert job['result'] == 'boom'
+    # 第一次重试等待 retry_delay（含 ±20% 抖动）
+    assert before + 8.0 <= job['next_attempt_at'] <= time.time() + 12.0
+
+    due, wait = store.due_retries()
+    assert due == []
+    assert 0 < wait <= 12.0
+
+    store.mark_in_flight('a')
+    assert store.mark_failed('a', 'boom again') == JobState.DEAD
+    assert store.get('a')['attempts'] == 2
+    assert store.due_retries() == ([], None)
+
+
+def test_non_retryable_failure_is_dead(tmp_path):
+    """不可重试的失败直接放弃"""
+    store = _open(tmp_path, max_attempts=3)
+    store.add(['a'])
+    store.mark_in_flight('a')
+    assert store.mark_failed('a', '无权限访问', retryable=False) == JobState.DEAD
+
+
+def test_due_retries_filters_tokens(tmp_path):
+    """到期的失败任务按登记顺序返回，可以只考虑指定的文档"""
+    store = _open(tmp_path, retry_delay=0.0)
+    store.add(['a', 'b', 'c'])
+    for token in ('c', 'a'):
+        store.mark_in_flight(token)
+        store.mark_failed(token)
+    assert store.due_retries() == (['a', 'c'], 0.0)
+    assert store.due_retries(among={'c'}) == (['c'], 0.0)
+    assert store.due_retries(among={'b'}) == ([], None)
+
+
+def test_counts_and_reset(tmp_path):
+    """按状态统计任务数，重置后清空"""
+    store = _open(tmp_path)
+    store.add(['a', 'b'])
+    store.mark_in_flight('a')
+    store.mark_done('a')
+    counts = store.counts()
+    assert counts[JobState.DONE] == 1
+    assert counts[JobState.PENDING] == 1
+    store.reset()
+    assert store.tokens() == []
+    assert _open(tmp_path).tokens() == []
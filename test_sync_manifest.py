@@ -0,0 +1,94 @@
+"""
+测试增量同步清单
+覆盖 --incremental 依赖的行为：只有版本、标题、格式都未变化且输出完好时才跳过
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from feishu_converter.tools.sync_manifest import SyncManifest
+
+
+def _record(manifest: SyncManifest, token: str = 'doc', revision=5, kind='version', content: str = '# 标题\n'):
+    """写出输出文件并记录到清单"""
+    output_path = manifest.output_dir / f"{token}.md"
+    output_path.write_text(content, encoding='utf-8')
+    manifest.record(token, revision, '标题', 'markdown', str(output_path), kind)
+    return output_path
+
+
+def test_unchanged_when_everything_matches(tmp_path):
+    """版本、标题、格式相同且输出完好时可以跳过"""
+    manifest = SyncManifest(str(tmp_path))
+    _record(manifest)
+    assert manifest.is_unchanged('doc', 5, '标题', 'markdown', 'version')
+    # 版本号按字符串比较（JSON往返后类型可能变化）
+    assert manifest.is_unchanged('doc', '5', '标题', 'markdown', 'version')
+
+
+def test_changed_revision_title_or_format(tmp_path):
+    """版本、标题或格式变化时需要重新转换"""
+    manifest = SyncManifest(str(tmp_path))
+    _record(manifest)
+    assert not manifest.is_unchanged('doc', 6, '标题', 'markdown', 'version')
+    assert not manifest.is_unchanged('doc', 5, '新标题', 'markdown', 'version')
+    assert not manifest.is_unchanged('doc', 5, '标题', 'pdf', 'version')
+    assert not manifest.is_unchanged('doc', None, '标题', 'markdown', 'version')
+    assert not manifest.is_unchanged('other', 5, '标题', 'markdown', 'version')
+
+
+def test_revision_kinds_are_not_compared(tmp_path):
+    """版本号和修改时间不能相互比较，值相同但含义不同时重新转换"""
+    manifest = SyncManifest(str(tmp_path))
+    _record(manifest, revision='1700000000', kind='edit_time')
+    assert manifest.is_unchanged('doc', '1700000000', '标题', 'markdown', 'edit_time')
+    assert not manifest.is_unchanged('doc', '1700000000', '标题', 'markdown', 'version')
+    assert not manifest.is_unchanged('doc', '1700000000', '标题', 'markdown')
+
+
+def test_output_missing_or_modified(tmp_path):
+    """输出文件被删除或内容被修改时重新转换"""
+    manifest = SyncManifest(str(tmp_path))
+    output_path = _record(manifest)
+
+    output_path.write_text('# 被修改\n', encoding='utf-8')
+    assert not manifest.is_unchanged('doc', 5, '标题', 'markdown', 'version')
+
+    output_path.unlink()
+    assert not manifest.is_unchanged('doc', 5, '标题', 'markdown', 'version')
+
+
+def test_touched_output_with_same_content(tmp_path):
+    """只有修改时间变化、内容不变时按哈希判断为完好，并更新记录的修改时间"""
+    manifest = SyncManifest(str(tmp_path))
+    output_path = _record(manifest)
+    stat = output_path.stat()
+    os.utime(output_path, (stat.st_atime, stat.st_mtime + 100))
+    assert manifest.is_unchanged('doc', 5, '标题', 'markdown', 'version')
+    assert manifest.get('doc')['mtime'] == output_path.stat().st_mtime
+
+
+def test_save_and_reload(tmp_path):
+    """清单保存后重新加载，记录（包括版本标识的含义）保持不变"""
+    manifest = SyncManifest(str(tmp_path))
+    _record(manifest, revision='1700000000', kind='edit_time')
+    manifest.save()
+
+    reloaded = SyncManifest(str(tmp_path))
+    assert reloaded.tokens() == ['doc']
+    assert reloaded.get('doc')['revision_kind'] == 'edit_time'
+    assert reloaded.is_unchanged('doc', '1700000000', '标题', 'markdown', 'edit_time')
+
+
+def test_prune_removes_outputs(tmp_path):
+    """不在本次文档列表中的记录及其输出文件被删除"""
+    manifest = SyncManifest(str(tmp_path))
+    kept = _record(manifest, token='keep')
+    removed = _record(manifest, token='gone')
+    assert manifest.prune(['keep']) == ['gone']
+    assert kept.exists()
+    assert not removed.exists()
+    assert manifest.tokens() == ['keep']